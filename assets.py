@@ -0,0 +1,56 @@
+import base64
+import logging
+import os
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# ---- Asset Settings ----
+# The images are not in the repository (see README.md): copy them to images/ next to
+# the page modules, or point TVETMIS_ASSET_DIR at them. Without them the pages render
+# without the logo and background, and a warning is logged once per image.
+ASSET_DIR = Path(os.environ.get("TVETMIS_ASSET_DIR", Path(__file__).parent / "images"))
+
+# name -> (file, width in pixels it is shown at, format it is served in).
+# Widths are twice the CSS size so the images stay sharp on high-DPI screens.
+ASSETS = {
+    "logo": ("tvetlogo1.png", 240, "PNG"),
+    "home_background": ("YoungYi-Coco.3.jpg", 1920, "JPEG"),
+}
+JPEG_QUALITY = 82
+
+
+@lru_cache(maxsize=None)
+def image_bytes(name):
+    """The asset resized to its display width and re-compressed, or None when the file is missing.
+
+    Encoded once per process; reruns get the cached bytes without touching PIL.
+    """
+    file, width, image_format = ASSETS[name]
+    path = ASSET_DIR / file
+    if not path.exists():
+        logger.warning("%s not found; the page renders without it (set TVETMIS_ASSET_DIR)", path)
+        return None
+    with Image.open(path) as image:
+        if image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        buffered = BytesIO()
+        if image_format == "JPEG":
+            image.convert("RGB").save(buffered, format="JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        else:
+            image.save(buffered, format=image_format, optimize=True)
+    return buffered.getvalue()
+
+
+@lru_cache(maxsize=None)
+def data_uri(name):
+    """data: URI of the asset for inline <img> tags, or an empty string when it is missing."""
+    data = image_bytes(name)
+    if data is None:
+        return ""
+    mime = "image/jpeg" if ASSETS[name][2] == "JPEG" else "image/png"
+    return f"data:{mime};base64,{base64.b64encode(data).decode()}"
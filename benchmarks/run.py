@@ -0,0 +1,172 @@
+# Times every page at several data scales, headlessly with Streamlit's AppTest.
+#
+#     python -m benchmarks.run 10000 100000 1000000
+#
+# Each scale runs in its own process (the engine, caches and datastore are process-wide)
+# against a synthetic SQLite database from benchmarks/synthetic.py. Per page it records
+#   load      - fetching the page's data into memory (the warm-up task of the page)
+#   aggregate - the page's chart counts alone, outside Streamlit (pages in AGGREGATE_PAGES)
+#   render    - the first full run of main() on the loaded data
+#   filter    - the rerun after picking the first option of the page's first multiselect
+# and, per stage, the queries by the backend that actually served them (sql, snapshot,
+# duckdb, polars or pandas; see metrics.query). With TVETMIS_BACKEND=duckdb or polars the
+# worker first writes Parquet snapshots of the database, so those backends have data.
+# The results of all scales are written to benchmarks/results/<timestamp>.json.
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = Path(__file__).parent / "data"
+RESULTS_DIR = Path(__file__).parent / "results"
+TIMEOUT = 1800  # seconds per AppTest run
+BACKEND = os.environ.get("TVETMIS_BACKEND", "sql").lower()
+
+# Pages whose chart counts go through sql_aggregates (and so through TVETMIS_BACKEND);
+# tvet15m counts its frame on every backend, so its render stage covers it
+AGGREGATE_PAGES = ("graduated", "tvetsms", "internship15m")
+
+
+def _timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def _stage(entry, stage, function):
+    """Time one stage and record which backends served its queries."""
+    import metrics
+
+    before = metrics.query_totals()
+    result, entry[stage] = _timed(function)
+    served = {}
+    for backend, total in metrics.query_totals().items():
+        queries = total["queries"] - before.get(backend, {}).get("queries", 0)
+        if queries:
+            seconds = total["seconds"] - before.get(backend, {}).get("seconds", 0.0)
+            served[backend] = {"queries": queries, "seconds": round(seconds, 4)}
+    entry.setdefault("queries", {})[stage] = served
+    return result
+
+
+def build_snapshots():
+    """Snapshot every table, so TVETMIS_BACKEND=duckdb or polars has Parquet files to query."""
+    import snapshots
+
+    if not snapshots.enabled():
+        sys.exit("pyarrow is required to benchmark the duckdb and polars backends")
+    seconds = {}
+    for table in snapshots.TABLES:
+        _, seconds[table] = _timed(lambda: snapshots.extract(table))
+        print(f"[benchmark] snapshot {table:<25} {seconds[table]:.2f}s")
+    return seconds
+
+
+def run_aggregates(module, frame):
+    """The chart counts of a page without rendering it: one count per filter column
+    (per cube dimension for tvetsms, which holds no frame)."""
+    import sql_aggregates
+
+    if hasattr(module, "DIMENSIONS"):
+        for column in module.DIMENSIONS:
+            sql_aggregates.count_by(module.TABLE, [column], None, module.FILL)
+    else:
+        where = getattr(module, "WHERE", None)
+        for column in module.FILTER_COLUMNS:
+            sql_aggregates.counts(module.TABLE, frame, [column], None, module.FILL, where)
+
+
+def run_pages():
+    """Time every page in this process; the environment must already point at the data."""
+    import importlib
+
+    from streamlit.testing.v1 import AppTest
+
+    import warmup
+
+    results = {}
+    for name, module_name, load in warmup.TASKS:
+        entry = {"table": name}
+        try:
+            module, entry["import"] = _timed(lambda: importlib.import_module(module_name))
+            frame = _stage(entry, "load", lambda: load(module))
+            if module_name in AGGREGATE_PAGES:
+                _stage(entry, "aggregate", lambda: run_aggregates(module, frame))
+
+            app = AppTest.from_string(f"import {module_name}\n{module_name}.main()", default_timeout=TIMEOUT)
+            _stage(entry, "render", app.run)
+            if app.multiselect:
+                widget = app.multiselect[0]
+                if widget.options:
+                    widget.select(widget.options[0])
+                    _stage(entry, "filter", app.run)
+            entry["exceptions"] = [e.message for e in app.exception]
+        except Exception as e:
+            entry["error"] = f"{type(e).__name__}: {e}"
+        results[module_name] = entry
+        print(f"[benchmark] {module_name:<16} " + "  ".join(
+            f"{stage} {entry[stage]:.2f}s" for stage in ("load", "aggregate", "render", "filter") if stage in entry
+        ) + (f"  {entry['error']}" if "error" in entry else ""))
+    return results
+
+
+def run_worker():
+    results = {"snapshots": build_snapshots() if BACKEND != "sql" else None}
+    results["pages"] = run_pages()
+    return results
+
+
+def run_scale(rows):
+    """Generate the data for one scale and time the pages in a fresh process."""
+    from benchmarks import synthetic
+
+    database = DATA_DIR / f"tvetmis_{rows}.sqlite"
+    if not database.exists():
+        synthetic.generate(rows, database)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / "result.json"
+        env = dict(
+            os.environ,
+            TVETMIS_DB_URL=f"sqlite:///{database.as_posix()}",
+            TVETMIS_WARMUP="0",
+            # Empty, so pages read the database; the worker fills it for duckdb and polars
+            TVETMIS_SNAPSHOT_DIR=str(Path(tmp) / "snapshots"),
+        )
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", "--worker", str(output)],
+            cwd=ROOT, env=env, check=True,
+        )
+        return json.loads(output.read_text())
+
+
+def main(scales):
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": BACKEND,  # requested; the "queries" of each stage show what served it
+        "scales": {},
+    }
+    for rows in scales:
+        print(f"[benchmark] ---- {rows:,} rows ----")
+        report["scales"][str(rows)] = run_scale(rows)
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f"{time.strftime('%Y%m%dT%H%M%S')}.json"
+    path.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"[benchmark] results written to {path}")
+    return path
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--worker"]:
+        sys.path.insert(0, str(ROOT))
+        Path(sys.argv[2]).write_text(json.dumps(run_worker()))
+    else:
+        main([int(rows) for rows in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
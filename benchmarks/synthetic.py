@@ -0,0 +1,234 @@
+# Schema-faithful synthetic data for every dashboard table, written to a SQLite file.
+#
+#     python -m benchmarks.synthetic 100000 benchmarks/data/tvetmis_100000.sqlite
+#
+# Column names, codes and label cardinalities follow what the pages read: 25 provinces,
+# 300 Khmer school names, 84 majors in 12 sectors, the codes of the status dictionaries,
+# and a share of NULLs and 0000-00-00 dates like the production data.
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+# ---- Cardinalities ----
+PROVINCES = [
+    "Phnom Penh", "Siem Reap", "Battambang", "Banteay Meanchey", "Kampong Cham",
+    "Kampong Chhnang", "Kampong Speu", "Kampong Thom", "Kampot", "Kandal", "Koh Kong",
+    "Kratie", "Mondulkiri", "Oddar Meanchey", "Pailin", "Preah Sihanouk", "Preah Vihear",
+    "Prey Veng", "Pursat", "Ratanakiri", "Stung Treng", "Svay Rieng", "Takeo",
+    "Tboung Khmum", "Kep",
+]
+SCHOOL_TYPES = ["វិទ្យាស្ថានបច្ចេកទេស", "មជ្ឈមណ្ឌលបណ្តុះបណ្តាលវិជ្ជាជីវៈ", "សាលាបច្ចេកទេស", "វិទ្យាល័យបច្ចេកទេស"]
+SCHOOLS_PER_PROVINCE = 12
+SECTORS = [
+    "កសិកម្ម", "សំណង់", "អគ្គិសនី", "មេកានិច", "ព័ត៌មានវិទ្យា", "ទេសចរណ៍",
+    "បដិសណ្ឋារកិច្ច", "វាយនភណ្ឌ", "ពាណិជ្ជកម្ម", "សុខាភិបាល", "ម្ហូបអាហារ", "សិប្បកម្ម",
+]
+MAJORS_PER_SECTOR = 7
+GENDERS = ["male", "female"]
+SHIFTS = ["ព្រឹក", "រសៀល", "ល្ងាច", "ចុងសប្តាហ៍"]
+STATUSES = [1, 0, 3, 2, 4, 5, 8, 9]
+SCHOLARSHIP_STATUSES = [1, 0, 3, 2, 4, 5, 8, 9, -3, -2, -8, -9, 10, 11, 7, 6]
+MARITAL_STATUSES = ["single", "married", "divorce", "widow"]  # erpl_candidate stores text codes
+MARITAL_STATUS_CODES = [1, 2, 3, 4]  # tvetsms_data stores the keys of tvetsms.marital_statuses
+POVERTY_STATUSES = ["NEAR_POOR", "NOT_POOR", "POOR_1", "POOR_2"]
+PARTNER_TYPES = [5, 1, 3]
+PARTNER_KINDS = ["ជាមួយវិស័យឯកជន", "ក្នុងប្រទេស", "ក្រៅប្រទេស"]
+ROLES = ["នាយក", "នាយករង", "គ្រូបង្រៀន", "បុគ្គលិករដ្ឋបាល", "គណនេយ្យករ", "បណ្ណារក្ស", "អ្នកសម្របសម្រួល"]
+EMPLOYMENT_TYPES = ["មន្ត្រីរាជការ", "កិច្ចសន្យា", "ស្ម័គ្រចិត្ត"]
+BUSINESSES = [f"អាជីវកម្ម {i}" for i in range(1, 41)]
+POSITIONS = [f"មុខតំណែង {i}" for i in range(1, 61)]
+
+NULL_SHARE = 0.02
+INVALID_DATE_SHARE = 0.005
+
+
+def schools():
+    """(school, province) pairs; each school belongs to one province."""
+    return [
+        (f"{SCHOOL_TYPES[i % len(SCHOOL_TYPES)]}{province} {i + 1}", province)
+        for province in PROVINCES
+        for i in range(SCHOOLS_PER_PROVINCE)
+    ]
+
+
+def majors():
+    """(major, sector) pairs; each major belongs to one sector."""
+    return [(f"ជំនាញ{sector} {i + 1}", sector) for sector in SECTORS for i in range(MAJORS_PER_SECTOR)]
+
+
+class Generator:
+    def __init__(self, seed=0):
+        self.rng = np.random.default_rng(seed)
+
+    def choice(self, values, rows, null_share=NULL_SHARE):
+        picked = pd.Series(self.rng.choice(np.array(values, dtype=object), rows))
+        if null_share:
+            picked[self.rng.random(rows) < null_share] = None
+        return picked
+
+    def dates(self, rows, start, end, invalid_share=INVALID_DATE_SHARE):
+        start, end = pd.Timestamp(start).value // 10 ** 9, pd.Timestamp(end).value // 10 ** 9
+        seconds = self.rng.integers(start, end, rows)
+        text_dates = pd.Series(pd.to_datetime(seconds, unit="s").strftime("%Y-%m-%d %H:%M:%S"), dtype=object)
+        text_dates[self.rng.random(rows) < invalid_share] = "0000-00-00 00:00:00"
+        return text_dates
+
+    def pairs(self, pairs, rows):
+        picked = self.rng.integers(0, len(pairs), rows)
+        return [pairs[i][0] for i in picked], [pairs[i][1] for i in picked]
+
+
+# ---- Tables ----
+def tvet15m(gen, rows):
+    school, province = gen.pairs(schools(), rows)
+    major, _ = gen.pairs(majors(), rows)
+    created_at = gen.dates(rows, "2022-01-01", "2025-06-30")
+    return pd.DataFrame({
+        "id": np.arange(1, rows + 1),
+        "gender": gen.choice(GENDERS, rows),
+        "apply_major_name": major,
+        "school_name": school,
+        "rtimeline_created_at": created_at,
+        "updated_at": created_at,
+        "date_of_birth": gen.dates(rows, "1975-01-01", "2008-12-31"),
+        "address_city_province_name": province,
+        "has_job": gen.choice([0, 1], rows),
+        "scholarship_status": gen.choice(SCHOLARSHIP_STATUSES, rows),
+        "average_attendance": gen.rng.integers(0, 101, rows),
+        "shift_name": gen.choice(SHIFTS, rows),
+        "income": gen.rng.integers(50, 1500, rows),
+        "position": gen.choice(POSITIONS, rows, null_share=0.5),
+    })
+
+
+def tvetsms_data(gen, rows):
+    school, province = gen.pairs(schools(), rows)
+    major, sector = gen.pairs(majors(), rows)
+    return pd.DataFrame({
+        "id": np.arange(1, rows + 1),
+        "gender": gen.choice(GENDERS, rows),
+        "date_of_birth": gen.dates(rows, "1985-01-01", "2008-12-31"),
+        "address_city_provinces": province,
+        "school_name": school,
+        "sector_name": sector,
+        "apply_major_name": major,
+        "status": gen.choice(STATUSES, rows),
+        "marital_status": gen.choice(MARITAL_STATUS_CODES, rows),
+    })
+
+
+def school_staff(gen, rows):
+    school, province = gen.pairs(schools(), rows)
+    return pd.DataFrame({
+        "id": np.arange(1, rows + 1),
+        "gender": gen.choice(GENDERS, rows),
+        "date_of_birth": gen.dates(rows, "1960-01-01", "2000-12-31"),
+        "address_city_provinces": province,
+        "role_name": gen.choice(ROLES, rows),
+        "status": gen.choice(STATUSES, rows),
+        "schools_name": school,
+        "employment_type_name": gen.choice(EMPLOYMENT_TYPES, rows),
+        "start_work_at": gen.dates(rows, "1990-01-01", "2025-01-01"),
+        "is_teaching": gen.choice([0, 1, 1, 1], rows, null_share=0),
+    })
+
+
+def tvet_staff(gen, rows):
+    return pd.DataFrame({
+        "id": np.arange(1, rows + 1),
+        "gender": gen.choice(GENDERS, rows),
+        "date_of_birth": gen.dates(rows, "1960-01-01", "2000-12-31"),
+        "address_city_provinces": gen.choice(PROVINCES, rows),
+        "role_name": gen.choice(ROLES, rows),
+        "status": gen.choice(STATUSES, rows),
+    })
+
+
+def development_partners(gen, rows):
+    school, province = gen.pairs(schools(), rows)
+    return pd.DataFrame({
+        "id": np.arange(1, rows + 1),
+        "city_province_name": province,
+        "school_name": school,
+        "type_development_partners": gen.choice(PARTNER_KINDS, rows),
+        "business": gen.choice(BUSINESSES, rows),
+        "status": gen.choice(STATUSES, rows),
+    })
+
+
+def student_internships_15m(gen, rows):
+    school, province = gen.pairs(schools(), rows)
+    major, _ = gen.pairs(majors(), rows)
+    return pd.DataFrame({
+        "id": np.arange(1, rows + 1),
+        "gender": gen.choice(GENDERS, rows),
+        "province_name": province,
+        "school_name": school,
+        "major_name": major,
+        "internship_pass_fail": gen.choice([0, 1], rows),
+        "poverty_status": gen.choice(POVERTY_STATUSES, rows, null_share=0.2),
+        "partner_type": gen.choice(PARTNER_TYPES, rows),
+        "partner_name": gen.choice(BUSINESSES, rows),
+    })
+
+
+def erpl_candidate(gen, rows):
+    return pd.DataFrame({
+        "id": np.arange(1, rows + 1),
+        "gender": gen.choice(GENDERS, rows),
+        "date_of_birth": gen.dates(rows, "1970-01-01", "2006-12-31"),
+        "marital_status": gen.choice(MARITAL_STATUSES, rows),
+        "verified": gen.choice([0, 1], rows, null_share=0),
+        "address_city_provinces": gen.choice(PROVINCES, rows),
+    })
+
+
+# (generator, share of the requested row count); staff and partner tables are small
+TABLES = {
+    "tvet15m": (tvet15m, 1.0),
+    "tvetsms_data": (tvetsms_data, 1.0),
+    "student_internships_15m": (student_internships_15m, 1.0),
+    "erpl_candidate": (erpl_candidate, 0.1),
+    "school_staff": (school_staff, 0.02),
+    "tvet_staff": (tvet_staff, 0.005),
+    "development_partners": (development_partners, 0.005),
+}
+
+# The landing page reads the 15-million program through its own table name
+VIEWS = {
+    "tvet15m_data": "SELECT *, address_city_province_name AS province_name FROM tvet15m",
+}
+
+
+def generate(rows, path, seed=0, chunksize=100_000):
+    """Write every table at the given scale to a SQLite file and return its URL."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        path.unlink()
+    url = f"sqlite:///{path.as_posix()}"
+    engine = create_engine(url)
+    gen = Generator(seed)
+    for table, (make, share) in TABLES.items():
+        start = time.perf_counter()
+        count = max(int(rows * share), 50)
+        make(gen, count).to_sql(table, engine, index=False, chunksize=chunksize)
+        with engine.begin() as connection:
+            connection.execute(text(f"CREATE INDEX ix_{table}_id ON {table} (id)"))
+        print(f"[synthetic] {table:<25} {count:>10,} rows  {time.perf_counter() - start:6.1f}s")
+    with engine.begin() as connection:
+        for view, query in VIEWS.items():
+            connection.execute(text(f"CREATE VIEW {view} AS {query}"))
+    engine.dispose()
+    return url
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    target = sys.argv[2] if len(sys.argv) > 2 else f"benchmarks/data/tvetmis_{rows}.sqlite"
+    print(generate(rows, target))
@@ -0,0 +1,38 @@
+import pandas as pd
+
+from sql_aggregates import count_by
+
+# ---- Count Cube ----
+# One GROUP BY over every dimension a page filters or charts on. Each KPI and chart is
+# then a roll-up of the cube (filter its rows, group by fewer columns, sum the counts),
+# so reruns cost the same however many rows the table holds.
+
+
+class CountCube:
+    def __init__(self, counts, dimensions):
+        self.dimensions = list(dimensions)
+        self.frame = counts
+        self.cells = len(counts)
+
+    def _mask(self, filters):
+        mask = pd.Series(True, index=self.frame.index)
+        for column, values in (filters or {}).items():
+            if values:
+                mask &= self.frame[column].isin(values)
+        return mask
+
+    def count_by(self, columns, filters=None):
+        """Same shape as sql_aggregates.count_by: the columns plus a count column."""
+        cells = self.frame[self._mask(filters)]
+        # dropna=False keeps the NULL group, as GROUP BY does
+        counts = cells.groupby(list(columns), dropna=False, observed=True)["count"].sum()
+        return counts.reset_index()
+
+    def total(self, filters=None):
+        return int(self.frame.loc[self._mask(filters), "count"].sum())
+
+
+def build(table, dimensions, fill=None, where=None):
+    counts = count_by(table, list(dimensions), fill=fill, where=where)
+    counts["count"] = counts["count"].astype("int64")
+    return CountCube(counts, dimensions)
@@ -0,0 +1,225 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# ---- Refresh Settings ----
+DEFAULT_TTL = int(os.environ.get("TVETMIS_REFRESH_INTERVAL", 600))  # seconds before a dataset is reloaded
+DEFAULT_MAX_BYTES = int(os.environ.get("TVETMIS_DATASET_MAX_MB", 512)) * 1024 ** 2
+# All datasets together; the least recently read idle ones are evicted above it
+TOTAL_MAX_BYTES = int(os.environ.get("TVETMIS_DATASTORE_MAX_MB", 2048)) * 1024 ** 2
+IDLE_SECONDS = int(os.environ.get("TVETMIS_DATASET_IDLE", 60))  # unread this long before it may be evicted
+WORKERS = int(os.environ.get("TVETMIS_REFRESH_WORKERS", 2))
+POLL = 5  # seconds the scheduler sleeps when nothing is requested
+
+
+def frame_bytes(frame):
+    if isinstance(frame, tuple):  # e.g. (cube, hierarchy) of tvetsms
+        return sum(frame_bytes(part) for part in frame)
+    frame = getattr(frame, "frame", frame)  # objects built around a frame, such as cube.Cube
+    try:
+        return int(frame.memory_usage(deep=True).sum())
+    except AttributeError:
+        return 0
+
+
+class Dataset:
+    def __init__(self, name, loader, ttl, max_bytes, on_invalidate=None, extra_bytes=None):
+        self.name = name
+        self.loader = loader
+        self.on_invalidate = on_invalidate
+        self.extra_bytes = extra_bytes
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.frame = None
+        self.current = (None, 0)  # (frame, version), swapped together for get_versioned()
+        self.frame_bytes = 0
+        self.loaded_at = 0.0
+        self.last_read = 0.0
+        self.load_seconds = 0.0
+        self.version = 0
+        self.last_error = None
+        self.refreshing = False
+        self.refresh_requested = False
+        self.load_lock = threading.Lock()
+
+
+_datasets = {}
+_registry_lock = threading.Lock()
+_wake = threading.Event()
+_scheduler = None
+
+
+def register(name, loader, ttl=None, max_bytes=None, on_invalidate=None, extra_bytes=None):
+    """Register a page loader; safe to call on every import of the page module.
+
+    ttl is how old the data may get before the scheduler reloads it, max_bytes the
+    memory the dataset may hold once it has been idle for IDLE_SECONDS. on_invalidate
+    runs when the frame is dropped, for loaders that keep their own reference to it
+    (e.g. an IncrementalTable), so the memory is really freed. extra_bytes returns the
+    memory the loader builds next to the frame (e.g. its filter index), counted in max_bytes.
+    """
+    with _registry_lock:
+        if name in _datasets:
+            dataset = _datasets[name]
+            dataset.loader = loader
+            dataset.ttl = ttl or dataset.ttl
+            dataset.max_bytes = max_bytes or dataset.max_bytes
+            dataset.on_invalidate = on_invalidate or dataset.on_invalidate
+            dataset.extra_bytes = extra_bytes or dataset.extra_bytes
+        else:
+            _datasets[name] = Dataset(name, loader, ttl or DEFAULT_TTL, max_bytes or DEFAULT_MAX_BYTES,
+                                      on_invalidate, extra_bytes)
+    _ensure_scheduler()
+
+
+def _load(dataset):
+    start = time.perf_counter()
+    frame = dataset.loader()
+    # Atomic swap: readers keep the frame they already hold, the next get() sees the new one
+    dataset.frame = frame
+    dataset.frame_bytes = frame_bytes(frame) + (dataset.extra_bytes() if dataset.extra_bytes else 0)
+    dataset.loaded_at = time.time()
+    dataset.load_seconds = time.perf_counter() - start
+    metrics.DATASET_LOAD_SECONDS.observe(dataset.load_seconds, dataset=dataset.name)
+    dataset.version += 1
+    dataset.current = (frame, dataset.version)
+    dataset.last_error = None
+    if dataset.frame_bytes > dataset.max_bytes:
+        logger.warning("%s uses %.0f MB, over its %.0f MB budget",
+                       dataset.name, dataset.frame_bytes / 1024 ** 2, dataset.max_bytes / 1024 ** 2)
+
+
+def get_versioned(name):
+    """(frame, version) of the same load of a dataset. Only the very first call waits
+    for a load; errors are raised.
+
+    Pass the version to cached functions that derive from the frame, so their entries
+    go stale together with the dataset, and only with it. Reading it with version()
+    separately could pair the old frame with the new version of a reload in between.
+    """
+    dataset = _datasets[name]
+    dataset.last_read = time.time()
+    current = dataset.current
+    metrics.CACHE_LOOKUPS.inc(loader=name, result="hit" if current[0] is not None else "miss")
+    if current[0] is None:
+        with dataset.load_lock:
+            if dataset.current[0] is None:
+                _load(dataset)
+            current = dataset.current
+    return current
+
+
+def get(name):
+    """Current frame of a dataset, see get_versioned()."""
+    return get_versioned(name)[0]
+
+
+def version(name):
+    """Version key of a dataset; bumps on every reload or invalidation."""
+    return _datasets[name].version
+
+
+def request_refresh(name):
+    """Ask the scheduler to reload one dataset in the background."""
+    dataset = _datasets.get(name)
+    if dataset is not None:
+        dataset.refresh_requested = True
+        _wake.set()
+
+
+def invalidate(name):
+    """Drop one dataset's frame; the next get() reloads it. Other datasets are untouched."""
+    dataset = _datasets.get(name)
+    if dataset is not None:
+        with dataset.load_lock:
+            dataset.frame = None
+            dataset.frame_bytes = 0
+            dataset.version += 1
+            dataset.current = (None, dataset.version)
+            if dataset.on_invalidate is not None:
+                dataset.on_invalidate()
+
+
+def status():
+    return {
+        name: {
+            "version": d.version,
+            "ttl": d.ttl,
+            "bytes": d.frame_bytes,
+            "max_bytes": d.max_bytes,
+            "loaded_at": d.loaded_at,
+            "load_seconds": d.load_seconds,
+            "refreshing": d.refreshing,
+            "last_error": d.last_error,
+        }
+        for name, d in _datasets.items()
+    }
+
+
+def _background_reload(dataset):
+    try:
+        with dataset.load_lock:
+            _load(dataset)
+    except Exception as e:
+        # Keep serving the previous frame
+        dataset.last_error = str(e)
+        logger.error("refresh of %s failed: %s", dataset.name, e)
+    finally:
+        dataset.refreshing = False
+
+
+def _evict(dataset, reason):
+    logger.info("evicting idle %s (%.0f MB, %s)", dataset.name, dataset.frame_bytes / 1024 ** 2, reason)
+    invalidate(dataset.name)
+
+
+def _enforce_budgets(now):
+    """Free idle datasets over their own max_bytes, then the least recently read idle
+    ones until all datasets together fit in TOTAL_MAX_BYTES. Evicted data is reloaded
+    by the next get()."""
+    idle = [d for d in _datasets.values()
+            if d.frame is not None and not d.refreshing and now - d.last_read >= IDLE_SECONDS]
+    for dataset in idle:
+        if dataset.frame_bytes > dataset.max_bytes:
+            _evict(dataset, f"over its {dataset.max_bytes / 1024 ** 2:.0f} MB budget")
+    total = sum(d.frame_bytes for d in _datasets.values())
+    for dataset in sorted(idle, key=lambda d: d.last_read):
+        if total <= TOTAL_MAX_BYTES:
+            break
+        if dataset.frame is not None:
+            total -= dataset.frame_bytes
+            _evict(dataset, f"datastore over its {TOTAL_MAX_BYTES / 1024 ** 2:.0f} MB budget")
+    if total > TOTAL_MAX_BYTES:
+        logger.warning("%.0f MB in use by datasets read in the last %ss, over the %.0f MB budget",
+                       total / 1024 ** 2, IDLE_SECONDS, TOTAL_MAX_BYTES / 1024 ** 2)
+
+
+def _scheduler_loop():
+    pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="refresh")
+    while True:
+        now = time.time()
+        _enforce_budgets(now)
+        for dataset in list(_datasets.values()):
+            # Datasets nobody has read yet (or evicted ones) are loaded on first get(), not here
+            if dataset.frame is None or dataset.refreshing:
+                continue
+            if dataset.refresh_requested or now - dataset.loaded_at >= dataset.ttl:
+                dataset.refresh_requested = False
+                dataset.refreshing = True
+                pool.submit(_background_reload, dataset)
+        _wake.wait(timeout=POLL)
+        _wake.clear()
+
+
+def _ensure_scheduler():
+    global _scheduler
+    with _registry_lock:
+        if _scheduler is None:
+            _scheduler = threading.Thread(target=_scheduler_loop, name="datastore-refresh", daemon=True)
+            _scheduler.start()
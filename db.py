@@ -0,0 +1,273 @@
+import logging
+import os
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+from sqlalchemy import bindparam, create_engine, event, inspect, text
+from sqlalchemy.engine import URL
+from sqlalchemy.pool import QueuePool
+
+import metrics
+import snapshots
+
+logger = logging.getLogger(__name__)
+
+# ---- Database Connection ----
+# Every page shares this one engine (and therefore one connection pool).
+# All settings can be overridden from the environment.
+DB_USER = os.environ.get("TVETMIS_DB_USER", "root")
+DB_PASSWORD = os.environ.get("TVETMIS_DB_PASSWORD", "")
+DB_HOST = os.environ.get("TVETMIS_DB_HOST", "localhost")
+DB_PORT = int(os.environ.get("TVETMIS_DB_PORT", 3306))
+DB_NAME = os.environ.get("TVETMIS_DB_NAME", "tvetm")
+
+# Full SQLAlchemy URL, takes priority over the settings above (e.g. a local SQLite file)
+DB_URL = os.environ.get("TVETMIS_DB_URL")
+
+# ---- Pool Settings ----
+POOL_SIZE = int(os.environ.get("TVETMIS_DB_POOL_SIZE", 5))
+MAX_OVERFLOW = int(os.environ.get("TVETMIS_DB_MAX_OVERFLOW", 10))
+POOL_TIMEOUT = int(os.environ.get("TVETMIS_DB_POOL_TIMEOUT", 30))  # seconds to wait for a free connection
+POOL_RECYCLE = int(os.environ.get("TVETMIS_DB_POOL_RECYCLE", 1800))  # stay below MySQL's wait_timeout
+POOL_PRE_PING = os.environ.get("TVETMIS_DB_POOL_PRE_PING", "1") not in ("0", "false", "False")
+CONNECT_TIMEOUT = int(os.environ.get("TVETMIS_DB_CONNECT_TIMEOUT", 10))
+READ_TIMEOUT = int(os.environ.get("TVETMIS_DB_READ_TIMEOUT", 120))
+
+_engine = None
+_engine_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {
+    "checkouts": 0,
+    "in_use": 0,
+    "max_in_use": 0,
+    "wait_total_s": 0.0,
+    "wait_max_s": 0.0,
+    "connects": 0,
+}
+
+
+class _TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        conn = super()._do_get()
+        waited = time.perf_counter() - start
+        with _stats_lock:
+            _stats["wait_total_s"] += waited
+            _stats["wait_max_s"] = max(_stats["wait_max_s"], waited)
+        return conn
+
+
+def _on_connect(dbapi_connection, connection_record):
+    with _stats_lock:
+        _stats["connects"] += 1
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    with _stats_lock:
+        _stats["checkouts"] += 1
+        _stats["in_use"] += 1
+        _stats["max_in_use"] = max(_stats["max_in_use"], _stats["in_use"])
+
+
+def _on_checkin(dbapi_connection, connection_record):
+    with _stats_lock:
+        _stats["in_use"] = max(_stats["in_use"] - 1, 0)
+
+
+def database_url():
+    if DB_URL:
+        return DB_URL
+    return URL.create(
+        "mysql+pymysql",
+        username=DB_USER,
+        password=DB_PASSWORD,
+        host=DB_HOST,
+        port=DB_PORT,
+        database=DB_NAME,
+    )
+
+
+def get_engine():
+    """Return the process-wide engine, creating it on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                url = database_url()
+                connect_args = {}
+                if str(url).startswith("mysql"):
+                    connect_args = {"connect_timeout": CONNECT_TIMEOUT, "read_timeout": READ_TIMEOUT, "charset": "utf8mb4"}
+
+                engine = create_engine(
+                    url,
+                    poolclass=_TimedQueuePool,
+                    pool_size=POOL_SIZE,
+                    max_overflow=MAX_OVERFLOW,
+                    pool_timeout=POOL_TIMEOUT,
+                    pool_recycle=POOL_RECYCLE,
+                    pool_pre_ping=POOL_PRE_PING,
+                    connect_args=connect_args,
+                )
+                event.listen(engine, "connect", _on_connect)
+                event.listen(engine, "checkout", _on_checkout)
+                event.listen(engine, "checkin", _on_checkin)
+                _engine = engine
+    return _engine
+
+
+def pool_stats():
+    """Snapshot of the pool metrics, used to size POOL_SIZE / MAX_OVERFLOW."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["avg_wait_s"] = stats["wait_total_s"] / stats["checkouts"] if stats["checkouts"] else 0.0
+    stats["pool_size"] = POOL_SIZE
+    stats["max_overflow"] = MAX_OVERFLOW
+    if _engine is not None:
+        stats["pool_status"] = _engine.pool.status()
+    return stats
+
+
+def read_sql(query, params=None, table="other", connection=None):
+    """pd.read_sql on the shared engine, recorded in the query metrics under table."""
+    with metrics.query("sql", table) as result:
+        df = pd.read_sql(query, connection if connection is not None else get_engine(), params=params)
+        result["rows"] = len(df)
+    return df
+
+
+# ---- Column Projection ----
+# Page loaders fetch only the columns their charts and filters use (the page's
+# COLUMNS manifest); widgets.raw_data_table loads the rest on demand for the rows shown.
+def select_query(table, columns, where=None):
+    query = f"SELECT {', '.join(columns)} FROM {table}"
+    if where:
+        query += f" WHERE {where}"
+    return query
+
+
+def available_columns(table, columns):
+    """The manifest columns the table has; missing ones are logged and left out of the SELECT."""
+    existing = set(table_columns(table))
+    missing = [c for c in columns if c not in existing]
+    if missing:
+        logger.warning("%s has no column %s; not fetched", table, ", ".join(missing))
+    return [c for c in columns if c in existing]
+
+
+def load_columns(table, columns, where=None):
+    """Fetch only the listed columns instead of SELECT *, from a fresh snapshot when there is one."""
+    columns = available_columns(table, columns)
+    df = snapshots.read_snapshot(table, columns, where)
+    if df is not None:
+        return df
+    return read_sql(select_query(table, columns, where), table=table)
+
+
+def table_columns(table):
+    if snapshots.SNAPSHOT_ONLY:
+        columns = snapshots.snapshot_columns(table)
+        if columns is not None:
+            return columns
+    return [column["name"] for column in inspect(get_engine()).get_columns(table)]
+
+
+def load_remaining_columns(table, columns, keys, key="id", chunksize=5_000):
+    """Fetch the key plus every column not in the page's manifest, only for the given keys.
+
+    The keys are sent in chunks of chunksize (key IN (...)), so the query never reads
+    more rows than the page is showing.
+    """
+    selected = [key] + [c for c in table_columns(table) if c not in columns and c != key]
+    keys = pd.unique(pd.Series(keys).dropna()).tolist()
+    df = snapshots.read_snapshot(table, selected, key_in=(key, keys))
+    if df is not None:
+        return df
+    statement = text(select_query(table, selected, f"{key} IN :keys")).bindparams(bindparam("keys", expanding=True))
+    chunks = [read_sql(statement, {"keys": keys[i:i + chunksize]}, table=table)
+              for i in range(0, len(keys), chunksize)]
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=selected)
+
+
+# ---- Chunked Loading ----
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # ru_maxrss is in KiB on Linux
+
+
+def apply_dtypes(df, dtypes):
+    for column, dtype in (dtypes or {}).items():
+        if column in df.columns:
+            if dtype == "category":
+                df[column] = df[column].astype("category")
+            else:
+                converted = pd.to_numeric(df[column], errors="coerce")
+                # A wrong schema (e.g. Int8 for a text column) must not quietly erase data
+                lost = int(converted.isna().sum() - df[column].isna().sum())
+                if lost and converted.notna().sum() == 0:
+                    raise ValueError(f"{column}: no value is numeric, {dtype} is the wrong dtype for it")
+                if lost:
+                    logger.warning("%s: %s non-numeric values became NA when cast to %s", column, f"{lost:,}", dtype)
+                df[column] = converted.astype(dtype)
+    return df
+
+
+def concat_frames(chunks):
+    """Concatenate frames with the same columns; categoricals stay categoricals."""
+    if not chunks:
+        return pd.DataFrame()
+    columns = {}
+    for column in chunks[0].columns:
+        parts = [chunk[column] for chunk in chunks]
+        if isinstance(parts[0].dtype, pd.CategoricalDtype):
+            # Plain concat would fall back to object when chunk categories differ; sorted,
+            # because the filter index lists options in category order. Ordered ones (e.g.
+            # derived income bands) have fixed categories and keep their order
+            ordered = parts[0].dtype.ordered
+            columns[column] = pd.Categorical(union_categoricals([p.array for p in parts], sort_categories=not ordered))
+        else:
+            columns[column] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def load_columns_chunked(table, columns, dtypes=None, where=None, chunksize=50_000):
+    """Stream the projection in chunks, casting each chunk before it is kept.
+
+    A server-side cursor keeps pymysql from buffering the whole result set, and the
+    compact dtypes are applied per chunk, so peak memory stays close to the final frame.
+    Load statistics are stored in df.attrs["load_stats"].
+    """
+    start = time.perf_counter()
+    columns = available_columns(table, columns)
+    df = snapshots.read_snapshot(table, columns, where)
+    if df is not None:
+        df = apply_dtypes(df, dtypes)
+        chunk_count = 0
+    else:
+        chunks = []
+        with metrics.query("sql", table) as result, get_engine().connect().execution_options(stream_results=True) as conn:
+            for chunk in pd.read_sql(select_query(table, columns, where), conn, chunksize=chunksize):
+                chunks.append(apply_dtypes(chunk, dtypes))
+            result["rows"] = sum(len(chunk) for chunk in chunks)
+        chunk_count = len(chunks)
+        df = concat_frames(chunks)
+        del chunks
+
+    df.attrs["load_stats"] = {
+        "rows": len(df),
+        "chunks": chunk_count,
+        "seconds": time.perf_counter() - start,
+        "frame_bytes": int(df.memory_usage(deep=True).sum()),
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+    return df
@@ -0,0 +1,54 @@
+import pandas as pd
+
+# ---- Derived Columns ----
+# Columns computed once inside a dataset's fetch (and again only when the datastore
+# reloads it), so reruns caused by widgets only filter and aggregate.
+# Each dataset keeps an ordered list of (column, function(df) -> Series); a function
+# may replace an existing column, e.g. to parse a date column in place.
+_registry = {}
+
+
+def register(dataset, column, function):
+    """Register a derived column; safe to call on every import of the page module."""
+    columns = _registry.setdefault(dataset, {})
+    columns[column] = function
+
+
+def apply_derived(df, dataset):
+    for column, function in _registry.get(dataset, {}).items():
+        df[column] = function(df)
+    return df
+
+
+# ---- Helpers ----
+# Monthly income ranges of the tvet15m / graduated income charts: 50-99 ... 1450-1499
+INCOME_BANDS = list(range(50, 1551, 50))
+INCOME_BAND_LABELS = [f"{i}-{i + 49}" for i in INCOME_BANDS[:-1]]
+
+
+def parse_date(column, format=None):
+    return lambda df: pd.to_datetime(df[column], format=format, errors="coerce")
+
+
+def age_by_year(column="date_of_birth"):
+    """Current year minus birth year, 0 when the birth date is missing."""
+    return lambda df: (pd.Timestamp.today().year - df[column].dt.year).fillna(0)
+
+
+def age_by_days(column="date_of_birth"):
+    """Completed years since the birth date, NaN when it is missing."""
+    return lambda df: (pd.Timestamp.now() - df[column]).dt.days // 365
+
+
+def numeric(column):
+    return lambda df: pd.to_numeric(df[column], errors="coerce")
+
+
+def band(column, bins, labels):
+    """Bucket a numeric column into the labelled ranges [bins[i], bins[i + 1])."""
+    return lambda df: pd.cut(df[column], bins=bins, labels=labels, right=False)
+
+
+def label(column, labels):
+    """Map codes to display labels (as a categorical), e.g. status 1 -> "ACTIVE"."""
+    return lambda df: df[column].map(labels).astype("category")
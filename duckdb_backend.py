@@ -0,0 +1,52 @@
+import os
+import threading
+
+try:
+    import duckdb
+except ImportError:  # the backend is optional, aggregates fall back to MySQL
+    duckdb = None
+
+import snapshots
+
+# ---- DuckDB Settings ----
+# TVETMIS_BACKEND=duckdb runs the aggregate queries in an embedded DuckDB over the
+# Parquet snapshots (vectorized, on every core) instead of sending them to MySQL.
+ENABLED = os.environ.get("TVETMIS_BACKEND", "sql").lower() == "duckdb"
+THREADS = int(os.environ.get("TVETMIS_DUCKDB_THREADS", os.cpu_count() or 4))
+MEMORY_LIMIT = os.environ.get("TVETMIS_DUCKDB_MEMORY_LIMIT", "2GB")
+
+_connection = None
+_lock = threading.Lock()
+
+
+def available(table):
+    """True when queries on table should run in DuckDB: enabled, installed and a fresh snapshot."""
+    return ENABLED and duckdb is not None and snapshots.enabled() and snapshots.is_fresh(table)
+
+
+def source(table):
+    """FROM clause reading the latest snapshot of a table."""
+    path = snapshots.latest_path(table).as_posix().replace("'", "''")
+    return f"read_parquet('{path}')"
+
+
+def get_connection():
+    global _connection
+    if _connection is None:
+        with _lock:
+            if _connection is None:
+                connection = duckdb.connect(":memory:")
+                connection.execute(f"SET threads = {int(THREADS)}")
+                connection.execute(f"SET memory_limit = '{MEMORY_LIMIT}'")
+                _connection = connection
+    return _connection
+
+
+def run(query, params=None):
+    """Run a query with $name parameters and return a DataFrame."""
+    # A cursor per call: DuckDB connections must not be shared across threads
+    cursor = get_connection().cursor()
+    try:
+        return cursor.execute(query, params or {}).df()
+    finally:
+        cursor.close()
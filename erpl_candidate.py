@@ -2,28 +2,39 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from matplotlib.colors import LinearSegmentedColormap
-from sqlalchemy import create_engine
+import derived
+import datastore
+import perf
+import metrics
+from db import load_columns
+import schemas
+from widgets import raw_data_table
 from wordcloud import WordCloud
 import matplotlib.pyplot as plt
 
-# ---- Database Connection ----
-DB_USER = "root"
-DB_PASSWORD = ""
-DB_HOST = "localhost"
-DB_NAME = "tvetm"
+# ---- Column Manifest ----
+TABLE = "erpl_candidate"
+COLUMNS = [
+    "id", "gender", "date_of_birth", "marital_status",
+    "verified", "address_city_provinces",
+]
 
-engine = create_engine(f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}")
+@perf.timed("erpl_candidate.fetch")
+def fetch_data():
+    df = load_columns(TABLE, COLUMNS)
+    df.fillna({"gender": "Unknown"}, inplace=True)
+    return derived.apply_derived(schemas.apply_schema(df, TABLE), "erpl_candidate")
+
+datastore.register("erpl_candidate", fetch_data, ttl=1800, max_bytes=64 * 1024 ** 2)
 
 def load_data():
     """Fetch data from MySQL and ensure all data is displayed correctly."""
-    query = "SELECT * FROM erpl_candidate"  # Replace with your actual table name
     try:
-        df = pd.read_sql(query, engine)
+        df = datastore.get("erpl_candidate")
     except Exception as e:
         st.error(f"Error loading data: {e}")
         return pd.DataFrame()  # Return empty DataFrame to avoid further errors
 
-    df.fillna({"gender": "Unknown"}, inplace=True)
     return df
     
 # Dictionary of marital statuses
@@ -34,71 +45,18 @@ marital_statuses = {
     "widow": "មេម៉ាយ"
 }
 
-def set_css():
-    st.markdown("""
-        <style>
-            @font-face {
-                font-family: 'Khmer OS Battambang';
-                src: url('path/to/KhmerOSBattambang-Regular.ttf') format('truetype'); /* Replace with the actual path */
-                font-weight: normal;
-                font-style: normal;
-            }
-            * {
-                font-family: 'Khmer OS Battambang', sans-serif !important;
-            }
-            body {
-                background-color: #f7f9fc;
-            }
-            /* Sidebar */
-            .css-1d391kg {
-                background-color: #14213d !important;
-            }
-            .css-1aumxhk {
-                color: white !important;
-            }
-            /* KPI Cards */
-            .kpi-card {
-                padding: 20px;
-                border-radius: 10px;
-                background: #2872f0;
-                box-shadow: 0px 2px 5px rgba(0, 0, 0, 0.2);
-                text-align: center;
-                margin-bottom: 15px;
-                color: white;
-            }
-            .kpi-card h2, .kpi-card h4 {
-                color: white;
-                font-family: 'Khmer OS Battambang', sans-serif;
-            }
-            /* Graph Sections */
-            .graph-section {
-                background-color: #ffffff;
-                padding: 20px;
-                border-radius: 10px;
-                box-shadow: 0px 4px 10px rgba(0, 0, 0, 0.1);
-                margin-bottom: 25px;
-                overflow: hidden;
-            }
-            .plotly-container {
-                width: 100% !important;
-                height: auto !important;
-            }
-            h1, h2, h3, h4, h5, h6, p, span, label, button, input, select, textarea {
-                font-family: 'Khmer OS Battambang', sans-serif !important;
-            }
-        </style>
-    """, unsafe_allow_html=True)
+# ---- Derived Columns ----
+derived.register("erpl_candidate", "date_of_birth", derived.parse_date("date_of_birth"))
+derived.register("erpl_candidate", "age", derived.age_by_year())
+derived.register("erpl_candidate", "marital_status_label", derived.label("marital_status", marital_statuses))
 
+@metrics.timed_page("erpl_candidate")
 def main():
-    set_css()
 
     df = load_data()
+    perf.checkpoint("erpl_candidate.load", rows_out=len(df))
     if df.empty:
         return
-    
-    if "date_of_birth" in df.columns:
-        df["age"] = pd.to_datetime("today").year - pd.to_datetime(df["date_of_birth"], errors="coerce").dt.year
-        df.fillna({"age": 0}, inplace=True)
 
     # Initialize filtered dataframe
     filtered_df = df.copy()  # Start with the original data
@@ -108,6 +66,9 @@ def main():
         st.warning("No data matches your filter criteria.")
         return  # Stop further processing if no data is available after filtering.
 
+    filtered_df = schemas.drop_unused_categories(filtered_df)
+    perf.checkpoint("erpl_candidate.filter", rows_in=len(df), rows_out=len(filtered_df))
+
     # ---- KPI Metrics ----
     total_students = len(filtered_df)  # Use filtered_df for all calculations
     avg_age = int(filtered_df["age"].mean()) if "age" in filtered_df.columns and not filtered_df.empty else 0
@@ -150,8 +111,7 @@ def main():
                     st.plotly_chart(fig_placeholder, use_container_width=True)
 
                 else:
-                    # Map and count
-                    filtered_df["marital_status_label"] = filtered_df["marital_status"].map(marital_statuses)
+                    # Count (labels are mapped at load time)
                     marital_counts = filtered_df["marital_status_label"].value_counts().reset_index()
                     marital_counts.columns = ["Marital Status", "Count"]
 
@@ -238,7 +198,7 @@ def main():
             verified_labels = {0: "រង់ចាំពិនិត្យ", 1: "បានពិនិត្យ"}
 
             # Group by shift_name and gender
-            student_counts = filtered_df.groupby(["verified", "gender"]).size().reset_index(name="count")
+            student_counts = filtered_df.groupby(["verified", "gender"], observed=True).size().reset_index(name="count")
 
             # Map labels
             student_counts["gender"] = student_counts["gender"].map(gender_labels)
@@ -345,12 +305,14 @@ def main():
 
     # ---- Raw Data Preview ----
     st.subheader("ទិន្នន័យជាទម្រង់តារាង")
-    st.dataframe(filtered_df, height=450, use_container_width=True)
+    perf.checkpoint("erpl_candidate.charts")
+    raw_data_table(filtered_df, TABLE, COLUMNS, height=450)
+    perf.checkpoint("erpl_candidate.raw_data")
 
     # ---- Refresh Data Button ----
     if st.button("🔄Refresh Data"):
-        st.cache_data.clear()  # Clear the data cache to force reload
-        st.rerun()  # Use st.rerun() to trigger rerun
+        datastore.request_refresh("erpl_candidate")  # Reloaded in the background; the current data stays on screen
+        st.toast("កំពុងធ្វើបច្ចុប្បន្នភាពទិន្នន័យ...")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,93 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+import schemas
+
+# ---- Filter Index ----
+# Built once per loaded frame: every filterable column is factorized into sorted values
+# and one small integer code per row, in a single pass. A multiselect is then answered
+# with one np.isin over the codes of its column, the columns are ANDed, and the frame
+# is sliced once instead of once per filter.
+
+
+class FilterIndex:
+    def __init__(self, df, columns, text=()):
+        self.frame = df
+        self.rows = len(df)
+        self.codes = {}
+        self.values = {}
+        for column in columns:
+            series = schemas.as_text(df[column]) if column in text else df[column]
+            codes, values = pd.factorize(series, sort=True)  # missing values get code -1
+            # int8 for up to 128 values, int16 up to 32768, ...
+            self.codes[column] = codes.astype(np.min_scalar_type(-max(len(values), 1)))
+            self.values[column] = pd.Index(values)
+
+    @property
+    def nbytes(self):
+        """Memory held by the codes and values, on top of the frame itself."""
+        return sum(codes.nbytes for codes in self.codes.values()) + sum(
+            values.memory_usage(deep=True) for values in self.values.values())
+
+    def rows_with(self, column, selected):
+        """Boolean mask of the rows whose column holds any of the selected values."""
+        wanted = self.values[column].get_indexer(list(selected))
+        return np.isin(self.codes[column], wanted[wanted >= 0])
+
+    def select(self, selections, mask=None):
+        """Boolean row mask for {column: [values]}; empty selections are ignored.
+
+        mask is an optional boolean array for filters that aren't a value list,
+        e.g. a date range.
+        """
+        rows = np.ones(self.rows, dtype=bool)
+        for column, selected in selections.items():
+            if selected:
+                rows &= self.rows_with(column, selected)
+        if mask is not None:
+            rows &= np.asarray(mask, dtype=bool)
+        return rows
+
+    def options(self, column, rows=None):
+        """Sorted distinct values of a column, restricted to the selected rows."""
+        codes = self.codes[column]
+        if rows is not None:
+            codes = codes[rows]
+        present = np.unique(codes)
+        present = present[present >= 0]
+        return list(self.values[column][present])
+
+
+_indexes = {}
+_lock = threading.Lock()
+KEEP = 2  # the served frame and the one a background reload is about to swap in
+
+
+def index_for(dataset, df, columns, text=()):
+    """FilterIndex of a dataset frame, built once per frame.
+
+    Called from the dataset's fetch so the index is ready before the first rerun.
+    """
+    with _lock:
+        indexes = _indexes.setdefault(dataset, [])
+        for index in indexes:
+            if index.frame is df:
+                return index
+        index = FilterIndex(df, columns, text)
+        indexes.append(index)
+        del indexes[:-KEEP]
+        return index
+
+
+def index_bytes(dataset):
+    """Memory held by the indexes of a dataset, for its datastore budget."""
+    with _lock:
+        return sum(index.nbytes for index in _indexes.get(dataset, []))
+
+
+def drop(dataset):
+    """Forget the indexes of a dataset, and with them the frames they reference."""
+    with _lock:
+        _indexes.pop(dataset, None)
@@ -0,0 +1,88 @@
+import hashlib
+import os
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+try:
+    from fontTools import subset
+except ImportError:  # only needed to build the font files, not to serve them
+    subset = None
+
+# ---- Font Settings ----
+# The Khmer font is served from static/ (enableStaticServing in .streamlit/config.toml)
+# instead of Google Fonts, so first paint doesn't wait on an external fetch.
+# Build the files once from the Battambang / Khmer OS Battambang TTFs and commit them:
+#   python fonts.py Battambang-Regular.ttf Battambang-Bold.ttf
+# The deploy step runs `python fonts.py --check`, which fails while they are missing,
+# and so does the app: there is no fallback to Google Fonts.
+FAMILY = "Battambang"
+STATIC_DIR = Path(__file__).parent / "static"
+FONT_DIR = STATIC_DIR / "fonts"
+STATIC_URL = "app/static/fonts"
+WEIGHTS = {400: "battambang-khmer-400.woff2", 700: "battambang-khmer-700.woff2"}
+
+# Khmer, Khmer symbols, Basic Latin, general punctuation (incl. the zero-width
+# characters Khmer text uses) and the dotted circle shown for a lone vowel sign
+UNICODES = "U+1780-17FF,U+19E0-19FF,U+0020-007E,U+00A0,U+2000-206F,U+25CC"
+
+
+def missing():
+    """Paths of the font files that haven't been built."""
+    return [FONT_DIR / file for file in WEIGHTS.values() if not (FONT_DIR / file).exists()]
+
+
+def build(source, weight):
+    """Subset a TTF to UNICODES and write it as WOFF2 for the given weight."""
+    if subset is None:
+        sys.exit("fontTools (and brotli for WOFF2) is required: pip install fonttools brotli")
+    options = subset.Options()
+    options.flavor = "woff2"
+    options.layout_features = ["*"]  # Khmer needs its GSUB/GPOS shaping rules
+    options.name_IDs = ["*"]
+    font = subset.load_font(source, options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=subset.parse_unicodes(UNICODES))
+    subsetter.subset(font)
+    FONT_DIR.mkdir(parents=True, exist_ok=True)
+    path = FONT_DIR / WEIGHTS[weight]
+    subset.save_font(font, path, options)
+    return path
+
+
+@lru_cache(maxsize=None)
+def _version(path):
+    return hashlib.sha1(path.read_bytes()).hexdigest()[:10]
+
+
+def font_face_css():
+    """@font-face rules for the built font files; raises while one is missing.
+
+    The ?v= content hash makes Tornado serve the file with a long-lived Cache-Control
+    header, and a rebuilt font gets a new URL.
+    """
+    absent = missing()
+    if absent:
+        raise RuntimeError(f"missing font files {', '.join(map(str, absent))}; build them with python fonts.py")
+    rules = []
+    for weight, file in WEIGHTS.items():
+        path = FONT_DIR / file
+        rules.append(
+            f"@font-face {{ font-family: '{FAMILY}'; font-style: normal; font-weight: {weight}; "
+            f"font-display: swap; src: url('{STATIC_URL}/{file}?v={_version(path)}') format('woff2'); "
+            f"unicode-range: {UNICODES}; }}"
+        )
+    return "\n".join(rules)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--check"]:
+        absent = missing()
+        for path in absent:
+            print(f"missing {path}")
+        sys.exit(1 if absent else 0)
+    if not sys.argv[1:]:
+        sys.exit("usage: python fonts.py REGULAR.ttf [BOLD.ttf] | python fonts.py --check")
+    for weight, source in zip(WEIGHTS, sys.argv[1:]):
+        path = build(source, weight)
+        print(f"{source} -> {path} ({os.path.getsize(path) / 1024:.0f} KB)")
@@ -1,80 +1,85 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from sqlalchemy import create_engine
+import derived
+import filters
+import datastore
+import perf
+import metrics
+from db import load_columns
+import schemas
+import sql_aggregates
+from widgets import raw_data_table
 from streamlit_lightweight_charts import renderLightweightCharts
 import plotly.graph_objects as go
 
-# ---- Database Connection ----
-DB_USER = "root"
-DB_PASSWORD = ""
-DB_HOST = "localhost"
-DB_NAME = "tvetm"
+# ---- Column Manifest ----
+TABLE = "tvet15m"
+WHERE = "scholarship_status = 8"
+COLUMNS = [
+    "id", "gender", "apply_major_name", "school_name",
+    "rtimeline_created_at", "date_of_birth", "address_city_province_name", "has_job",
+    "scholarship_status", "average_attendance", "shift_name", "income",
+    "position",
+]
+
+# ---- Filter Index ----
+FILTER_COLUMNS = ["school_name", "apply_major_name", "gender", "address_city_province_name", "has_job"]
+FILTER_TEXT_COLUMNS = ["has_job"]  # the multiselect lists these as text
+
+@perf.timed("graduated.fetch")
+def fetch_data():
+    df = schemas.apply_schema(load_columns(TABLE, COLUMNS, WHERE), TABLE)
+    df = derived.apply_derived(df, "graduated")
+    filters.index_for("graduated", df, FILTER_COLUMNS, FILTER_TEXT_COLUMNS)  # ready before the first rerun
+    return df
+
+# ---- Derived Columns ----
+derived.register("graduated", "date_of_birth", derived.parse_date("date_of_birth"))
+derived.register("graduated", "rtimeline_created_at", derived.parse_date("rtimeline_created_at"))
+derived.register("graduated", "age", derived.age_by_year())
+derived.register("graduated", "income", derived.numeric("income"))
+derived.register("graduated", "income_range", derived.band("income", derived.INCOME_BANDS, derived.INCOME_BAND_LABELS))
+
+# The filter index counts in the budget and goes with the frame
+datastore.register("graduated", fetch_data, ttl=1800, max_bytes=256 * 1024 ** 2,
+                   on_invalidate=lambda: filters.drop("graduated"),
+                   extra_bytes=lambda: filters.index_bytes("graduated"))
+
+# ---- Chart Aggregates ----
+# has_job as text, like the filter index
+FILL = {"has_job": "Unknown"}
 
-engine = create_engine(f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}")
+def chart_counts(filtered_df, columns, selections, where):
+    """Counts for a chart: a Polars or DuckDB query on the tvet15m snapshot with
+    TVETMIS_BACKEND=polars or duckdb, otherwise counted from filtered_df. where holds
+    WHERE and the row filters that aren't multiselects (date range, dropped NULLs)."""
+    return sql_aggregates.counts(TABLE, filtered_df, columns, selections, FILL, " AND ".join(where))
+
+def chart_counts_by_year(filtered_df, date_column, columns, selections, where):
+    return sql_aggregates.counts_by_year(TABLE, filtered_df, date_column, columns, selections, FILL, " AND ".join(where))
 
-@st.cache_data
 def load_data():
-    query = "SELECT * FROM tvet15m where scholarship_status = 8"
     try:
-        df = pd.read_sql(query, engine)
+        df = datastore.get("graduated")
     except Exception as e:
         st.error(f"Error loading staff data: {e}")
         return pd.DataFrame()
     return df
 
+@metrics.timed_page("graduated")
 def main():
-    # ---- Custom Khmer Font ----
-    st.markdown(
-        """
-        <style>
-        @import url('https://fonts.googleapis.com/css2?family=Battambang:wght@400;700&display=swap');
-        * {
-            font-family: 'Khmer OS Battambang', sans-serif !important;
-        }
-        </style>
-        """,
-        unsafe_allow_html=True,
-    )
-
     df = load_data()
+    perf.checkpoint("graduated.load", rows_out=len(df))
     if df.empty:
         return
 
-    # Initialize filtered_df with the full dataset
-    filtered_df = df.copy()
-
     # Khmer labels for gender
     gender_dict = {
         "female": "ស្រី",
         "male": "ប្រុស"
     }
 
-    # Define CSS for centering and styling
-    centered_metric_style = """
-    <style>
-    .metric-container {
-        display: flex;
-        flex-direction: column;
-        align-items: center;
-        text-align: center;
-        padding: 0.5em 0; /* Reduced vertical padding */
-    }
-    .metric-value {
-        font-size: 2em;
-        font-weight: bold;
-        margin-top: 0.1em; /* Added top margin */
-    }
-    .metric-label {
-        font-size: 0.9em;
-        color: #555;
-        order: -1; /* Moves the label to the top */
-        margin-bottom: 0.1em; /* Added bottom margin for spacing */
-    }
-    </style>
-    """
-    st.markdown(centered_metric_style, unsafe_allow_html=True)
-
     if df.empty:
         st.warning("រកមិនឃើញទិន្នន័យ")
         return
@@ -82,16 +87,21 @@ def main():
     # Create columns for the filters to appear horizontally
     col1, col2, col3, col4, co5 = st.columns([1.4, 1, 0.5, 0.8, 0.5])
 
+    # ---- Filters ----
+    # Every filter is answered from the filter index; the frame is sliced once at the end
+    index = filters.index_for("graduated", df, FILTER_COLUMNS, FILTER_TEXT_COLUMNS)
+    selections = {}
+    date_mask = None
+    where = [WHERE]
+
     # ---- Date Range Filter with Validation ----
     with st.container(border=True):
         st.subheader("រយៈពេលនៃការចុះឈ្មោះរបស់សិក្ខាកាម")
 
-        # Ensure date column exists and convert to datetime
-        if "rtimeline_created_at" in filtered_df.columns:
-            filtered_df["rtimeline_created_at"] = pd.to_datetime(filtered_df["rtimeline_created_at"], errors="coerce")
-
-            min_date = filtered_df["rtimeline_created_at"].min().date()
-            max_date = filtered_df["rtimeline_created_at"].max().date()
+        # Ensure date column exists (parsed at load time)
+        if "rtimeline_created_at" in df.columns:
+            min_date = df["rtimeline_created_at"].min().date()
+            max_date = df["rtimeline_created_at"].max().date()
 
             # Date input for selecting date range
             date_range = st.date_input(
@@ -108,37 +118,39 @@ def main():
                 if start_date > end_date:
                     st.error("⚠️ កាលបរិច្ឆេទចាប់ផ្ដើមត្រូវតែតិចជាងកាលបរិច្ឆេទបញ្ចប់។ សូមជ្រើសរើសម្តងទៀត។")
                 else:
-                    filtered_df = filtered_df[
-                        (filtered_df["rtimeline_created_at"].dt.date >= start_date) &
-                        (filtered_df["rtimeline_created_at"].dt.date <= end_date)
-                    ]
+                    # Compare datetimes directly rather than building a date object per row
+                    created_at = df["rtimeline_created_at"]
+                    date_mask = (
+                        (created_at >= pd.Timestamp(start_date)) &
+                        (created_at < pd.Timestamp(end_date) + pd.Timedelta(days=1))
+                    ).to_numpy()
+
+                    where.append(sql_aggregates.date_between("rtimeline_created_at", start_date, end_date))
 
-                    if filtered_df.empty:
+                    if not date_mask.any():
                         st.warning("⚠️ គ្មានទិន្នន័យក្នុងចន្លោះកាលបរិច្ឆេទដែលបានជ្រើស។ សូមជ្រើសរើសកាលបរិច្ឆេទផ្សេងទៀត។")
 
     # ---- Filter by Sector ----
     with col1:
-        sector_options = sorted(df["school_name"].unique())  # Unique sector options
+        sector_options = index.options("school_name")  # Unique sector options
         selected_sectors = st.multiselect("គ្រឹះស្ថាន អ.ប.វ.", sector_options)
+        selections["school_name"] = selected_sectors
 
         if selected_sectors:
-            filtered_df = filtered_df[filtered_df["school_name"].isin(selected_sectors)]
-
             # Filter by Major based on selected sectors
-            major_options = sorted(filtered_df[filtered_df["school_name"].isin(selected_sectors)]["apply_major_name"].unique())
-        else: 
-            major_options = sorted(df["apply_major_name"].unique())  # Show all majors if no sector is selected
+            major_options = index.options("apply_major_name", index.select(selections, date_mask))
+        else:
+            major_options = index.options("apply_major_name")  # Show all majors if no sector is selected
 
     # ---- Filter by Major ----
     with col2:
         selected_majors = st.multiselect("ជំនាញ", major_options)
-        if selected_majors:
-            filtered_df = filtered_df[filtered_df["apply_major_name"].isin(selected_majors)]
+        selections["apply_major_name"] = selected_majors
 
     # ---- Gender Filter ----
     with col3:
         gender_mapping = {"female": "ស្រី", "male": "ប្រុស"}  # Mapping English to Khmer
-        gender_options = sorted(df["gender"].unique())
+        gender_options = index.options("gender")
 
         # Convert gender options to Khmer for display
         display_gender_options = [gender_mapping.get(g, g) for g in gender_options]
@@ -147,45 +159,28 @@ def main():
         selected_display_genders = st.multiselect("ភេទ", display_gender_options)
 
         # Convert selected Khmer options back to English for filtering
-        selected_genders = [key for key, value in gender_mapping.items() if value in selected_display_genders]
-
-        if selected_genders:
-            filtered_df = filtered_df[filtered_df["gender"].isin(selected_genders)]
+        selections["gender"] = [key for key, value in gender_mapping.items() if value in selected_display_genders]
 
     # ---- Filter by Province ----
     with col4:
-        # Get Khmer names for provinces
-        #khmer_provinces = [province_coordinates[province]["khmer"] for province in province_coordinates]
-        province_options = sorted(df["address_city_province_name"].unique())  # Unique sector options
-        selected_provinces = st.multiselect("ខេត្ត/ក្រុង", province_options)
-
-        if selected_provinces:
-            filtered_df = filtered_df[filtered_df["address_city_province_name"].isin(selected_provinces)]
-            major_options = sorted(filtered_df[filtered_df["address_city_province_name"].isin(selected_provinces)]["school_name"].unique())
-        else:
-            major_options = sorted(df["school_name"].unique())  # Show all majors if no sector is selected
+        province_options = index.options("address_city_province_name")
+        selections["address_city_province_name"] = st.multiselect("ខេត្ត/ក្រុង", province_options)
 
     # ---- Work Status Filter ----
     with co5:
-        # Get unique has_job options
-        has_job_options = sorted(df["has_job"].astype(str).unique())  # Ensure values are strings for UI
-        selected_job_statuses = st.multiselect("ស្ថានភាពការងារ", has_job_options)
+        has_job_options = index.options("has_job")  # Indexed as strings for the UI
+        selections["has_job"] = st.multiselect("ស្ថានភាពការងារ", has_job_options)
 
-        if selected_job_statuses:
-            filtered_df = filtered_df[filtered_df["has_job"].astype(str).isin(selected_job_statuses)]
-            major_options = sorted(filtered_df[filtered_df["has_job"].astype(str).isin(selected_job_statuses)]["school_name"].unique())
-        else:
-            major_options = sorted(df["school_name"].unique())  # Show all majors if no job status is selected
+    filtered_df = df[index.select(selections, date_mask)]
+
+    filtered_df = schemas.drop_unused_categories(filtered_df)
+    perf.checkpoint("graduated.filter", rows_in=len(df), rows_out=len(filtered_df))
 
     # ---- KPI Metrics ----
     total_students = len(filtered_df)
     total_female = filtered_df[filtered_df["gender"].str.lower() == "female"].shape[0] if "gender" in filtered_df.columns else 0
     #total_internship_pass = filtered_df[filtered_df["internship_pass_fail"] == 1].shape[0]
 
-    if "date_of_birth" in filtered_df.columns:
-        filtered_df["age"] = pd.to_datetime("today").year - pd.to_datetime(df["date_of_birth"], errors="coerce").dt.year
-        filtered_df.fillna({"age": 0}, inplace=True)
-        
     avg_age = int(filtered_df["age"].mean()) if "age" in filtered_df.columns and not filtered_df.empty else 0
 
     hasjob = filtered_df[filtered_df["has_job"] == 1].shape[0]
@@ -220,7 +215,12 @@ def main():
             st.markdown(f'<h4 style="font-family: \'Khmer OS Battambang\', sans-serif;">ការបែងចែកសិស្សតាមភេទ</h4>', unsafe_allow_html=True) 
             
             if "gender" in filtered_df.columns:
-                gender_count = filtered_df["gender"].value_counts()
+                gender_count = (
+                    chart_counts(filtered_df, ["gender"], selections, where)
+                    .dropna(subset=["gender"])
+                    .set_index("gender")["count"]
+                    .sort_values(ascending=False)
+                )
 
                 # Map gender labels using the dictionary
                 gender_labels = [gender_mapping.get(g, g) for g in gender_count.index]
@@ -245,11 +245,10 @@ def main():
                 gender_labels = {"male": "ប្រុស", "female": "ស្រី"}
                 
                 # Group data by age and gender
-                age_distribution = (
-                    filtered_df.groupby(["age", "gender"])
-                    .size()
-                    .reset_index(name="count")
-                )
+                # Counted by birth year, then turned into ages like derived.age_by_year
+                age_distribution = chart_counts_by_year(filtered_df, "date_of_birth", ["gender"], selections, where)
+                age_distribution["age"] = (pd.Timestamp.today().year - age_distribution["birth_year"]).fillna(0)
+                age_distribution = age_distribution.groupby(["age", "gender"], observed=True)["count"].sum().reset_index()
                 age_distribution["gender"] = age_distribution["gender"].map(gender_labels)
                 
                 # Line chart
@@ -277,7 +276,11 @@ def main():
     if "address_city_province_name" in filtered_df.columns:
         with st.container(border=True):
             # Count students per province
-            province_counts = filtered_df["address_city_province_name"].value_counts().reset_index()
+            province_counts = (
+                chart_counts(filtered_df, ["address_city_province_name"], selections, where)
+                .dropna(subset=["address_city_province_name"])
+                .sort_values(by="count", ascending=False)
+            )
             province_counts.columns = ["Province", "ចំនួនសិក្ខាកាម"]
 
             # Format numbers with commas for text labels
@@ -344,12 +347,13 @@ def main():
             if "average_attendance" in filtered_df.columns:
                 # Ensure 'average_attendance' is numeric and drop NaN values
                 filtered_df = filtered_df.dropna(subset=["average_attendance"])
+                where.append("average_attendance IS NOT NULL")
                 
                 # Group data by average_attendance only (without gender)
                 attendance_distribution = (
-                    filtered_df.groupby("average_attendance")
-                    .size()
-                    .reset_index(name="count")
+                    chart_counts(filtered_df, ["average_attendance"], selections, where)
+                    .dropna(subset=["average_attendance"])
+                    .sort_values(by="average_attendance")
                 )
                 
                 if not attendance_distribution.empty:
@@ -389,15 +393,15 @@ def main():
 
             if 'gender_filter' in st.session_state:
                 filtered_df = filtered_df[filtered_df['gender'] == st.session_state.gender_filter]
+                selections["gender"] = [st.session_state.gender_filter]
 
             if 'shift_filter' in st.session_state:
                 filtered_df = filtered_df[filtered_df['shift_name'] == st.session_state.shift_filter]
+                selections["shift_name"] = [st.session_state.shift_filter]
 
             student_counts = (
-                filtered_df
-                .groupby(["shift_name", "gender"])
-                .size()
-                .reset_index(name="count")
+                chart_counts(filtered_df, ["shift_name", "gender"], selections, where)
+                .dropna(subset=["shift_name", "gender"])
             )
             student_counts["gender"] = student_counts["gender"].map(gender_labels)
 
@@ -454,15 +458,17 @@ def main():
             # Apply filters if they exist in session state
             if 'gender_filter' in st.session_state:
                 filtered_df = filtered_df[filtered_df['gender'] == st.session_state.gender_filter]
+                selections["gender"] = [st.session_state.gender_filter]
 
             if 'job_filter' in st.session_state:
                 filtered_df = filtered_df[filtered_df['has_job'] == st.session_state.job_filter]
+                selections["has_job"] = [str(st.session_state.job_filter)]
 
             # Ensure 'has_job' is categorical for correct visualization
-            filtered_df["has_job"] = filtered_df["has_job"].astype(str)
+            filtered_df["has_job"] = schemas.as_text(filtered_df["has_job"])
 
-            # Group by has_job and gender
-            student_counts = filtered_df.groupby(["has_job", "gender"]).size().reset_index(name="count")
+            # Group by has_job and gender (has_job is in FILL, so text on every backend)
+            student_counts = chart_counts(filtered_df, ["has_job", "gender"], selections, where).dropna(subset=["gender"])
             student_counts["gender"] = student_counts["gender"].map(gender_labels)  # ✅ Map to Khmer here
 
             # Create the bar chart
@@ -509,23 +515,22 @@ def main():
             # Apply filters if they exist in session state
             if 'gender_filter' in st.session_state:
                 filtered_df = filtered_df[filtered_df['gender'] == st.session_state.gender_filter]
+                selections["gender"] = [st.session_state.gender_filter]
 
             if 'income_filter' in st.session_state:
                 filtered_df = filtered_df[filtered_df['income'] == st.session_state.income_filter]
+                selections["income"] = [st.session_state.income_filter]
 
-            # Ensure 'income' is numeric and clean
-            filtered_df["income"] = pd.to_numeric(filtered_df["income"], errors="coerce")
+            # income and income_range are derived at load (derived.INCOME_BANDS)
             filtered_df = filtered_df.dropna(subset=["income"])
-
-            # Define income bins
-            bins = list(range(50, 1551, 50))  # 50 to 1500, step 50
-            labels = [f"{i}-{i+49}" for i in bins[:-1]]
-
-            # Bin income data
-            filtered_df["income_range"] = pd.cut(filtered_df["income"], bins=bins, labels=labels, right=False)
-
-            # Count students in each income range
-            income_counts = filtered_df["income_range"].value_counts().sort_index().reset_index()
+            where.append("TRY_CAST(income AS DOUBLE) IS NOT NULL")
+
+            # Count students per income, then per income range (the same derived columns,
+            # applied to the counts), empty ranges included
+            income_counts = chart_counts(filtered_df, ["income"], selections, where)
+            income_counts["income"] = derived.numeric("income")(income_counts)
+            income_counts["income_range"] = derived.band("income", derived.INCOME_BANDS, derived.INCOME_BAND_LABELS)(income_counts)
+            income_counts = income_counts.groupby("income_range", observed=False)["count"].sum().reindex(derived.INCOME_BAND_LABELS, fill_value=0).reset_index()
             income_counts.columns = ["Income Range", "Student Count"]
 
             # Plot line chart
@@ -563,7 +568,12 @@ def main():
     if "position" in filtered_df.columns:
             with st.container(border=True):
                 # Count students per province
-                position_counts = filtered_df["position"].value_counts().reset_index().head(25)
+                position_counts = (
+                    chart_counts(filtered_df, ["position"], selections, where)
+                    .dropna(subset=["position"])
+                    .sort_values(by="count", ascending=False)
+                    .head(25)
+                )
                 position_counts.columns = ["position", "Student Count"]
 
                 # Format numbers with commas for text labels
@@ -601,15 +611,15 @@ def main():
                     )
 
                     # 🔹 Special Handling for a single bar
-                if len(province_counts) == 1:
+                if len(position_counts) == 1:
                         fig_bar.update_layout(
                             xaxis=dict(
                                 range=[-1, 1],
                                 tickvals=[0],
-                                ticktext=province_counts["position"].values
+                                ticktext=position_counts["position"].values
                             ),
                             yaxis=dict(
-                                range=[0, max(province_counts["Student Count"].values) * 1.2]
+                                range=[0, max(position_counts["Student Count"].values) * 1.2]
                             ),
                             bargap=0.8,
                             width=200,
@@ -624,12 +634,14 @@ def main():
 
     # ---- Raw Data Preview ----
     st.subheader("ទិន្នន័យជាទម្រង់តារាង")
-    st.dataframe(filtered_df, height=450, use_container_width=True)
+    perf.checkpoint("graduated.charts")
+    raw_data_table(filtered_df, TABLE, COLUMNS, height=450)
+    perf.checkpoint("graduated.raw_data")
 
     # ---- Refresh Data Button ----
     if st.button("🔄 Refresh Data"):
-        st.cache_data.clear()  # Clear the data cache to force reload
-        st.rerun()  # Use st.rerun() to trigger rerun
+        datastore.request_refresh("graduated")  # Reloaded in the background; the current data stays on screen
+        st.toast("កំពុងធ្វើបច្ចុប្បន្នភាពទិន្នន័យ...")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,48 @@
+from functools import lru_cache
+
+import pandas as pd
+
+# ---- Hierarchy Index ----
+# Cascading filters (province -> institution -> sector -> major, ...) only need the
+# distinct paths through their columns, which are a few thousand rows even for tables
+# with millions. The index keeps those paths, the positions of every value per level,
+# and the option lists of the OPTIONS_CACHE_SIZE most recently asked selections.
+OPTIONS_CACHE_SIZE = 512
+
+
+class HierarchyIndex:
+    def __init__(self, df, levels):
+        self.levels = list(levels)
+        paths = df[self.levels].drop_duplicates()
+        self.paths = [tuple(path) for path in paths.itertuples(index=False)]
+        self.positions = {level: {} for level in self.levels}
+        for i, path in enumerate(self.paths):
+            for level, value in zip(self.levels, path):
+                self.positions[level].setdefault(value, set()).add(i)
+        # Per instance, so the cached lists go away with the index
+        self._options = lru_cache(maxsize=OPTIONS_CACHE_SIZE)(self._compute_options)
+
+    def _matching(self, selections):
+        """Positions of the paths allowed by every non-empty selection, None for all."""
+        matching = None
+        for level, selected in selections.items():
+            if not selected or level not in self.positions:
+                continue
+            allowed = set()
+            for value in selected:
+                allowed |= self.positions[level].get(value, set())
+            matching = allowed if matching is None else matching & allowed
+        return matching
+
+    def options(self, level, selections=None):
+        """Sorted values of level that occur together with the selected values."""
+        selections = selections or {}
+        key = tuple(sorted(((l, frozenset(v)) for l, v in selections.items() if v and l != level),
+                           key=lambda item: item[0]))
+        return list(self._options(level, key))
+
+    def _compute_options(self, level, selections):
+        position = self.levels.index(level)
+        matching = self._matching(dict(selections))
+        paths = self.paths if matching is None else (self.paths[i] for i in matching)
+        return tuple(sorted({path[position] for path in paths if not pd.isna(path[position])}))
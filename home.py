@@ -1,20 +1,16 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
-from PIL import Image
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import text
+from db import read_sql
+import perf
+import metrics
+import assets
+from sql_aggregates import year_expression
 import plotly.express as px
 
-# ---- Database Connection ----
-DB_USER = "root"
-DB_PASSWORD = ""
-DB_HOST = "localhost"
-DB_NAME = "tvetm"
-
-engine = create_engine(f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}")
-
-# Load background image
-image = Image.open("C:\\Users\\yongy\\Documents\\INTERNSHIP II\\The TVETMIS's dashborad Project\\Dashboards\\webserver\\pages\\images\\YoungYi-Coco.3.jpg")
-
 # Khmer Dictionary for province names
 province_coordinates = {
     "Phnom Penh": {"khmer": "ភ្នំពេញ", "coordinates": (11.5564, 104.9282)},
@@ -45,97 +41,86 @@ province_coordinates = {
 
 }
 
-# Styles
-def set_css():
-    st.markdown("""
-        <style>
-            @font-face {
-                font-family: 'Khmer OS Battambang';
-                src: url('path/to/KhmerOSBattambang-Regular.ttf') format('truetype'); /* Replace with the actual path */
-                font-weight: normal;
-                font-style: normal;
-            }
-                
-            /* All the font in this page is used Khmer OS battambang */
-            * {
-                font-family: 'Khmer OS Battambang', sans-serif !important;
-            }
-            body {
-                background-color: #f7f9fc;
-            }
-            /* Sidebar */
-            .css-1d391kg {
-                background-color: #14213d !important;
-            }
-            .css-1aumxhk {
-                color: white !important;
-            }
-            /* KPI Cards */
-            .kpi-card {
-                padding: 20px;
-                border-radius: 10px;
-                background: #2872f0;
-                box-shadow: 0px 2px 5px rgba(0, 0, 0, 0.2);
-                text-align: center;
-                margin-bottom: 25px;
-                /*margin-buttom: 2px;*/
-                color: white;
-            }
-            /* Bullet card custom */
-            .custom-kpi-card ul {
-                padding-left: 20px; /* Controls left indentation */
-                list-style-position: outside; /* Ensures bullets are outside */
-            }
-
-            .custom-kpi-card li {
-                text-indent: -18px; /* Moves the first line back */
-                padding-left: 20px; /* Ensures second line aligns with the first one */
-                line-height: 1.6; /* Improves readability */
-                font-size: 16px;
-                text-align: left;
-            }
-
-            /* the title custome card custom */
-            .kpi-card h2, .kpi-card h4 {
-                color: white;
-                font-family: 'Khmer OS Battambang', sans-serif;
-            }
-            /* Graph Sections */
-            .graph-section {
-                background-color: #ffffff;
-                padding: 20px;
-                border-radius: 10px;
-                box-shadow: 0px 4px 10px rgba(0, 0, 0, 0.1);
-                margin-bottom: 25px;
-                overflow: hidden;
-            }
-            .plotly-container {
-                width: 100% !important;
-                height: auto !important;
-            }
-            h1, h2, h3, h4, h5, h6, p, span, label, button, input, select, textarea {
-                font-family: 'Khmer OS Battambang', sans-serif !important;
-            }
-        </style>
-    """, unsafe_allow_html=True)
+# ---- Landing Page Queries ----
+# The landing page only shows aggregates, so the database does the counting and a
+# handful of rows come back. All visitors share the cached result for LANDING_TTL seconds.
+LANDING_TTL = int(os.environ.get("TVETMIS_LANDING_TTL", 300))
+
+# (table, gender column, birth date column, status column) per program; status 1 is active
+KPI_SOURCES = [
+    ("tvet15m_data", "gender", "date_of_birth", "scholarship_status"),
+    ("tvetsms_data", "gender", "date_of_birth", "status"),
+]
+
+def _kpi_select(table, gender, birth_date, status):
+    year = year_expression(birth_date)
+    # Invalid dates such as 0000-00-00 give year 0 and are left out of the average
+    return f"""
+            SELECT COUNT(*) AS students,
+                   SUM(CASE WHEN LOWER({gender}) = 'female' THEN 1 ELSE 0 END) AS female,
+                   SUM(CASE WHEN {year} > 1900 THEN {year} END) AS birth_year_sum,
+                   SUM(CASE WHEN {year} > 1900 THEN 1 ELSE 0 END) AS with_birth_year,
+                   SUM(CASE WHEN {status} = 1 THEN 1 ELSE 0 END) AS active
+            FROM {table}"""
+
+def landing_queries():
+    """Landing-page queries by name; built per call because the year syntax depends on the dialect."""
+    return {
+        # Students per province across both programs, in one round trip
+        "provinces": """
+            SELECT province, SUM(students) AS count FROM (
+                SELECT province_name AS province, COUNT(*) AS students
+                FROM tvet15m_data WHERE province_name IS NOT NULL GROUP BY province_name
+                UNION ALL
+                SELECT address_city_provinces AS province, COUNT(*) AS students
+                FROM tvetsms_data WHERE address_city_provinces IS NOT NULL GROUP BY address_city_provinces
+            ) AS province_counts
+            GROUP BY province
+            ORDER BY province
+        """,
+        # One row per program with the sums the KPI cards need
+        "kpis": "\n            UNION ALL".join(_kpi_select(*source) for source in KPI_SOURCES),
+    }
+
+def _read(name, query):
+    return read_sql(text(query), table=f"landing_{name}")
+
+@metrics.cache_lookups("home.landing")
+@st.cache_data(ttl=LANDING_TTL)
+@perf.timed("home.landing")
+def load_landing():
+    """Run every landing-page query concurrently and return {name: DataFrame}."""
+    queries = landing_queries()
+    with ThreadPoolExecutor(max_workers=len(queries), thread_name_prefix="landing") as pool:
+        futures = {name: pool.submit(_read, name, query) for name, query in queries.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+def load_kpis():
+    """Total, female, average age and active students across both programs."""
+    try:
+        sums = load_landing()["kpis"].apply(pd.to_numeric).fillna(0).sum()
+    except Exception as e:
+        st.error(f"Error loading data: {e}")
+        return None
+
+    with_birth_year = int(sums["with_birth_year"])
+    average_birth_year = sums["birth_year_sum"] / with_birth_year if with_birth_year else None
+    return {
+        "total": int(sums["students"]),
+        "female": int(sums["female"]),
+        "avg_age": int(pd.Timestamp.today().year - average_birth_year) if average_birth_year else 0,
+        "active": int(sums["active"]),
+    }
 
 # Function to load student data and aggregate counts
 def load_total_students():
-    query_15m = "SELECT province_name FROM tvet15m_data"
-    query_sms = "SELECT address_city_provinces FROM tvetsms_data"
-    
-    df_15m = pd.read_sql(query_15m, engine)
-    df_sms = pd.read_sql(query_sms, engine)
-    
-    df_15m.rename(columns={'province_name': 'province'}, inplace=True)
-    df_sms.rename(columns={'address_city_provinces': 'province'}, inplace=True)
-    
-    # Calculate the counts based on the number of entries in each dataframe
-    df_15m_count = df_15m.groupby('province').size().reset_index(name='count')
-    df_sms_count = df_sms.groupby('province').size().reset_index(name='count')
-    
-    # Combine both counts
-    df_total = pd.concat([df_15m_count, df_sms_count]).groupby('province', as_index=False).sum()
+    try:
+        df_total = load_landing()["provinces"].copy()
+    except Exception as e:
+        st.error(f"Error loading data: {e}")
+        return pd.DataFrame()
+
+    df_total['count'] = df_total['count'].astype('int64')  # SUM() comes back as DECIMAL on MySQL
 
     # Translate province names to Khmer using the dictionary
     df_total['province_khmer'] = df_total['province'].apply(lambda x: province_coordinates.get(x, {}).get('khmer', x))
@@ -143,12 +128,15 @@ def load_total_students():
     return df_total
 
 # Streamlit App-
+@metrics.timed_page("home")
 def main():
-    set_css()  # Apply custom CSS styles
-    st.image(image, use_container_width=True)
+    background = assets.image_bytes("home_background")
+    if background is not None:
+        st.image(background, use_container_width=True)
 
     # Load the total students data
     df_total = load_total_students()
+    perf.checkpoint("home.load", rows_out=len(df_total))
     
     # Check if the data is empty
     if df_total.empty:
@@ -161,19 +149,6 @@ def main():
         with c1:
                 st.markdown(
                     """
-                    <style>
-                    .custom-kpi-card {
-                        background-color: #3f85c5; /* Custom blue color */
-                        color: white; /* White text for contrast */
-                        padding: 15px;
-                        border-radius: 10px;
-                        text-align: center;
-                        box-shadow: 2px 2px 10px rgba(0, 0, 0, 0.2);
-                        position: relative;
-                        margin: 10px 0 15px 0; /* Reduce top margin */
-                        top: -10px; /* Move it up */
-                    }
-                    </style>
                     <div class="custom-kpi-card">
                         <h5>គោលបំណងនៃពាក្យថា TVET</h5>
                         <ul>
@@ -189,18 +164,19 @@ def main():
                 kpi1, kpi2 = st.columns(2)
                 #df_total = df_total.sort_values(by='count')
 
-                total_students = int(df_total['count'].sum())  # Ensure integer
-                female_students = int(total_students * 0.5)  # Convert to integer
-                avg_age = int(20)  # Ensure integer
-                active_students = int(total_students)  # Ensure integer
+                kpis = load_kpis() or {"total": int(df_total['count'].sum()), "female": 0, "avg_age": 0, "active": 0}
+                total_students = kpis["total"]
+                female_students = kpis["female"]
+                avg_age = kpis["avg_age"]
+                active_students = kpis["active"]
 
                 with kpi1:
-                    st.markdown(f'<div class="kpi-card"><h4>ចំនួនសិស្សសរុប</h4><h2>{total_students:,}</h2></div>', unsafe_allow_html=True)
-                    st.markdown(f'<div class="kpi-card"><h4>ចំនួនសិស្សស្រីសរុប</h4><h2>{female_students:,}</h2></div>', unsafe_allow_html=True)
+                    st.markdown(f'<div class="kpi-card spaced"><h4>ចំនួនសិស្សសរុប</h4><h2>{total_students:,}</h2></div>', unsafe_allow_html=True)
+                    st.markdown(f'<div class="kpi-card spaced"><h4>ចំនួនសិស្សស្រីសរុប</h4><h2>{female_students:,}</h2></div>', unsafe_allow_html=True)
 
                 with kpi2:
-                    st.markdown(f'<div class="kpi-card"><h4>អាយុសិស្សជាមធ្យម</h4><h2>{avg_age}</h2></div>', unsafe_allow_html=True)
-                    st.markdown(f'<div class="kpi-card"><h4>សិស្សកំពុងសិក្សា</h4><h2>{active_students:,}</h2></div>', unsafe_allow_html=True)
+                    st.markdown(f'<div class="kpi-card spaced"><h4>អាយុសិស្សជាមធ្យម</h4><h2>{avg_age}</h2></div>', unsafe_allow_html=True)
+                    st.markdown(f'<div class="kpi-card spaced"><h4>សិស្សកំពុងសិក្សា</h4><h2>{active_students:,}</h2></div>', unsafe_allow_html=True)
 
         
     # Column 2: Bar chart using Plotly
@@ -226,5 +202,6 @@ def main():
 
     df_total_filtered = df_total[['province_khmer', 'count']]  # Use Khmer column for province
     st.dataframe(df_total_filtered, hide_index=True)
+    perf.checkpoint("home.charts")
 if __name__ == "__main__":
     main()
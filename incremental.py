@@ -0,0 +1,128 @@
+import logging
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import text
+
+import snapshots
+from db import concat_frames, load_columns, read_sql, select_query, table_columns
+
+logger = logging.getLogger(__name__)
+
+
+def _as_param(value):
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value
+
+
+class IncrementalTable:
+    """Keeps an append-mostly table in memory and only fetches rows past the high-water mark.
+
+    The first load reads the whole projection. Later loads fetch rows whose watermark
+    column (and updated_at column, when the table has one) is at or past the largest
+    value already held, then replace rows with the same key.
+
+    prepare(df) -> df runs on the first load and on every batch of new rows before it is
+    merged (schema, derived columns), so the table holds the page's frame only once.
+
+    Rows deleted in MySQL are not noticed: they stay in the frame until the next
+    full load (reset(), or a datastore refresh that recreates the table).
+    """
+
+    def __init__(self, table, columns, key="id", watermark="rtimeline_created_at",
+                 updated_at="updated_at", where=None, min_interval=60, prepare=None):
+        self.table = table
+        self.columns = list(columns)
+        self.key = key
+        self.watermark = watermark
+        self.updated_at = updated_at
+        self.where = where
+        self.min_interval = min_interval  # seconds between two checks for new rows
+        self.prepare = prepare or (lambda df: df)
+        self.source_columns = None  # what is fetched; prepare may add derived columns to the frame
+        self.frame = None
+        self.high_water = {}
+        self.last_check = 0.0
+        self._lock = threading.Lock()
+
+    def _fetch_columns(self):
+        columns = list(self.columns)
+        if self.updated_at and self.updated_at not in columns:
+            if self.updated_at in table_columns(self.table):
+                columns.append(self.updated_at)
+            else:
+                self.updated_at = None
+        return columns
+
+    def _update_high_water(self):
+        for column in (self.watermark, self.updated_at):
+            if column and column in self.frame.columns and self.frame[column].notna().any():
+                self.high_water[column] = self.frame[column].max()
+
+    def _full_load(self):
+        self.source_columns = self._fetch_columns()
+        # May come from a Parquet snapshot; catch up on rows added since it was taken
+        self.frame = self.prepare(load_columns(self.table, self.source_columns, self.where))
+        self._update_high_water()
+        if not snapshots.SNAPSHOT_ONLY:
+            self._fetch_new_rows()
+
+    def _fetch_new_rows(self):
+        conditions = [f"{column} >= :{column}" for column in self.high_water]
+        if not conditions:
+            return
+        where = "(" + " OR ".join(conditions) + ")"
+        if self.where:
+            where = f"{self.where} AND {where}"
+        query = select_query(self.table, self.source_columns, where)
+        params = {column: _as_param(value) for column, value in self.high_water.items()}
+        new_rows = read_sql(text(query), params, table=self.table)
+        if new_rows.empty:
+            return
+        new_rows = self._align(self.prepare(new_rows))
+        merged = concat_frames([self.frame, new_rows])
+        self.frame = merged.drop_duplicates(subset=[self.key], keep="last").reset_index(drop=True)
+        self._update_high_water()
+
+    def _align(self, new_rows):
+        """Give catch-up rows the dtypes of the frame they are merged into.
+
+        A snapshot stores mixed object columns (e.g. dates next to 0000-00-00) as text,
+        see snapshots._arrow_safe, while SQL returns datetimes; concatenating both
+        would mix str and Timestamp values in one column. Categoricals are left to
+        concat_frames, which merges their categories.
+        """
+        for column in new_rows.columns.intersection(self.frame.columns):
+            dtype = self.frame[column].dtype
+            if new_rows[column].dtype == dtype or isinstance(dtype, pd.CategoricalDtype):
+                continue
+            if dtype == object:
+                new_rows[column] = new_rows[column].map(
+                    lambda v: v if isinstance(v, str) or pd.isna(v) else str(v))
+            elif pd.api.types.is_datetime64_any_dtype(dtype):
+                new_rows[column] = pd.to_datetime(new_rows[column], errors="coerce")
+            else:
+                try:
+                    new_rows[column] = new_rows[column].astype(dtype)
+                except (TypeError, ValueError):
+                    logger.warning("%s.%s: new rows kept as %s, frame has %s", self.table, column, new_rows[column].dtype, dtype)
+        return new_rows
+
+    def load(self):
+        with self._lock:
+            now = time.monotonic()
+            if self.frame is None:
+                self._full_load()
+                self.last_check = now
+            elif now - self.last_check >= self.min_interval and not snapshots.SNAPSHOT_ONLY:
+                self._fetch_new_rows()
+                self.last_check = now
+            return self.frame
+
+    def reset(self):
+        """Drop the cached frame so the next load is a full reload."""
+        with self._lock:
+            self.frame = None
+            self.high_water = {}
@@ -1,49 +1,64 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from sqlalchemy import create_engine
+import datastore
+import perf
+import metrics
+import filters
+from db import load_columns_chunked
+import schemas
+import sql_aggregates
+from widgets import raw_data_table
 from streamlit_lightweight_charts import renderLightweightCharts
 import plotly.graph_objects as go
 
-# ---- Database Connection ----
-DB_USER = "root"
-DB_PASSWORD = ""
-DB_HOST = "localhost"
-DB_NAME = "tvetm"
+# ---- Column Manifest ----
+TABLE = "student_internships_15m"
+COLUMNS = [
+    "id", "gender", "province_name", "school_name",
+    "major_name", "internship_pass_fail", "poverty_status", "partner_type",
+    "partner_name",
+]
+
+# ---- Filter Index ----
+FILTER_COLUMNS = ["province_name", "school_name", "gender"]
+
+@perf.timed("student_internships_15m.fetch")
+def fetch_data():
+    # The schema is applied to every chunk while streaming the table
+    df = load_columns_chunked(TABLE, COLUMNS, schemas.SCHEMAS[TABLE])
+    filters.index_for("student_internships_15m", df, FILTER_COLUMNS)  # ready before the first rerun
+    return df
+
+# The filter index counts in the budget and goes with the frame
+datastore.register("student_internships_15m", fetch_data, ttl=1800, max_bytes=512 * 1024 ** 2,
+                   on_invalidate=lambda: filters.drop("student_internships_15m"),
+                   extra_bytes=lambda: filters.index_bytes("student_internships_15m"))
 
-engine = create_engine(f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}")
+# ---- Chart Aggregates ----
+# NULL poverty_status is charted as its own "no data" group
+FILL = {"poverty_status": ""}
+
+def chart_counts(filtered_df, columns, selections):
+    """Counts for a chart: GROUP BY on the snapshot with TVETMIS_BACKEND=duckdb or polars,
+    otherwise counted from filtered_df."""
+    return sql_aggregates.counts(TABLE, filtered_df, columns, selections, FILL)
 
-@st.cache_data
 def load_data():
-    query = "SELECT * FROM student_internships_15m"
     try:
-        df = pd.read_sql(query, engine)
+        df = datastore.get("student_internships_15m")
     except Exception as e:
         st.error(f"Error loading staff data: {e}")
         return pd.DataFrame()
     return df
 
+@metrics.timed_page("internship15m")
 def main():
-    # ---- Custom Khmer Font ----
-    st.markdown(
-        """
-        <style>
-        @import url('https://fonts.googleapis.com/css2?family=Battambang:wght@400;700&display=swap');
-        * {
-            font-family: 'Khmer OS Battambang', sans-serif !important;
-        }
-        </style>
-        """,
-        unsafe_allow_html=True,
-    )
-
     df = load_data()
+    perf.checkpoint("internship15m.load", rows_out=len(df))
     if df.empty:
         return
 
-    # Initialize filtered_df with the full dataset
-    filtered_df = df.copy()
-
     # Khmer labels for poverty_status
     poverty_dict = {
         "NEAR_POOR": "គ្រួសារងាយរងហានិភ័យ",
@@ -58,70 +73,47 @@ def main():
         "male": "ប្រុស"
     }
 
-    # Define CSS for centering and styling
-    centered_metric_style = """
-    <style>
-    .metric-container {
-        display: flex;
-        flex-direction: column;
-        align-items: center;
-        text-align: center;
-        padding: 0.5em 0; /* Reduced vertical padding */
-    }
-    .metric-value {
-        font-size: 2em;
-        font-weight: bold;
-        margin-top: 0.1em; /* Added top margin */
-    }
-    .metric-label {
-        font-size: 0.9em;
-        color: #555;
-        order: -1; /* Moves the label to the top */
-        margin-bottom: 0.1em; /* Added bottom margin for spacing */
-    }
-    </style>
-    """
-    st.markdown(centered_metric_style, unsafe_allow_html=True)
-
     if df.empty:
         st.warning("រកមិនឃើញទិន្នន័យ")
         return
 
     # ---- Filters in Columns ----
+    # Every filter is answered from the filter index; the frame is sliced once at the end
     col1, col2, col3 = st.columns(3)
+    index = filters.index_for("student_internships_15m", df, FILTER_COLUMNS)
+    selections = {}
 
     # ---- Province Filter ----
     with col3:
-        province_options = sorted(df["province_name"].unique())
-        selected_provinces = st.multiselect("ខេត្ត/ក្រុង", province_options)
-        if selected_provinces:
-            filtered_df = filtered_df[filtered_df["province_name"].isin(selected_provinces)]
+        province_options = index.options("province_name")
+        selections["province_name"] = st.multiselect("ខេត្ត/ក្រុង", province_options)
 
     # ---- Role Filter ----
     with col1:
-        # Use the filtered_df from the province filter
-        school_options = sorted(filtered_df["school_name"].unique())
-        selected_roles = st.multiselect("គ្រឹះស្ថាន អ.ប.វ.", school_options)
-        if selected_roles:
-            filtered_df = filtered_df[filtered_df["school_name"].isin(selected_roles)]
+        # Schools left after the province filter
+        school_options = index.options("school_name", index.select(selections))
+        selections["school_name"] = st.multiselect("គ្រឹះស្ថាន អ.ប.វ.", school_options)
 
     # ---- Gender Filter ----
     with col2:
         gender_mapping = {"female": "ស្រី", "male": "ប្រុស"}
 
-        # Use the filtered_df from the previous filters
-        gender_options = filtered_df["gender"].dropna().unique()
+        # Genders left after the previous filters
+        gender_options = index.options("gender", index.select(selections))
         gender_options = [g for g in gender_options if g in gender_mapping]
 
         if gender_options:
             display_gender_options = [gender_mapping[g] for g in gender_options]
             selected_display_genders = st.multiselect("ភេទ", display_gender_options)
-            selected_genders = [key for key, value in gender_mapping.items() if value in selected_display_genders]
-            if selected_genders:
-                filtered_df = filtered_df[filtered_df["gender"].isin(selected_genders)]
+            selections["gender"] = [key for key, value in gender_mapping.items() if value in selected_display_genders]
         else:
             st.warning("⚠️ No gender data available after previous filters.")
 
+    filtered_df = df[index.select(selections)]
+
+    filtered_df = schemas.drop_unused_categories(filtered_df)
+    perf.checkpoint("internship15m.filter", rows_in=len(df), rows_out=len(filtered_df))
+
     # ---- KPI Metrics ----
     total_students = len(filtered_df)
     total_female = filtered_df[filtered_df["gender"].str.lower() == "female"].shape[0] if "gender" in filtered_df.columns else 0
@@ -155,7 +147,8 @@ def main():
             st.markdown('<h4 style="font-family: \"Khmer OS Battambang\";">ការបែងចែកសិស្សតាមភេទ</h4>', unsafe_allow_html=True)
 
             if "gender" in filtered_df.columns:
-                gender_count = filtered_df["gender"].str.lower().value_counts()
+                gender_count = chart_counts(filtered_df, ["gender"], selections).dropna(subset=["gender"])
+                gender_count = gender_count.groupby(gender_count["gender"].str.lower())["count"].sum().sort_values(ascending=False)
                 gender_labels = [gender_mapping.get(g, g) for g in gender_count.index]
 
                 fig1 = px.pie(
@@ -177,13 +170,12 @@ def main():
             # Apply filters before grouping
             if 'gender_filter' in st.session_state:
                 filtered_df = filtered_df[filtered_df['gender'] == st.session_state.gender_filter]
+                selections["gender"] = [st.session_state.gender_filter]
             if 'shift_filter' in st.session_state:
                 filtered_df = filtered_df[filtered_df['poverty_status'] == st.session_state.shift_filter]
+                selections["poverty_status"] = [st.session_state.shift_filter]
 
-            # Handle null poverty_status (fill with placeholder)
-            filtered_df["poverty_status_filled"] = filtered_df["poverty_status"].fillna("")
-
-            # Khmer labels including null
+            # Khmer labels including null (poverty_status is filled with "")
             poverty_dict_with_null = {**poverty_dict, "": "មិនមានទិន្នន័យ"}
 
             # Build all combinations for reindex
@@ -192,8 +184,10 @@ def main():
 
             # Group by filled poverty status + gender and include all combinations
             student_counts = (
-                filtered_df.groupby(["poverty_status_filled", "gender"])
-                .size()
+                chart_counts(filtered_df, ["poverty_status", "gender"], selections)
+                .rename(columns={"poverty_status": "poverty_status_filled"})
+                .groupby(["poverty_status_filled", "gender"], observed=True)["count"]
+                .sum()
                 .reindex(
                     pd.MultiIndex.from_product(
                         [all_poverty, all_gender],
@@ -255,7 +249,7 @@ def main():
         st.markdown(f'<h4 style="font-family: \'Khmer OS Battambang\', sans-serif;">ស្ថិតិសិស្សតាមខេត្ត/ក្រុង</h4>', unsafe_allow_html=True)
         if "province_name" in filtered_df.columns:
             # 🔹 Count students per province
-            province_counts = filtered_df["province_name"].value_counts().reset_index()
+            province_counts = chart_counts(filtered_df, ["province_name"], selections).dropna(subset=["province_name"])
             province_counts.columns = ["Province", "Student Count"]
 
             # 🔹 Format the numbers with commas
@@ -320,8 +314,10 @@ def main():
             # 🔹 Check for 'partner_type' column
             if "partner_type" in filtered_df.columns:
 
+                partner_counts = chart_counts(filtered_df, ["partner_type"], selections)
+
                 # 🔸 Handle case where all values are null
-                if filtered_df["partner_type"].isnull().all():
+                if partner_counts["partner_type"].isnull().all():
                     st.warning("The 'partner_type' column exists, but all values are null. Please populate it with marital status data.")
 
                     # Placeholder chart for empty data
@@ -335,10 +331,10 @@ def main():
 
                 else:
                     # 🔸 Map the partner_type values to Khmer labels
-                    filtered_df["partner_type_label"] = filtered_df["partner_type"].map(partner_type_dict).fillna("មិនមាន")
+                    partner_counts["partner_type_label"] = partner_counts["partner_type"].map(partner_type_dict).fillna("មិនមាន")
 
                     # 🔸 Count by label
-                    partner_counts = filtered_df["partner_type_label"].value_counts().reset_index()
+                    partner_counts = partner_counts.groupby("partner_type_label")["count"].sum().sort_values(ascending=False).reset_index()
                     partner_counts.columns = ["Partner Type", "Count"]
 
                     # 🔸 Create pie chart
@@ -372,7 +368,12 @@ def main():
             st.markdown(f'<h4 style="font-family: \'Khmer OS Battambang\', sans-serif;">ស្ថិតិសិក្ខាកាមតាម​ស្ថានប័នរបស់ដៃគូសហការ​ (២០)</h4>', unsafe_allow_html=True)
             if "partner_name" in filtered_df.columns:
                 # 🔹 Count students per province
-                province_counts = filtered_df["partner_name"].value_counts().reset_index().head(20)
+                province_counts = (
+                    chart_counts(filtered_df, ["partner_name"], selections)
+                    .dropna(subset=["partner_name"])
+                    .sort_values(by="count", ascending=False)
+                    .head(20)
+                )
                 province_counts.columns = ["Partner", "Student Count"]
 
                 # 🔹 Format the numbers with commas
@@ -422,12 +423,10 @@ def main():
         st.markdown(f'<h4 style="font-family: \'Khmer OS Battambang\', sans-serif;">ស្ថិតិសិក្ខាកាមតាមជំនាញ</h4>', unsafe_allow_html=True)
         # Major Name - Area Chart
         # Prepare data
-        filtered_df['student_count'] = 1
         major_counts = (
-            filtered_df
-            .groupby('major_name')['student_count']
-            .sum()
-            .reset_index()
+            chart_counts(filtered_df, ['major_name'], selections)
+            .dropna(subset=['major_name'])
+            .rename(columns={'count': 'student_count'})
             .sort_values(by='student_count', ascending=True)  # 👈 sort ascending for left-to-right flow
         )
 
@@ -454,11 +453,22 @@ def main():
 
     # ---- Raw Data Preview ----
     st.subheader("ទិន្នន័យជាទម្រង់តារាង")
-    st.dataframe(filtered_df, height=450, use_container_width=True)
+    perf.checkpoint("internship15m.charts")
+    raw_data_table(filtered_df, TABLE, COLUMNS, height=450)
+    perf.checkpoint("internship15m.raw_data")
+
+    load_stats = df.attrs.get("load_stats")
+    if load_stats:
+        peak = f"{load_stats['peak_rss_bytes'] / 1e6:,.0f} MB" if load_stats["peak_rss_bytes"] else "N/A"
+        st.caption(
+            f"{load_stats['rows']:,} rows in {load_stats['chunks']} chunks, "
+            f"{load_stats['frame_bytes'] / 1e6:,.1f} MB in memory, peak RSS {peak}, "
+            f"{load_stats['seconds']:.1f}s"
+        )
 
     if st.button("🔄 Refresh Data"):
-        st.cache_data.clear()
-        st.rerun()
+        datastore.request_refresh("student_internships_15m")  # Reloaded in the background; the current data stays on screen
+        st.toast("កំពុងធ្វើបច្ចុប្បន្នភាពទិន្នន័យ...")
     
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -1,98 +1,50 @@
 import streamlit as st
+import logging
+import os
 import sys
 from pathlib import Path
-import base64
-from io import BytesIO
-
-def image_to_base64(image):
-    buffered = BytesIO()
-    image.save(buffered, format="PNG")
-    return base64.b64encode(buffered.getvalue()).decode()
 
 # Add the 'pages' directory to the Python path
 sys.path.append(str(Path(__file__).parent / "pages"))
 
-import tvetsms
-import tvet15m
-import partner
-import staff
-import teacher
-import home
-import internship15m
-import graduated
-import erpl_candidate
-from PIL import Image
-
-image = Image.open("C:\\Users\\yongy\\Documents\\INTERNSHIP II\\The TVETMIS's dashborad Project\\Dashboards\\webserver\\pages\\images\\tvetlogo1.png")
-st.set_page_config(page_title="TVETMIS Dashboard", page_icon= image, layout="wide")
-
-# Custom CSS
-st.markdown(
-    """
-    <style>
-    [data-testid="stSidebar"] {
-        background-color: #2872f0;
-        color: white
-        padding: 20px;
-    }
-    /*The style of sidebar Navigation*/
-    .sidebar-button {
-        background-color: #3880f0;
-        color: white;
-        border-radius: 8px;
-        border: none;
-        padding: 12px;
-        text-align: center;
-        width: 100%;
-        font-size: 16px;
-        font-weight: bold;
-        transition: background-color 0.3s, color 0.3s, transform 0.2s;
-    }
-    /*The hover animation of sidebar Navigation*/
-    .sidebar-button:hover {
-        background-color: #2a6cd8;
-        color: white;
-        transform: scale(1.05);
-    }
-    /*The button after clicked style(Noted button)*/
-    .selected-button {
-        background-color: white !important;
-        color: #2163d8 !important;
-        border-radius: 8px;
-        border: 3px solid #2163d8 !important;
-        font-weight: bold !important;
-        font-size: 16px !important;
-        text-align: center;
-        padding: 12px;
-        width: 100%;
-        box-shadow: 0 4px 8px rgba(0, 0, 0, 0.3);
-    }
-    /*The subpage of TVETSMS's styles*/
-    .subpage-button {
-        width: 100% !important; /* Set the width to 100% so it matches the main page button width */
-        margin-left: 10px; /* Optional: Adjust for better alignment */
-        background-color: #3897d2;
-        color: white;
-        border-radius: 8px;
-        padding: 10px;
-        font-size: 14px;
-        font-weight: normal;
-    }
-    /*The subpage of TVETSMS's styles hover*/
-    .subpage-button:hover {
-        background-color: #3b6fd0;
-        color: white;
-    }
-    </style>
-    """,
-    unsafe_allow_html=True,
-)
+import page_registry
+import warmup
+import perf
+import metrics
+import assets
+import theme
+
+# App modules log through logging.getLogger(__name__); TVETMIS_LOG_LEVEL=DEBUG shows the per-load schema reports
+logging.basicConfig(level=os.environ.get("TVETMIS_LOG_LEVEL", "INFO"),
+                    format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+st.set_page_config(page_title="TVETMIS Dashboard", page_icon=assets.image_bytes("logo"), layout="wide")
+perf.start_run()
+
+# Load every page's data once per server process, in a background thread. Started before
+# any page renders, so a page that stops or fails can't keep it from starting; the first
+# page's own load shares the datastore load with it instead of running twice
+@st.cache_resource
+def start_warm_up():
+    return warmup.start()
+
+start_warm_up()
+
+# Prometheus endpoint for the local scraper, once per server process
+@st.cache_resource
+def start_metrics():
+    return metrics.serve()
+
+start_metrics()
+
+# One cached stylesheet for every page (theme.py)
+theme.inject()
 
 #Image under the navigation
 st.sidebar.markdown(
     f"""
     <div style="display: flex; justify-content: center; margin-bottom: 40px;">
-        <img src="data:image/png;base64,{image_to_base64(image)}" width="120">
+        <img src="{assets.data_uri('logo')}" width="120">
     </div>
     """,
     unsafe_allow_html=True,
@@ -165,21 +117,25 @@ for page_key, page_title in pages.items():
             if page_key == "tvet15m":
                     st.session_state.tvet15m_subpage = None  # Reset to no subpage selected
 
+# Developer performance panel (TVETMIS_PERF_PANEL=1 or ?perf=1), filled in after the page ran
+perf_panel = perf.panel()
+perf.checkpoint("layout")
+
 # Display the content based on the current page and subpage
 if st.session_state.page == "home":
     #st.write("This page is will available soon, Thank you from Yongyi!")
-    home.main()
+    page_registry.load("home").main()
     st.balloons()
 
 elif st.session_state.page == "tevtsms":
     # Show TVETMS main content when no subpage is selected
     if st.session_state.tevtsms_subpage is None:
         # Show the main content of TVETMS
-        tvetsms.main()
+        page_registry.load("tvetsms").main()
 
     # Show subpages when selected
     elif st.session_state.tevtsms_subpage == "page1":
-        staff.main()
+        page_registry.load("staff").main()
 
         # Option to go back to TVETMS main page
         if st.button("⬅️ត្រឡប់ទៅកាន់​ កម្មវិធី TVETMS"):
@@ -187,7 +143,7 @@ elif st.session_state.page == "tevtsms":
             st.rerun()  # Trigger a re-run to update the page immediately
 
     elif st.session_state.tevtsms_subpage == "page2":
-        teacher.main()
+        page_registry.load("teacher").main()
 
         # Option to go back to TVETMS main page
         if st.button("⬅️ត្រឡប់ទៅកាន់​ កម្មវិធី TVETMS"):
@@ -195,7 +151,7 @@ elif st.session_state.page == "tevtsms":
             st.rerun()  # Trigger a re-run to update the page immediately
 
     elif st.session_state.tevtsms_subpage == "page3":
-        partner.main()
+        page_registry.load("partner").main()
 
         # Option to go back to TVETMS main page
         if st.button("⬅️ត្រឡប់ទៅកាន់​ កម្មវិធី TVETMS"):
@@ -206,12 +162,12 @@ elif st.session_state.page == "tvet15m":
     # Show TVET1.5M main content when no subpage is selected
     if st.session_state.tvet15m_subpage is None:
         # Show the main content of TVET1.5M
-        tvet15m.main()
+        page_registry.load("tvet15m").main()
 
     # Show subpages when selected
     elif st.session_state.tvet15m_subpage == "page4":
         #st.write("TVET1.5M Page 4 Content - TRAINEES")
-        internship15m.main()
+        page_registry.load("internship15m").main()
 
         # Option to go back to TVET1.5M main page
         if st.button("⬅️ត្រឡប់ទៅកាន់​ កម្មវិធី TVET1.5M"):
@@ -219,7 +175,7 @@ elif st.session_state.page == "tvet15m":
             st.rerun()
 
     elif st.session_state.tvet15m_subpage == "page5":
-        graduated.main()
+        page_registry.load("graduated").main()
 
         # Option to go back to TVET1.5M main page
         if st.button("⬅️ត្រឡប់ទៅកាន់​ កម្មវិធី TVET1.5M"):
@@ -227,5 +183,7 @@ elif st.session_state.page == "tvet15m":
             st.rerun()
 elif st.session_state.page == "erpl":
     #st.write("This page is will available soon, Thank you from Yongyi!")
-    erpl_candidate.main()
+    page_registry.load("erpl_candidate").main()
+
 
+perf.render_panel(perf_panel)
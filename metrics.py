@@ -0,0 +1,214 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# ---- Metrics Settings ----
+# Prometheus text format on http://HOST:PORT/metrics for a local scraper; PORT=0 turns it off.
+HOST = os.environ.get("TVETMIS_METRICS_HOST", "127.0.0.1")
+PORT = int(os.environ.get("TVETMIS_METRICS_PORT", 9464))
+SECONDS_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items())) + "}"
+
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def lines(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self.lock:
+            values = dict(self.values)
+        for key, value in values.items():
+            yield f"{self.name}{_labels(dict(key))} {value}"
+
+
+class Histogram:
+    def __init__(self, name, help, buckets=SECONDS_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.values = {}  # labels -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            state = self.values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def lines(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self.lock:
+            values = {key: list(state) for key, state in self.values.items()}
+        for key, state in values.items():
+            labels = dict(key)
+            for bound, count in zip(self.buckets, state):
+                yield f"{self.name}_bucket{_labels({**labels, 'le': bound})} {count}"
+            yield f"{self.name}_bucket{_labels({**labels, 'le': '+Inf'})} {state[-1]}"
+            yield f"{self.name}_sum{_labels(labels)} {state[-2]}"
+            yield f"{self.name}_count{_labels(labels)} {state[-1]}"
+
+
+PAGE_SECONDS = Histogram("tvetmis_page_seconds", "Wall time of one page main() per rerun.")
+CACHE_LOOKUPS = Counter("tvetmis_cache_lookups_total", "Loader calls by result (hit or miss).")
+QUERY_SECONDS = Histogram("tvetmis_query_seconds", "Duration of a query, including building the DataFrame.")
+QUERY_ROWS = Counter("tvetmis_query_rows_total", "Rows returned by queries.")
+DATASET_LOAD_SECONDS = Histogram("tvetmis_dataset_load_seconds", "Duration of a datastore (re)load.")
+PAGE_IMPORT_SECONDS = Histogram("tvetmis_page_import_seconds", "First import of a page module.")
+REGISTRY = [PAGE_SECONDS, CACHE_LOOKUPS, QUERY_SECONDS, QUERY_ROWS, DATASET_LOAD_SECONDS, PAGE_IMPORT_SECONDS]
+
+
+# ---- Recording ----
+def timed_page(page):
+    """Decorator for a page's main(); also counts reruns cut short by st.stop() or st.rerun()."""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                PAGE_SECONDS.observe(time.perf_counter() - start, page=page)
+        return wrapper
+    return decorator
+
+
+_loaders_ran = ContextVar("metrics_loaders_ran", default=None)
+
+
+def cache_lookups(name):
+    """Outer decorator for a st.cache_* loader: a miss when the loader body ran, else a hit.
+
+    The body reports itself through loader_ran(name), which perf.timed(name) calls.
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            ran = set()
+            token = _loaders_ran.set(ran)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _loaders_ran.reset(token)
+                CACHE_LOOKUPS.inc(loader=name, result="miss" if name in ran else "hit")
+        if hasattr(function, "clear"):
+            wrapper.clear = function.clear  # refresh buttons clear the Streamlit cache
+        return wrapper
+    return decorator
+
+
+def loader_ran(name):
+    ran = _loaders_ran.get()
+    if ran is not None:
+        ran.add(name)
+
+
+@contextmanager
+def query(backend, table):
+    """Time a query; set result["rows"] inside the block to count its rows.
+
+    backend is where it ran: sql (the database), snapshot (a Parquet read), duckdb,
+    polars, or pandas (counted from a frame the page already holds).
+    """
+    result = {"rows": None}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        QUERY_SECONDS.observe(time.perf_counter() - start, backend=backend, table=table)
+        if result["rows"] is not None:
+            QUERY_ROWS.inc(result["rows"], backend=backend, table=table)
+
+
+def query_totals():
+    """{backend: {"queries": count, "seconds": total}} of every query recorded so far."""
+    totals = {}
+    with QUERY_SECONDS.lock:
+        for key, state in QUERY_SECONDS.values.items():
+            total = totals.setdefault(dict(key)["backend"], {"queries": 0, "seconds": 0.0})
+            total["queries"] += state[-1]
+            total["seconds"] += state[-2]
+    return totals
+
+
+# ---- Export ----
+def _gauges():
+    # Read at scrape time; imported here because both modules record into this one
+    import datastore
+    import db
+
+    yield "# TYPE tvetmis_dataset_bytes gauge"
+    for name, status in datastore.status().items():
+        yield f"tvetmis_dataset_bytes{_labels({'dataset': name})} {status['bytes']}"
+    yield "# TYPE tvetmis_db_connections_in_use gauge"
+    yield f"tvetmis_db_connections_in_use {db.pool_stats()['in_use']}"
+
+
+def exposition():
+    """Every metric in the Prometheus text format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.lines())
+    lines.extend(_gauges())
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = exposition().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # one line per scrape would drown the app's own log
+
+
+def serve(host=HOST, port=PORT):
+    """Start the /metrics endpoint in a daemon thread; returns the server, or None when off."""
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _Handler)
+    except OSError as e:
+        # e.g. a second Streamlit process on the same machine
+        logger.warning("could not listen on %s:%s: %s", host, port, e)
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info("serving http://%s:%s/metrics", host, port)
+    return server
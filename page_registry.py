@@ -0,0 +1,55 @@
+import importlib
+import logging
+import os
+import sys
+import time
+
+import metrics
+import perf
+
+logger = logging.getLogger(__name__)
+
+# ---- Page Registry ----
+# Page modules pull in plotly, matplotlib, wordcloud and the chart components, so they
+# are imported the first time someone navigates to them instead of on every cold start.
+# Python keeps them in sys.modules afterwards; reruns only pay a dictionary lookup.
+IMPORT_BUDGET = float(os.environ.get("TVETMIS_PAGE_IMPORT_BUDGET", 1.0))  # seconds per page module
+
+PAGES = (
+    "home",
+    "tvetsms",
+    "staff",
+    "teacher",
+    "partner",
+    "tvet15m",
+    "internship15m",
+    "graduated",
+    "erpl_candidate",
+)
+
+import_seconds = {}
+
+
+def load(module_name):
+    """The page module, imported on first use and timed against IMPORT_BUDGET."""
+    if module_name in sys.modules:
+        # Also waits for a module the warm-up is still importing
+        return importlib.import_module(module_name)
+    start = time.perf_counter()
+    with perf.section(f"{module_name}.import"):
+        module = importlib.import_module(module_name)
+    seconds = time.perf_counter() - start
+    import_seconds.setdefault(module_name, seconds)
+    metrics.PAGE_IMPORT_SECONDS.observe(seconds, page=module_name)
+    if seconds > IMPORT_BUDGET:
+        logger.warning("importing %s took %.2fs, over the %.2fs budget", module_name, seconds, IMPORT_BUDGET)
+    return module
+
+
+if __name__ == "__main__":
+    # Cold import time of every page, slowest first: python page_registry.py
+    for name in PAGES:
+        load(name)
+    for name, seconds in sorted(import_seconds.items(), key=lambda item: item[1], reverse=True):
+        status = "over budget" if seconds > IMPORT_BUDGET else "ok"
+        print(f"{name:<16} {seconds:6.2f}s  {status}")
@@ -1,15 +1,14 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from sqlalchemy import create_engine
-
-# ---- Database Connection ----
-DB_USER = "root"
-DB_PASSWORD = ""
-DB_HOST = "localhost"
-DB_NAME = "tvetm"
-
-engine = create_engine(f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}")
+import derived
+import datastore
+import perf
+import metrics
+from hierarchy import HierarchyIndex
+from db import load_columns
+import schemas
+from widgets import raw_data_table
 
 student_statuses = {
     "ACTIVE": 1,
@@ -30,122 +29,90 @@ student_statuses = {
     "QUIT_NOT_ENOGUH_DOC": 6
 }
 
-@st.cache_data
+# ---- Column Manifest ----
+TABLE = "development_partners"
+COLUMNS = [
+    "id", "city_province_name", "school_name", "type_development_partners",
+    "business", "status",
+]
+
+@perf.timed("development_partners.fetch")
+def fetch_development_partners_data():
+    df = schemas.apply_schema(load_columns(TABLE, COLUMNS), TABLE)
+    return derived.apply_derived(df, "development_partners")
+
+# ---- Derived Columns ----
+# Reverse map of the status codes for display
+derived.register("development_partners", "status_label", derived.label("status", {v: k for k, v in student_statuses.items()}))
+
+# Province -> school -> partner type -> business, for the cascading multiselects
+HIERARCHY = ("city_province_name", "school_name", "type_development_partners", "business")
+
+@st.cache_resource(max_entries=2)
+def partner_hierarchy(version, _df):
+    """Built once per dataset version; _df is not hashed, the version is the cache key."""
+    return HierarchyIndex(_df, HIERARCHY)
+
+datastore.register("development_partners", fetch_development_partners_data, ttl=3600, max_bytes=16 * 1024 ** 2)
+
 def load_development_partners_data():
-    query = "SELECT * FROM development_partners"
+    """(frame, dataset version) of the same load."""
     try:
-        df = pd.read_sql(query, engine)
+        return datastore.get_versioned("development_partners")
     except Exception as e:
         st.error(f"Error loading development_partners_data: {e}")
-        return pd.DataFrame()
-    return df
+        return pd.DataFrame(), None
 
+@metrics.timed_page("partner")
 def main():
 
-    # ---- Custom Khmer Font ----
-    st.markdown(
-        """
-        <style>
-        @import url('https://fonts.googleapis.com/css2?family=Battambang:wght@400;700&display=swap');
-        body, h1, h2, h3, h4, h5, h6, p, div, span, label, button, input, select, textarea {
-            font-family: 'Battambang', sans-serif !important;
-        }
-        * {
-        font-family: 'Khmer OS Battambang', sans-serif !important;
-        }
-        h1, h2, h3, h4, h5, h6, p, span, label, button, input, select, textarea {
-        font-family: 'Khmer OS Battambang', sans-serif !important;
-        }
-        </style>
-        """,
-        unsafe_allow_html=True,
-    )
-
-    df_partners = load_development_partners_data()
+    df_partners, version = load_development_partners_data()
+    perf.checkpoint("partner.load", rows_out=len(df_partners))
 
     if df_partners.empty:
         st.warning("No development partners data found.")
         return
 
     # ---- Filters in Columns ----
+    # Option lists come from the hierarchy index; the rows are filtered once at the end
     col1, col2, col3, col4 = st.columns(4)
+    hierarchy = partner_hierarchy(version, df_partners)
+    selections = {}
 
     # ---- Province Filter ----
     with col4:
-        province_options = sorted(df_partners["city_province_name"].unique())
-        selected_provinces = st.multiselect("ខេត្ត/ក្រុង", province_options)
-
-    if selected_provinces:
-        filtered_partners = df_partners[df_partners["city_province_name"].isin(selected_provinces)]
-    else:
-        filtered_partners = df_partners.copy()
+        province_options = hierarchy.options("city_province_name")
+        selections["city_province_name"] = st.multiselect("ខេត្ត/ក្រុង", province_options)
 
-    if filtered_partners.empty:  
-        st.warning("No development partners found in the selected provinces.")
-        return
-
-    # ---- School Filter ----
+    # ---- School Filter (Dependent on Province) ----
     with col1:
-        school_options = sorted(filtered_partners["school_name"].unique())
-        selected_schools = st.multiselect("ឈ្មោះគ្រឹះស្ថាន", school_options)
-
-    if selected_schools:
-        filtered_partners = filtered_partners[filtered_partners["school_name"].isin(selected_schools)]
+        school_options = hierarchy.options("school_name", selections)
+        selections["school_name"] = st.multiselect("ឈ្មោះគ្រឹះស្ថាន", school_options)
 
-        # ---- Type Filter (Dependent on School and Province) ----
-        type_options = sorted(filtered_partners["type_development_partners"].unique())
-    else:
-        type_options = sorted(filtered_partners["type_development_partners"].unique())
-
-    # ---- Type Filter ----
+    # ---- Type Filter (Dependent on School and Province) ----
     with col2:
-        selected_types = st.multiselect("ប្រភេទដៃគូរសហការ", type_options)
-
-    if selected_types:
-        filtered_partners = filtered_partners[filtered_partners["type_development_partners"].isin(selected_types)]
+        type_options = hierarchy.options("type_development_partners", selections)
+        selections["type_development_partners"] = st.multiselect("ប្រភេទដៃគូរសហការ", type_options)
 
-        # ---- Business Filter (Dependent on School, Type, and Province) ----
-        business_options = sorted(filtered_partners["business"].unique())
-    else:
-        business_options = sorted(filtered_partners["business"].unique())
-
-    # ---- Business Filter ----
+    # ---- Business Filter (Dependent on School, Type, and Province) ----
     with col3:
-        selected_businesses = st.multiselect("ប្រភេទអាជីវកម្ម", business_options)
+        business_options = hierarchy.options("business", selections)
+        selections["business"] = st.multiselect("ប្រភេទអាជីវកម្ម", business_options)
 
-    if selected_businesses:
-        filtered_partners = filtered_partners[filtered_partners["business"].isin(selected_businesses)]
+    mask = pd.Series(True, index=df_partners.index)
+    for column, selected in selections.items():
+        if selected:
+            mask &= df_partners[column].isin(selected)
+    filtered_partners = df_partners[mask]
 
     if filtered_partners.empty:
         st.warning("No development partners found with the selected filters.")
         return
 
-    kpi1, kpi2, kpi3, kpi4, kpi5 = st.columns(5)
+    filtered_partners = schemas.drop_unused_categories(filtered_partners)
+    perf.checkpoint("partner.filter", rows_in=len(df_partners), rows_out=len(filtered_partners))
 
-    # Define CSS for centering and styling
-    centered_metric_style = """
-    <style>
-    .metric-container {
-        display: flex;
-        flex-direction: column;
-        align-items: center;
-        text-align: center;
-        padding: 0.5em 0; /* Reduced vertical padding */
-    }
-    .metric-value {
-        font-size: 2em;
-        font-weight: bold;
-        margin-top: 0.1em; /* Added top margin */
-    }
-    .metric-label {
-        font-size: 0.9em;
-        color: #555;
-        order: -1; /* Moves the label to the top */
-        margin-bottom: 0.1em; /* Added bottom margin for spacing */
-    }
-    </style>
-    """
-    st.markdown(centered_metric_style, unsafe_allow_html=True)
+    kpi1, kpi2, kpi3, kpi4, kpi5 = st.columns(5)
 
     def format_percentage(percent):
         if percent == int(percent):
@@ -298,10 +265,7 @@ def main():
                     fig_placeholder.update_traces(textposition="outside")
                     st.plotly_chart(fig_placeholder, use_container_width=True)
                 else:
-                    # Map statuses to labels (reverse map for lookup)
-                    status_label_map = {v: k for k, v in student_statuses.items()}
-                    filtered_partners["status_label"] = filtered_partners["status"].map(status_label_map)
-
+                    # status_label is mapped at load time
                     # Count status occurrences
                     status_counts = filtered_partners["status_label"].value_counts().reset_index()
                     status_counts.columns = ["Status", "Count"]
@@ -439,12 +403,14 @@ def main():
     # Display raw data
     st.markdown(f'<h4 style="font-family: \'Khmer OS Battambang\', sans-serif;">ទិន្នន័យរបស់ដៃគូរសហការជាទម្រង់តារាង</h4>', unsafe_allow_html=True)
     #st.subheader("ទិន្នន័យរបស់ដៃគូរសហការជាទម្រង់តារាង")
-    st.dataframe(filtered_partners, height=400, use_container_width=True)
+    perf.checkpoint("partner.charts")
+    raw_data_table(filtered_partners, TABLE, COLUMNS, height=400)
+    perf.checkpoint("partner.raw_data")
 
     # ---- Refresh Data Button ----
     if st.button("🔄Refresh Data"):
-        st.cache_data.clear()
-        st.rerun()
+        datastore.request_refresh("development_partners")  # Reloaded in the background; the current data stays on screen
+        st.toast("កំពុងធ្វើបច្ចុប្បន្នភាពទិន្នន័យ...")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+import pandas as pd
+import streamlit as st
+
+import metrics
+
+try:
+    import psutil
+except ImportError:  # falls back to /proc, or no memory column
+    psutil = None
+
+# ---- Perf Settings ----
+# The panel is for developers: shown with TVETMIS_PERF_PANEL=1 or by adding ?perf=1 to the URL
+PANEL = os.environ.get("TVETMIS_PERF_PANEL", "0") in ("1", "true", "True")
+BACKGROUND_KEEP = 50
+
+_current_run = ContextVar("perf_run", default=None)
+# Spans recorded outside a rerun: datastore refreshes and the warm-up
+background = deque(maxlen=BACKGROUND_KEEP)
+
+
+def rss_bytes():
+    """Current resident memory of the process, or None when it can't be read."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _rows(value):
+    return len(value) if isinstance(value, (pd.DataFrame, pd.Series, list)) else None
+
+
+class Run:
+    def __init__(self):
+        self.spans = []
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.last_rss = rss_bytes()
+
+
+def start_run():
+    """Begin collecting spans for the current rerun; called at the top of main.py."""
+    run = Run()
+    _current_run.set(run)
+    return run
+
+
+def _span(name, seconds, rss_before, rows_in=None, rows_out=None):
+    rss_after = rss_bytes()
+    return {
+        "section": name,
+        "seconds": seconds,
+        "rows_in": rows_in,
+        "rows_out": rows_out,
+        "memory_delta_mb": (rss_after - rss_before) / 1024 ** 2 if None not in (rss_after, rss_before) else None,
+        "thread": threading.current_thread().name,
+    }
+
+
+def _record(span):
+    run = _current_run.get()
+    (run.spans if run is not None else background).append(span)
+
+
+@contextmanager
+def section(name, rows_in=None):
+    """Time a block. Set span["rows_out"] inside it to record the rows it produced."""
+    span = {"rows_out": None}
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    try:
+        yield span
+    finally:
+        _record(_span(name, time.perf_counter() - start, rss_before, rows_in, span["rows_out"]))
+
+
+def timed(name):
+    """Decorator form of section(); rows_out is the length of a returned frame or list."""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            metrics.loader_ran(name)
+            with section(name) as span:
+                result = function(*args, **kwargs)
+                span["rows_out"] = _rows(result)
+            return result
+        return wrapper
+    return decorator
+
+
+def checkpoint(name, rows_in=None, rows_out=None):
+    """Record the time since the previous checkpoint of this rerun as one span.
+
+    Lets a long main() be split into load / filter / charts without re-indenting it.
+    Sections timed inside the interval are listed separately as well.
+    """
+    run = _current_run.get()
+    if run is None:
+        return
+    now = time.perf_counter()
+    run.spans.append(_span(name, now - run.last, run.last_rss, rows_in, rows_out))
+    run.last = now
+    run.last_rss = rss_bytes()
+
+
+# ---- Panel ----
+def panel():
+    """Sidebar container for the panel when it is enabled and switched on, else None.
+
+    Created before the page runs so it stays at the same place in the sidebar.
+    """
+    if not (PANEL or st.query_params.get("perf") == "1"):
+        return None
+    container = st.sidebar.container()
+    if not container.toggle("⏱️ Performance", key="perf_panel"):
+        return None
+    return container
+
+
+def render_panel(container):
+    run = _current_run.get()
+    if container is None or run is None:
+        return
+    with container:
+        st.caption(f"Rerun: {time.perf_counter() - run.started:.3f}s")
+        if run.spans:
+            st.dataframe(pd.DataFrame(run.spans).drop(columns="thread"), hide_index=True)
+        if background:
+            st.caption("Background loads")
+            st.dataframe(pd.DataFrame(list(background)[::-1]), hide_index=True)
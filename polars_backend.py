@@ -0,0 +1,83 @@
+import os
+import re
+
+try:
+    import polars as pl
+except ImportError:  # the backend is optional, aggregates fall back to MySQL
+    pl = None
+
+import snapshots
+
+# ---- Polars Settings ----
+# TVETMIS_BACKEND=polars answers the aggregate queries with Polars lazy queries over
+# the Parquet snapshots. Filters and column selection are pushed down into the scan,
+# the plan runs on every core, and only the small aggregate is turned into pandas.
+ENABLED = os.environ.get("TVETMIS_BACKEND", "sql").lower() == "polars"
+
+
+def available(table):
+    """True when queries on table should run in Polars: enabled, installed and a fresh snapshot."""
+    return ENABLED and pl is not None and snapshots.enabled() and snapshots.is_fresh(table)
+
+
+def _column(column, fill=None):
+    expression = pl.col(column)
+    if fill and column in fill:
+        # Same result as COALESCE(column, 'Unknown') in MySQL: text with NULL filled
+        expression = expression.cast(pl.Utf8).fill_null(fill[column])
+    return expression.alias(column)
+
+
+def _year(frame, column):
+    if frame.collect_schema()[column].is_temporal():
+        return pl.col(column).dt.year()
+    # Dates stored as text (e.g. 0000-00-00) become null
+    return pl.col(column).cast(pl.Utf8).str.slice(0, 10).str.to_date("%Y-%m-%d", strict=False).dt.year()
+
+
+# TRY_CAST(column AS TIMESTAMP) in a where condition, e.g. sql_aggregates.date_between()
+_TIMESTAMP_CAST = re.compile(r"TRY_CAST\((\w+) AS TIMESTAMP\)", re.IGNORECASE)
+
+
+def _timestamps(frame, where):
+    """Polars SQL can't cast text to a timestamp: parse the text columns the where casts
+    first, with invalid dates (e.g. 0000-00-00) as null like TRY_CAST in DuckDB."""
+    schema = frame.collect_schema()
+    text = [c for c in set(_TIMESTAMP_CAST.findall(where)) if schema.get(c) == pl.Utf8]
+    if not text:
+        return frame
+    return frame.with_columns(pl.col(c).str.to_datetime(strict=False) for c in text)
+
+
+def _scan(table, filters=None, fill=None, where=None):
+    frame = pl.scan_parquet(snapshots.latest_path(table))
+    for column, values in (filters or {}).items():
+        if values:
+            frame = frame.filter(_column(column, fill).is_in(list(values)))
+    if where:
+        frame = _timestamps(frame, where).filter(pl.sql_expr(where))
+    return frame
+
+
+def count_by(table, columns, filters=None, fill=None, where=None):
+    frame = _scan(table, filters, fill, where)
+    counts = frame.group_by([_column(c, fill) for c in columns]).agg(pl.len().alias("count"))
+    return counts.collect().to_pandas()
+
+
+def count_by_year(table, date_column, columns, filters=None, fill=None, where=None):
+    frame = _scan(table, filters, fill, where)
+    keys = [_year(frame, date_column).alias("birth_year")] + [_column(c, fill) for c in columns]
+    counts = frame.group_by(keys).agg(pl.len().alias("count"))
+    return counts.collect().to_pandas()
+
+
+def distinct_values(table, column, filters=None, fill=None):
+    frame = _scan(table, filters, fill)
+    values = frame.select(_column(column, fill)).unique().collect().to_series().drop_nulls()
+    return sorted(values.to_list())
+
+
+def select_rows(table, columns, filters=None, fill=None, limit=1000):
+    frame = _scan(table, filters, fill)
+    return frame.select([_column(c, fill) for c in columns]).head(int(limit)).collect().to_pandas()
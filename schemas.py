@@ -0,0 +1,104 @@
+import logging
+import sys
+
+import pandas as pd
+
+from db import apply_dtypes
+
+logger = logging.getLogger(__name__)
+
+# ---- Table Schemas ----
+# Dtypes applied right after a table is loaded. Low-cardinality text columns become
+# categoricals, so each repeated Khmer label is stored once and rows hold small integer
+# codes; flag and status columns become nullable small integers.
+SCHEMAS = {
+    "tvet15m": {
+        "gender": "category",
+        "apply_major_name": "category",
+        "school_name": "category",
+        "address_city_province_name": "category",
+        "shift_name": "category",
+        "has_job": "Int8",
+        "scholarship_status": "Int8",
+    },
+    "tvet_staff": {
+        "gender": "category",
+        "address_city_provinces": "category",
+        "role_name": "category",
+        "status": "Int8",
+    },
+    "school_staff": {
+        "gender": "category",
+        "address_city_provinces": "category",
+        "role_name": "category",
+        "schools_name": "category",
+        "employment_type_name": "category",
+        "status": "Int8",
+    },
+    "development_partners": {
+        "city_province_name": "category",
+        "school_name": "category",
+        "type_development_partners": "category",
+        "business": "category",
+        "status": "Int8",
+    },
+    "erpl_candidate": {
+        "gender": "category",
+        "address_city_provinces": "category",
+        "marital_status": "category",
+        "verified": "Int8",
+    },
+    "student_internships_15m": {
+        "internship_pass_fail": "Int8",
+        "partner_type": "Int8",
+        "province_name": "category",
+        "school_name": "category",
+        "gender": "category",
+        "major_name": "category",
+    },
+}
+
+
+def memory_bytes(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def apply_schema(df, table):
+    """Convert the schema columns of a loaded table in place and log the memory saved."""
+    before = memory_bytes(df)
+    df = apply_dtypes(df, SCHEMAS.get(table))
+    after = memory_bytes(df)
+    df.attrs["memory_report"] = {"table": table, "rows": len(df), "before_bytes": before, "after_bytes": after}
+    logger.debug("%s: %s rows, %.1f MB -> %.1f MB", table, f"{len(df):,}", before / 1024 ** 2, after / 1024 ** 2)
+    return df
+
+
+def memory_report(df):
+    """Per-column dtype and memory of a frame, largest first, for the sidebar or a notebook."""
+    usage = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({"dtype": df.dtypes.astype(str), "bytes": usage})
+    return report.sort_values("bytes", ascending=False)
+
+
+def as_text(series):
+    """Text labels of a column for multiselects and chart axes.
+
+    Nullable integers render as "1" / "0" and NULL as "Unknown" (as float columns they
+    used to show as "1.0" / "0.0" / "nan").
+    """
+    return series.astype(str).replace({"<NA>": "Unknown", "nan": "Unknown"})
+
+
+def drop_unused_categories(df):
+    """Drop categories the filters removed so value_counts and charts don't list them with zero."""
+    for column in df.select_dtypes("category").columns:
+        df[column] = df[column].cat.remove_unused_categories()
+    return df
+
+
+if __name__ == "__main__":
+    from db import load_columns
+
+    for table in sys.argv[1:] or SCHEMAS:
+        df = apply_schema(load_columns(table, list(SCHEMAS[table])), table)
+        print(memory_report(df).to_string())
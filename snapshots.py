@@ -0,0 +1,149 @@
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import inspect
+from sqlalchemy import types as sqltypes
+
+import metrics
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # snapshots are optional, loaders fall back to MySQL
+    pa = None
+    pq = None
+
+# ---- Snapshot Settings ----
+SNAPSHOT_DIR = Path(os.environ.get("TVETMIS_SNAPSHOT_DIR", Path(__file__).parent / "snapshots"))
+MAX_AGE = int(os.environ.get("TVETMIS_SNAPSHOT_MAX_AGE", 6 * 3600))  # seconds before a snapshot is stale
+KEEP_VERSIONS = int(os.environ.get("TVETMIS_SNAPSHOT_KEEP", 3))
+# Serve only from snapshots, whatever their age (e.g. while MySQL is under maintenance)
+SNAPSHOT_ONLY = os.environ.get("TVETMIS_SNAPSHOT_ONLY", "0") in ("1", "true", "True")
+
+TABLES = [
+    "tvet15m",
+    "tvetsms_data",
+    "school_staff",
+    "tvet_staff",
+    "development_partners",
+    "student_internships_15m",
+    "erpl_candidate",
+]
+
+
+def enabled():
+    return pq is not None
+
+
+def latest_path(table):
+    """Path of the newest snapshot of a table, or None."""
+    pointer = SNAPSHOT_DIR / table / "LATEST"
+    if not pointer.exists():
+        return None
+    path = SNAPSHOT_DIR / table / pointer.read_text().strip()
+    return path if path.exists() else None
+
+
+def is_fresh(table):
+    path = latest_path(table)
+    if path is None:
+        return False
+    return SNAPSHOT_ONLY or time.time() - path.stat().st_mtime < MAX_AGE
+
+
+def _where_filters(where):
+    """Translate simple 'col = value AND ...' clauses to pyarrow filters, None otherwise."""
+    if not where:
+        return []
+    filters = []
+    for clause in re.split(r"\s+AND\s+", where.strip(), flags=re.IGNORECASE):
+        match = re.fullmatch(r"(\w+)\s*=\s*(-?\d+|'[^']*')", clause.strip())
+        if not match:
+            return None
+        column, value = match.groups()
+        filters.append((column, "=", value.strip("'") if value.startswith("'") else int(value)))
+    return filters
+
+
+def read_snapshot(table, columns=None, where=None, key_in=None):
+    """Read a fresh snapshot (memory-mapped), or return None so the caller queries MySQL.
+
+    key_in=(column, values) keeps only the rows whose column is in values.
+    """
+    if not enabled() or not is_fresh(table):
+        return None
+    filters = _where_filters(where)
+    if filters is None:
+        return None
+    if key_in is not None:
+        filters.append((key_in[0], "in", list(key_in[1])))
+    path = latest_path(table)
+    with metrics.query("snapshot", table) as result:
+        df = pq.read_table(path, columns=columns, filters=filters or None, memory_map=True).to_pandas()
+        result["rows"] = len(df)
+    return df
+
+
+def snapshot_columns(table):
+    path = latest_path(table)
+    if not enabled() or path is None:
+        return None
+    return pq.read_schema(path).names
+
+
+# ---- Extract ----
+def _arrow_safe(df):
+    # pymysql returns invalid dates such as 0000-00-00 as strings next to datetimes;
+    # Arrow needs one type per column, so mixed object columns are stored as text.
+    for column in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[column], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[column] = df[column].map(lambda v: None if v is None else str(v))
+    return df
+
+
+def _source_integers(df, table, engine):
+    # pd.read_sql turns integer columns with NULLs into float64 (1 -> 1.0). Stored like
+    # that, DuckDB and Polars would show status 1 as "1.0" where MySQL shows "1", so
+    # the integer columns of the source table are written as nullable Int64.
+    integers = {c["name"] for c in inspect(engine).get_columns(table) if isinstance(c["type"], sqltypes.Integer)}
+    for column in df.columns:
+        if column in integers and df[column].dtype.kind == "f":
+            df[column] = df[column].astype("Int64")
+    return df
+
+
+def extract(table):
+    """Write a new versioned snapshot of a table and point LATEST at it."""
+    from db import get_engine
+
+    engine = get_engine()
+    df = _arrow_safe(_source_integers(pd.read_sql(f"SELECT * FROM {table}", engine), table, engine))
+    folder = SNAPSHOT_DIR / table
+    folder.mkdir(parents=True, exist_ok=True)
+    name = time.strftime("%Y%m%dT%H%M%S") + ".parquet"
+    tmp = folder / (name + ".tmp")
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, folder / name)
+
+    pointer_tmp = folder / "LATEST.tmp"
+    pointer_tmp.write_text(name)
+    os.replace(pointer_tmp, folder / "LATEST")
+
+    for old in sorted(folder.glob("*.parquet"))[:-KEEP_VERSIONS]:
+        old.unlink()
+    return folder / name, len(df)
+
+
+if __name__ == "__main__":
+    if not enabled():
+        sys.exit("pyarrow is required to write snapshots")
+    for table in sys.argv[1:] or TABLES:
+        start = time.perf_counter()
+        path, rows = extract(table)
+        print(f"{table}: {rows:,} rows -> {path} ({time.perf_counter() - start:.1f}s)")
@@ -0,0 +1,200 @@
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+import duckdb_backend
+import metrics
+import polars_backend
+from db import get_engine, read_sql
+
+# Turns the multiselect state of a page into parameterized GROUP BY queries, so the
+# database returns only the aggregates a chart needs instead of every row.
+#
+# filters: {column: [selected values]}; empty selections are ignored.
+# fill:    {column: label} for columns the page shows NULL as e.g. "Unknown".
+#
+# TVETMIS_BACKEND picks where each query runs: "sql" (the database, default), "duckdb"
+# or "polars" (both over the table's Parquet snapshot, see duckdb_backend.py and
+# polars_backend.py). Without a fresh snapshot a query falls back to the database.
+
+
+def _backend(table):
+    if duckdb_backend.available(table):
+        return "duckdb"
+    if polars_backend.available(table):
+        return "polars"
+    return "sql"
+
+
+def _source(table, backend):
+    return duckdb_backend.source(table) if backend == "duckdb" else table
+
+
+def column_expression(column, fill=None, backend="sql"):
+    if fill and column in fill:
+        if backend == "duckdb":
+            # MySQL turns COALESCE(int_column, 'Unknown') into text; DuckDB needs the cast spelled out
+            return f"COALESCE(CAST({column} AS VARCHAR), '{fill[column]}')"
+        return f"COALESCE({column}, '{fill[column]}')"
+    return column
+
+
+def year_expression(column, backend="sql"):
+    """YEAR(column) for the current database dialect."""
+    if backend == "duckdb":
+        # Snapshots may store dates as text (e.g. 0000-00-00); those become NULL
+        return f"YEAR(TRY_CAST({column} AS DATE))"
+    if get_engine().dialect.name == "sqlite":
+        return f"CAST(strftime('%Y', {column}) AS INTEGER)"
+    return f"YEAR({column})"
+
+
+def compile_filters(filters, fill=None, backend="sql"):
+    """Return (WHERE clause, bind parameters) for the selected filter values."""
+    clauses = []
+    params = {}
+    for i, (column, values) in enumerate((filters or {}).items()):
+        if not values:
+            continue
+        name = f"f{i}"
+        if backend == "duckdb":
+            clauses.append(f"{column_expression(column, fill, backend)} IN (SELECT UNNEST(${name}))")
+        else:
+            clauses.append(f"{column_expression(column, fill, backend)} IN :{name}")
+        params[name] = list(values)
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    return where, params
+
+
+def _run(query, params, backend, table):
+    if backend == "duckdb":
+        with metrics.query("duckdb", table) as result:
+            df = duckdb_backend.run(query, params)
+            result["rows"] = len(df)
+        return df
+    statement = text(query)
+    for name, value in params.items():
+        if isinstance(value, list):
+            statement = statement.bindparams(bindparam(name, expanding=True))
+    return read_sql(statement, params, table=table)
+
+
+def _polars(function, table, *args):
+    with metrics.query("polars", table) as result:
+        values = function(table, *args)
+        result["rows"] = len(values)
+    return values
+
+
+def count_by(table, columns, filters=None, fill=None, where=None):
+    """SELECT columns, COUNT(*) ... GROUP BY columns."""
+    backend = _backend(table)
+    if backend == "polars":
+        return _polars(polars_backend.count_by, table, columns, filters, fill, where)
+    filter_sql, params = compile_filters(filters, fill, backend)
+    if where:
+        filter_sql += (" AND " if filter_sql else " WHERE ") + where
+    select = ", ".join(f"{column_expression(c, fill, backend)} AS {c}" for c in columns)
+    group = ", ".join(column_expression(c, fill, backend) for c in columns)
+    query = f"SELECT {select}, COUNT(*) AS count FROM {_source(table, backend)}{filter_sql} GROUP BY {group}"
+    return _run(query, params, backend, table)
+
+
+def count_by_year(table, date_column, columns, filters=None, fill=None, where=None):
+    """Counts grouped by the year of date_column (as birth_year) and the given columns."""
+    backend = _backend(table)
+    if backend == "polars":
+        return _polars(polars_backend.count_by_year, table, date_column, columns, filters, fill, where)
+    filter_sql, params = compile_filters(filters, fill, backend)
+    if where:
+        filter_sql += (" AND " if filter_sql else " WHERE ") + where
+    year = year_expression(date_column, backend)
+    select = ", ".join([f"{year} AS birth_year"] + [f"{column_expression(c, fill, backend)} AS {c}" for c in columns])
+    group = ", ".join([year] + [column_expression(c, fill, backend) for c in columns])
+    query = f"SELECT {select}, COUNT(*) AS count FROM {_source(table, backend)}{filter_sql} GROUP BY {group}"
+    return _run(query, params, backend, table)
+
+
+def distinct_values(table, column, filters=None, fill=None):
+    """Sorted option list for a multiselect, restricted by the upstream filters."""
+    backend = _backend(table)
+    if backend == "polars":
+        return _polars(polars_backend.distinct_values, table, column, filters, fill)
+    filter_sql, params = compile_filters(filters, fill, backend)
+    expression = column_expression(column, fill, backend)
+    query = f"SELECT DISTINCT {expression} AS {column} FROM {_source(table, backend)}{filter_sql}"
+    values = _run(query, params, backend, table)[column].dropna()
+    return sorted(values.tolist())
+
+
+def select_rows(table, columns, filters=None, fill=None, limit=1000):
+    """Row-level preview of the filtered data, capped at limit rows."""
+    backend = _backend(table)
+    if backend == "polars":
+        return _polars(polars_backend.select_rows, table, columns, filters, fill, limit)
+    filter_sql, params = compile_filters(filters, fill, backend)
+    select = ", ".join(f"{column_expression(c, fill, backend)} AS {c}" for c in columns)
+    query = f"SELECT {select} FROM {_source(table, backend)}{filter_sql} LIMIT {int(limit)}"
+    return _run(query, params, backend, table)
+
+# ---- Page Aggregates ----
+# Pages that keep the filtered rows in memory (for the raw data table) count them for
+# their charts with these. With a snapshot backend the counts are GROUP BY queries on
+# the snapshot, so filters and where must describe the same rows as frame; on the sql
+# backend frame is counted in pandas, which saves a round trip to MySQL.
+def _filled(series, fill):
+    """A frame column labelled like COALESCE(CAST(column AS VARCHAR), fill) in SQL."""
+    if pd.api.types.is_float_dtype(series) and (series.dropna() % 1 == 0).all():
+        series = series.astype("Int64")  # integers read with NULLs, "1" rather than "1.0"
+    if pd.api.types.is_numeric_dtype(series):
+        series = series.astype("string")
+    if not series.hasnans:
+        return series
+    if isinstance(series.dtype, pd.CategoricalDtype) and fill not in series.cat.categories:
+        series = series.cat.add_categories([fill])
+    return series.fillna(fill)
+
+
+def _frame_counts(table, keys):
+    # NULL keys stay a group of their own, as with GROUP BY
+    with metrics.query("pandas", table) as result:
+        frame = pd.concat(keys, axis=1)
+        counts = frame.groupby(list(frame.columns), observed=True, dropna=False).size().reset_index(name="count")
+        result["rows"] = len(counts)
+    return counts
+
+
+def date_between(column, start_date, end_date):
+    """where condition for start_date <= column < the day after end_date, as the pages' date filter.
+
+    Snapshots may store the column as text with invalid dates (e.g. 0000-00-00); TRY_CAST
+    leaves those out, as the frame's parsed NaT are.
+    """
+    start = pd.Timestamp(start_date)
+    end = pd.Timestamp(end_date) + pd.Timedelta(days=1)
+    value = f"TRY_CAST({column} AS TIMESTAMP)"
+    return f"{value} >= CAST('{start:%Y-%m-%d}' AS TIMESTAMP) AND {value} < CAST('{end:%Y-%m-%d}' AS TIMESTAMP)"
+
+
+def frame_counts(table, frame, columns, fill=None):
+    """The counts of count_by, from an already filtered frame."""
+    return _frame_counts(table, [_filled(frame[c], fill[c]) if fill and c in fill else frame[c] for c in columns])
+
+
+def frame_counts_by_year(table, frame, date_column, columns, fill=None):
+    """The counts of count_by_year, from an already filtered frame."""
+    year = pd.to_datetime(frame[date_column], errors="coerce").dt.year.rename("birth_year")
+    return _frame_counts(table, [year] + [_filled(frame[c], fill[c]) if fill and c in fill else frame[c] for c in columns])
+
+
+def counts(table, frame, columns, filters=None, fill=None, where=None):
+    """count_by on the snapshot backend, or the same counts of the filtered frame."""
+    if _backend(table) != "sql":
+        return count_by(table, columns, filters, fill, where)
+    return frame_counts(table, frame, columns, fill)
+
+
+def counts_by_year(table, frame, date_column, columns, filters=None, fill=None, where=None):
+    """count_by_year on the snapshot backend, or the same counts of the filtered frame."""
+    if _backend(table) != "sql":
+        return count_by_year(table, date_column, columns, filters, fill, where)
+    return frame_counts_by_year(table, frame, date_column, columns, fill)
@@ -1,49 +1,45 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from sqlalchemy import create_engine
-from datetime import datetime
+import derived
+import datastore
+import perf
+import metrics
+from db import load_columns
+import schemas
+from widgets import raw_data_table
+
+# ---- Column Manifest ----
+TABLE = "tvet_staff"
+COLUMNS = [
+    "id", "gender", "date_of_birth", "address_city_provinces",
+    "role_name", "status",
+]
+
+@perf.timed("tvet_staff.fetch")
+def fetch_staff_data():
+    df = schemas.apply_schema(load_columns(TABLE, COLUMNS), TABLE)
+    return derived.apply_derived(df, "tvet_staff")
+
+# ---- Derived Columns ----
+derived.register("tvet_staff", "date_of_birth", derived.parse_date("date_of_birth"))
+derived.register("tvet_staff", "age", derived.age_by_days())
+
+datastore.register("tvet_staff", fetch_staff_data, ttl=3600, max_bytes=64 * 1024 ** 2)
 
-# ---- Database Connection ----
-DB_USER = "root"
-DB_PASSWORD = ""
-DB_HOST = "localhost"
-DB_NAME = "tvetm"
-
-engine = create_engine(f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}")
-
-@st.cache_data
 def load_staff_data():
-    query = "SELECT * FROM tvet_staff"
     try:
-        df = pd.read_sql(query, engine)
+        df = datastore.get("tvet_staff")
     except Exception as e:
         st.error(f"Error loading staff data: {e}")
         return pd.DataFrame()
     return df
 
+@metrics.timed_page("staff")
 def main():
 
-    # ---- Custom Khmer Font ----
-    st.markdown(
-        """
-        <style>
-        @import url('https://fonts.googleapis.com/css2?family=Battambang:wght@400;700&display=swap');
-        body, h1, h2, h3, h4, h5, h6, p, div, span, label, button, input, select, textarea {
-            font-family: 'Battambang', sans-serif !important;
-        }
-        * {
-        font-family: 'Khmer OS Battambang', sans-serif !important;
-        }
-        h1, h2, h3, h4, h5, h6, p, span, label, button, input, select, textarea {
-        font-family: 'Khmer OS Battambang', sans-serif !important;
-        }
-        </style>
-        """,
-        unsafe_allow_html=True,
-    )
-
     df_staff = load_staff_data()
+    perf.checkpoint("staff.load", rows_out=len(df_staff))
 
     if df_staff.empty:
         st.warning("No staff data found.")
@@ -54,7 +50,7 @@ def main():
 
     # ---- Province Filter ----
     with col3:
-        province_options = sorted(df_staff["address_city_provinces"].unique())
+        province_options = sorted(df_staff["address_city_provinces"].dropna().unique())
         selected_provinces = st.multiselect("ខេត្ត/ក្រុង", province_options)
 
     if selected_provinces:
@@ -64,7 +60,7 @@ def main():
 
     # ---- Role Filter ----
     with col1:
-        role_options = sorted(filtered_staff["role_name"].unique())
+        role_options = sorted(filtered_staff["role_name"].dropna().unique())
         selected_roles = st.multiselect("តួនាទី", role_options)
 
     if selected_roles:
@@ -93,32 +89,10 @@ def main():
         else:
             st.warning("⚠️ No gender data available.")
 
-    kpi1, kpi2, kpi3, kpi4, kpi5 = st.columns(5)
+    filtered_staff = schemas.drop_unused_categories(filtered_staff)
+    perf.checkpoint("staff.filter", rows_in=len(df_staff), rows_out=len(filtered_staff))
 
-    # Define CSS for centering and styling
-    centered_metric_style = """
-    <style>
-    .metric-container {
-        display: flex;
-        flex-direction: column;
-        align-items: center;
-        text-align: center;
-        padding: 0.5em 0; /* Reduced vertical padding */
-    }
-    .metric-value {
-        font-size: 2em;
-        font-weight: bold;
-        margin-top: 0.1em; /* Added top margin */
-    }
-    .metric-label {
-        font-size: 0.9em;
-        color: #555;
-        order: -1; /* Moves the label to the top */
-        margin-bottom: 0.1em; /* Added bottom margin for spacing */
-    }
-    </style>
-    """
-    st.markdown(centered_metric_style, unsafe_allow_html=True)
+    kpi1, kpi2, kpi3, kpi4, kpi5 = st.columns(5)
 
     def format_percentage(percent):
         if percent == int(percent):
@@ -142,11 +116,9 @@ def main():
             try:
                 #print(f"date_of_birth column data type: {filtered_staff['date_of_birth'].dtype}")
                 #print(f"date_of_birth column sample data: {filtered_staff['date_of_birth'].head()}")
-                filtered_staff['date_of_birth'] = pd.to_datetime(filtered_staff['date_of_birth'], errors='coerce')
                 filtered_staff = filtered_staff.dropna(subset=['date_of_birth'])
                 #print(f"DataFrame length after dropna: {len(filtered_staff)}")
-                ages = (datetime.now() - filtered_staff['date_of_birth']).dt.days // 365
-                average_age = ages.mean()
+                average_age = filtered_staff['age'].mean()  # age is derived at load time
                 st.markdown(f'<div class="metric-container"><div class="metric-label">អាយុជាមធ្យម</div><div class="metric-value">{average_age:.0F} ឆ្នាំ</div></div>', unsafe_allow_html=True)
             except Exception as e:
                 print(f"date_of_birth conversion error: {e}")
@@ -255,9 +227,7 @@ def main():
     with col4:
         # Check and calculate age
         if 'date_of_birth' in filtered_staff.columns:
-            filtered_staff['date_of_birth'] = pd.to_datetime(filtered_staff['date_of_birth'], errors='coerce')
             filtered_staff = filtered_staff.dropna(subset=['date_of_birth'])
-            filtered_staff['age'] = (datetime.now() - filtered_staff['date_of_birth']).dt.days // 365
         else:
             st.warning("The 'date_of_birth' column is missing from the data.")
 
@@ -265,7 +235,7 @@ def main():
         if 'age' in filtered_staff.columns and 'gender' in filtered_staff.columns:
             gender_labels = {"male": "ប្រុស", "female": "ស្រី"}  # Gender dictionary
 
-            age_distribution = filtered_staff.groupby(['age', 'gender']).size().reset_index(name='count')
+            age_distribution = filtered_staff.groupby(['age', 'gender'], observed=True).size().reset_index(name='count')
             age_distribution['gender'] = age_distribution['gender'].map(gender_labels)  # Apply Khmer labels
 
             custom_colors = ["green", "purple"] # example colors, change it as you wish.
@@ -329,12 +299,14 @@ def main():
     # Display raw data
     st.markdown(f'<h4 style="font-family: \'Khmer OS Battambang\', sans-serif;">ទិន្នន័យរបស់បុគ្គលិកជាទម្រង់តារាង</h4>', unsafe_allow_html=True)
     #st.subheader("ទិន្នន័យរបស់បុគ្គលិកជាទម្រង់តារាង")
-    st.dataframe(filtered_staff, height=400, use_container_width=True)
+    perf.checkpoint("staff.charts")
+    raw_data_table(filtered_staff, TABLE, COLUMNS, height=400)
+    perf.checkpoint("staff.raw_data")
 
     # ---- Refresh Data Button ----
     if st.button("🔄Refresh Data"):
-        st.cache_data.clear()
-        st.rerun()
+        datastore.request_refresh("tvet_staff")  # Reloaded in the background; the current data stays on screen
+        st.toast("កំពុងធ្វើបច្ចុប្បន្នភាពទិន្នន័យ...")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
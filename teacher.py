@@ -1,18 +1,16 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from sqlalchemy import create_engine
+import derived
+import datastore
+import perf
+import metrics
+from db import load_columns
+import schemas
+from widgets import raw_data_table
 import warnings
 import plotly.graph_objects as go
 
-# ---- Database Connection ----
-DB_USER = "root"
-DB_PASSWORD = ""
-DB_HOST = "localhost"
-DB_NAME = "tvetm"
-
-engine = create_engine(f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}")
-
 student_statuses = {
     "ACTIVE": 1,
     "INACTIVE": 0,
@@ -32,44 +30,47 @@ student_statuses = {
     "QUIT_NOT_ENOGUH_DOC": 6
 }
 
-@st.cache_data
+# ---- Column Manifest ----
+TABLE = "school_staff"
+WHERE = "is_teaching = 1"
+COLUMNS = [
+    "id", "gender", "date_of_birth", "address_city_provinces",
+    "role_name", "status", "schools_name", "employment_type_name",
+    "start_work_at",
+]
+
+@perf.timed("school_staff.fetch")
+def fetch_teacher_data():
+    df = load_columns(TABLE, COLUMNS, WHERE)
+
+    warnings.simplefilter(action="ignore", category=UserWarning)
+    df["start_work_at"] = df["start_work_at"].replace("0000-00-00 00:00:00", None)
+    df["start_work_at"] = pd.to_datetime(df["start_work_at"], format="%Y-%m-%d %H:%M:%S", errors="coerce")
+    df.loc[:, "start_work_at"] = df["start_work_at"].fillna(pd.Timestamp("1970-01-01"))
+    df.loc[:, "start_work_at_str"] = df["start_work_at"].astype(str)  # Keep original as datetime, create str for display
+    return derived.apply_derived(schemas.apply_schema(df, TABLE), "school_staff")
+
+# ---- Derived Columns ----
+derived.register("school_staff", "date_of_birth", derived.parse_date("date_of_birth"))
+derived.register("school_staff", "age", derived.age_by_days())
+# Reverse map of the status codes for display
+derived.register("school_staff", "status_label", derived.label("status", {v: k for k, v in student_statuses.items()}))
+
+datastore.register("school_staff", fetch_teacher_data, ttl=3600, max_bytes=128 * 1024 ** 2)
+
 def load_teacher_data():
-    query = "SELECT * FROM school_staff WHERE is_teaching = 1"
     try:
-        df = pd.read_sql(query, engine)
-
-        warnings.simplefilter(action="ignore", category=UserWarning)
-        df["start_work_at"] = df["start_work_at"].replace("0000-00-00 00:00:00", None)
-        df["start_work_at"] = pd.to_datetime(df["start_work_at"], format="%Y-%m-%d %H:%M:%S", errors="coerce")
-        df.loc[:, "start_work_at"] = df["start_work_at"].fillna(pd.Timestamp("1970-01-01"))
-        df.loc[:, "start_work_at_str"] = df["start_work_at"].astype(str)  # Keep original as datetime, create str for display
+        df = datastore.get("school_staff")
     except Exception as e:
         st.error(f"Error loading teacher data: {e}")
         return pd.DataFrame()
 
     return df
 
+@metrics.timed_page("teacher")
 def main():
-    # ---- Custom Khmer Font ----
-    st.markdown(
-        """
-        <style>
-        @import url('https://fonts.googleapis.com/css2?family=Battambang:wght@400;700&display=swap');
-        body, h1, h2, h3, h4, h5, h6, p, div, span, label, button, input, select, textarea {
-            font-family: 'Battambang', sans-serif !important;
-        }
-        * {
-        font-family: 'Khmer OS Battambang', sans-serif !important;
-        }
-        h1, h2, h3, h4, h5, h6, p, span, label, button, input, select, textarea {
-        font-family: 'Khmer OS Battambang', sans-serif !important;
-        }
-        </style>
-        """,
-        unsafe_allow_html=True,
-    )
-
     df_teachers = load_teacher_data()
+    perf.checkpoint("teacher.load", rows_out=len(df_teachers))
 
     if df_teachers.empty:
         st.warning("No teacher data found.")
@@ -80,22 +81,9 @@ def main():
 
     with col1:
         # ---- Date Range Filter with Validation ----
-        with st.container(border=True):
+        with st.container(border=True, key="start_work_filter"):
             st.subheader("រយៈពេលចាប់ផ្ដើមបម្រើការងារ")
 
-            # Custom CSS to control height/width of date picker
-            st.markdown("""
-                <style>
-                div[data-baseweb="input"] > div {
-                    height: 29px;  /* Adjust height */
-                    font-size: 16px;  /* Optional: adjust font size */
-                }
-                .stDateInput {
-                    padding: 10px 5px;
-                }
-                </style>
-                """, unsafe_allow_html=True)
-
             min_date = df_teachers["start_work_at"].min().date()
             max_date = df_teachers["start_work_at"].max().date()
 
@@ -167,6 +155,8 @@ def main():
 
     # ---- KPI Metrics for Teachers ----
     if valid_selection:
+        filtered_teachers = schemas.drop_unused_categories(filtered_teachers)
+        perf.checkpoint("teacher.filter", rows_in=len(df_teachers), rows_out=len(filtered_teachers))
         total_teachers = len(filtered_teachers)
 
         # Total female teachers
@@ -175,16 +165,8 @@ def main():
         # Active teachers
         active_teachers = filtered_teachers[filtered_teachers["status"] == 1].shape[0]
         
-        # Calculate average age from date_of_birth
-        if "date_of_birth" in filtered_teachers.columns and not filtered_teachers.empty:
-            # Ensure date_of_birth is in datetime format
-            filtered_teachers["date_of_birth"] = pd.to_datetime(filtered_teachers["date_of_birth"], errors='coerce')
-            
-            # Calculate age
-            today = pd.to_datetime("today")
-            filtered_teachers["age"] = (today - filtered_teachers["date_of_birth"]).dt.days // 365
-            
-            # Calculate the average age
+        # Calculate average age (derived from date_of_birth at load time)
+        if "age" in filtered_teachers.columns and not filtered_teachers.empty:
             avg_age = int(filtered_teachers["age"].mean())
         else:
             avg_age = 0  # If no date_of_birth column or it's empty
@@ -192,31 +174,6 @@ def main():
         # KPI Cards Layout
         kpi1, kpi2, kpi3, kpi4 = st.columns(4)
 
-        # Define CSS for centering and styling
-        centered_metric_style = """
-        <style>
-        .metric-container {
-            display: flex;
-            flex-direction: column;
-            align-items: center;
-            text-align: center;
-            padding: 0.5em 0; /* Reduced vertical padding */
-        }
-        .metric-value {
-            font-size: 2em;
-            font-weight: bold;
-            margin-top: 0.1em; /* Added top margin */
-        }
-        .metric-label {
-            font-size: 0.9em;
-            color: #555;
-            order: -1; /* Moves the label to the top */
-            margin-bottom: 0.1em; /* Added bottom margin for spacing */
-        }
-        </style>
-        """
-        st.markdown(centered_metric_style, unsafe_allow_html=True)
-
         def format_percentage(percent):
             if percent == int(percent):
                 return f"{int(percent)}%"
@@ -398,10 +355,7 @@ def main():
                         fig_placeholder.update_traces(textposition="outside")
                         st.plotly_chart(fig_placeholder, use_container_width=True)
                     else:
-                        # Map statuses to labels (reverse map for lookup)
-                        status_label_map = {v: k for k, v in student_statuses.items()}
-                        filtered_teachers["status_label"] = filtered_teachers["status"].map(status_label_map)
-
+                        # status_label is mapped at load time
                         # Count status occurrences
                         status_counts = filtered_teachers["status_label"].value_counts().reset_index()
                         status_counts.columns = ["Status", "Count"]
@@ -500,12 +454,14 @@ def main():
     # ---- Display Raw Data ----
     #st.subheader("ទិន្នន័យរបស់សាស្ត្រាចារ្យជាទម្រង់តារាង")
     st.markdown(f'<h4 style="font-family: \'Khmer OS Battambang\', sans-serif;">ទិន្នន័យរបស់សាស្ត្រាចារ្យជាទម្រង់តារាង</h4>', unsafe_allow_html=True)
-    st.dataframe(filtered_teachers, height=400, use_container_width=True)
+    perf.checkpoint("teacher.charts")
+    raw_data_table(filtered_teachers, TABLE, COLUMNS, height=400)
+    perf.checkpoint("teacher.raw_data")
 
     # ---- Refresh Data Button ----
     if st.button("🔄Refresh Data"):
-        st.cache_data.clear()
-        st.rerun()
+        datastore.request_refresh("school_staff")  # Reloaded in the background; the current data stays on screen
+        st.toast("កំពុងធ្វើបច្ចុប្បន្នភាពទិន្នន័យ...")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,91 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+sqlalchemy = pytest.importorskip("sqlalchemy")
+
+import db
+import duckdb_backend
+import polars_backend
+import snapshots
+import sql_aggregates
+
+# status is an INTEGER column with NULLs, as in tvetsms_data; created_at is text with a zero date
+ROWS = [
+    (1, 1, "M", "2023-01-05 10:00:00"),
+    (2, 1, "F", "0000-00-00 00:00:00"),
+    (3, 0, "F", "2023-01-31 23:59:59"),
+    (4, None, "M", "2023-02-01 00:00:00"),
+    (5, 2, None, None),
+]
+FILL = {"status": "Unknown", "gender": "Unknown"}
+
+
+@pytest.fixture
+def tvetsms(tmp_path, monkeypatch):
+    """A SQLite tvetsms_data table and a fresh Parquet snapshot of it."""
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'tvetm.db'}")
+    with engine.begin() as connection:
+        connection.execute(sqlalchemy.text(
+            "CREATE TABLE tvetsms_data (id INTEGER PRIMARY KEY, status INTEGER, gender TEXT, created_at TEXT)"))
+        connection.execute(
+            sqlalchemy.text("INSERT INTO tvetsms_data VALUES (:id, :status, :gender, :created_at)"),
+            [{"id": i, "status": s, "gender": g, "created_at": c} for i, s, g, c in ROWS],
+        )
+    monkeypatch.setattr(db, "_engine", engine)
+    monkeypatch.setattr(snapshots, "SNAPSHOT_DIR", tmp_path / "snapshots")
+    snapshots.extract("tvetsms_data")
+    yield
+    engine.dispose()
+
+
+def _counts(backend, monkeypatch, columns, where=None):
+    monkeypatch.setattr(duckdb_backend, "ENABLED", backend == "duckdb")
+    monkeypatch.setattr(polars_backend, "ENABLED", backend == "polars")
+    assert sql_aggregates._backend("tvetsms_data") == backend
+    counts = sql_aggregates.count_by("tvetsms_data", columns, fill=FILL, where=where)
+    keys = zip(*(counts[c].astype(str) for c in columns))
+    return dict(zip(keys, counts["count"].astype(int)))
+
+
+def test_sql_counts_nullable_int_as_text(tvetsms, monkeypatch):
+    # tvetsms.py counts active students with status.astype(str) == "1"
+    assert _counts("sql", monkeypatch, ["status"]) == {("1",): 2, ("0",): 1, ("2",): 1, ("Unknown",): 1}
+
+
+@pytest.mark.parametrize("backend", ["duckdb", "polars"])
+def test_count_by_matches_sql(tvetsms, monkeypatch, backend):
+    pytest.importorskip(backend)
+    for columns in (["status"], ["status", "gender"]):
+        assert _counts(backend, monkeypatch, columns) == _counts("sql", monkeypatch, columns)
+
+
+@pytest.mark.parametrize("backend", ["duckdb", "polars"])
+def test_frame_counts_match_snapshot(tvetsms, monkeypatch, backend):
+    pytest.importorskip(backend)
+    # pd.read_sql gives status as float64, as a page without a schema would hold it
+    frame = db.read_sql("SELECT * FROM tvetsms_data")
+    monkeypatch.setattr(duckdb_backend, "ENABLED", False)
+    monkeypatch.setattr(polars_backend, "ENABLED", False)
+    expected = sql_aggregates.counts("tvetsms_data", frame, ["status", "gender"], fill=FILL)
+    monkeypatch.setattr(duckdb_backend, "ENABLED", backend == "duckdb")
+    monkeypatch.setattr(polars_backend, "ENABLED", backend == "polars")
+    actual = sql_aggregates.counts("tvetsms_data", None, ["status", "gender"], fill=FILL)
+
+    def as_dict(counts):
+        return dict(zip(zip(counts["status"].astype(str), counts["gender"].astype(str)), counts["count"].astype(int)))
+
+    assert as_dict(actual) == as_dict(expected)
+
+
+@pytest.mark.parametrize("backend", ["duckdb", "polars"])
+def test_date_between_skips_zero_dates(tvetsms, monkeypatch, backend):
+    pytest.importorskip(backend)
+    where = sql_aggregates.date_between("created_at", "2023-01-01", "2023-01-31")
+    # The frame path: the page parses the column, and the zero date becomes NaT
+    frame = db.read_sql("SELECT * FROM tvetsms_data")
+    created_at = pd.to_datetime(frame["created_at"], errors="coerce")
+    kept = frame[(created_at >= "2023-01-01") & (created_at < "2023-02-01")]
+    expected = {(str(s),): int(n) for s, n in kept["status"].astype("Int64").value_counts().items()}
+    assert expected == {("1",): 1, ("0",): 1}
+    assert _counts(backend, monkeypatch, ["status"], where) == expected
@@ -0,0 +1,54 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+sqlalchemy = pytest.importorskip("sqlalchemy")
+
+import db
+import snapshots
+from incremental import IncrementalTable
+
+
+def _prepare(df):
+    df["gender"] = df["gender"].astype("category")
+    df["created_at"] = pd.to_datetime(df["created_at"])
+    df["year"] = df["created_at"].dt.year  # derived, not a column of the table
+    df["half"] = pd.cut(df["created_at"].dt.hour, [0, 12, 24], labels=["am", "pm"])  # ordered, like income_range
+    return df
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'tvetm.db'}")
+    with engine.begin() as connection:
+        connection.execute(sqlalchemy.text("CREATE TABLE registrations (id INTEGER PRIMARY KEY, gender TEXT, created_at TEXT)"))
+        connection.execute(sqlalchemy.text(
+            "INSERT INTO registrations VALUES (1, 'male', '2024-01-01 08:00:00'), (2, 'female', '2024-01-02 08:00:00')"))
+    monkeypatch.setattr(db, "_engine", engine)
+    monkeypatch.setattr(snapshots, "SNAPSHOT_DIR", tmp_path / "snapshots")  # no snapshot: read the database
+    yield engine
+    engine.dispose()
+
+
+def test_new_rows_are_prepared_and_merged(engine):
+    table = IncrementalTable("registrations", ["id", "gender", "created_at"], watermark="created_at",
+                             min_interval=0, prepare=_prepare)
+    first = table.load()
+    assert isinstance(first["gender"].dtype, pd.CategoricalDtype)
+
+    with engine.begin() as connection:
+        connection.execute(sqlalchemy.text("INSERT INTO registrations VALUES (3, 'unknown', '2024-01-03 08:00:00')"))
+    frame = table.load()
+
+    assert frame["id"].tolist() == [1, 2, 3]
+    # One categorical holding every label, sorted for the filter index
+    assert list(frame["gender"].cat.categories) == ["female", "male", "unknown"]
+    assert pd.api.types.is_datetime64_any_dtype(frame["created_at"])
+    assert frame["year"].tolist() == [2024, 2024, 2024]
+    assert list(frame["half"].cat.categories) == ["am", "pm"] and frame["half"].cat.ordered
+
+
+def test_reset_drops_the_frame(engine):
+    table = IncrementalTable("registrations", ["id", "gender", "created_at"], watermark="created_at", prepare=_prepare)
+    table.load()
+    table.reset()
+    assert table.frame is None
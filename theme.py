@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import re
+from functools import lru_cache
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+import fonts
+
+# ---- Theme ----
+# Every page used to re-send its own <style> blocks on each rerun, mostly the same
+# rules. They are kept here once and compiled into a single minified stylesheet.
+# Streamlit drops elements a rerun doesn't send again, so instead of st.markdown the
+# stylesheet is written into the page <head> by a small script, once per session;
+# later reruns send nothing. TVETMIS_THEME_INLINE=1 sends it with every rerun instead
+# (e.g. behind a proxy whose CSP blocks the script).
+INLINE = os.environ.get("TVETMIS_THEME_INLINE", "0") in ("1", "true", "True")
+
+# The @font-face rules come from fonts.py
+FONTS = """
+* {
+    font-family: 'Khmer OS Battambang', 'Battambang', sans-serif !important;
+}
+h1, h2, h3, h4, h5, h6, p, span, label, button, input, select, textarea {
+    font-family: 'Khmer OS Battambang', 'Battambang', sans-serif !important;
+}
+body {
+    background-color: #f7f9fc;
+}
+"""
+
+SIDEBAR = """
+[data-testid="stSidebar"] {
+    background-color: #2872f0;
+    color: white;
+    padding: 20px;
+}
+/* Sidebar navigation */
+.sidebar-button {
+    background-color: #3880f0;
+    color: white;
+    border-radius: 8px;
+    border: none;
+    padding: 12px;
+    text-align: center;
+    width: 100%;
+    font-size: 16px;
+    font-weight: bold;
+    transition: background-color 0.3s, color 0.3s, transform 0.2s;
+}
+.sidebar-button:hover {
+    background-color: #2a6cd8;
+    color: white;
+    transform: scale(1.05);
+}
+/* The button of the page that is open */
+.selected-button {
+    background-color: white !important;
+    color: #2163d8 !important;
+    border-radius: 8px;
+    border: 3px solid #2163d8 !important;
+    font-weight: bold !important;
+    font-size: 16px !important;
+    text-align: center;
+    padding: 12px;
+    width: 100%;
+    box-shadow: 0 4px 8px rgba(0, 0, 0, 0.3);
+}
+/* Subpages of TVETMIS and TVET1.5M */
+.subpage-button {
+    width: 100% !important;
+    margin-left: 10px;
+    background-color: #3897d2;
+    color: white;
+    border-radius: 8px;
+    padding: 10px;
+    font-size: 14px;
+    font-weight: normal;
+}
+.subpage-button:hover {
+    background-color: #3b6fd0;
+    color: white;
+}
+.css-1d391kg {
+    background-color: #14213d !important;
+}
+.css-1aumxhk {
+    color: white !important;
+}
+"""
+
+# Blue cards of tvetsms, tvet15m, erpl_candidate and home
+KPI_CARDS = """
+.kpi-card {
+    padding: 20px;
+    border-radius: 10px;
+    background: #2872f0;
+    box-shadow: 0px 2px 5px rgba(0, 0, 0, 0.2);
+    text-align: center;
+    margin-bottom: 15px;
+    color: white;
+}
+.kpi-card.spaced {
+    margin-bottom: 25px;
+}
+.kpi-card h2, .kpi-card h4 {
+    color: white;
+}
+.custom-kpi-card {
+    background-color: #3f85c5;
+    color: white;
+    padding: 15px;
+    border-radius: 10px;
+    text-align: center;
+    box-shadow: 2px 2px 10px rgba(0, 0, 0, 0.2);
+    position: relative;
+    margin: 10px 0 15px 0;
+    top: -10px;
+}
+.custom-kpi-card ul {
+    padding-left: 20px;
+    list-style-position: outside;
+}
+.custom-kpi-card li {
+    text-indent: -18px;
+    padding-left: 20px;
+    line-height: 1.6;
+    font-size: 16px;
+    text-align: left;
+}
+"""
+
+# Centered metrics of staff, teacher, partner, internship15m and graduated
+METRICS = """
+.metric-container {
+    display: flex;
+    flex-direction: column;
+    align-items: center;
+    text-align: center;
+    padding: 0.5em 0;
+}
+.metric-value {
+    font-size: 2em;
+    font-weight: bold;
+    margin-top: 0.1em;
+}
+.metric-label {
+    font-size: 0.9em;
+    color: #555;
+    order: -1;
+    margin-bottom: 0.1em;
+}
+"""
+
+CHARTS = """
+.graph-section {
+    background-color: #ffffff;
+    padding: 20px;
+    border-radius: 10px;
+    box-shadow: 0px 4px 10px rgba(0, 0, 0, 0.1);
+    margin-bottom: 25px;
+    overflow: hidden;
+}
+.plotly-container {
+    width: 100% !important;
+    height: auto !important;
+}
+"""
+
+# Compact date pickers of the teacher page (container key start_work_filter)
+DATE_FILTER = """
+.st-key-start_work_filter div[data-baseweb="input"] > div {
+    height: 29px;
+    font-size: 16px;
+}
+.st-key-start_work_filter .stDateInput {
+    padding: 10px 5px;
+}
+"""
+
+SECTIONS = [FONTS, SIDEBAR, KPI_CARDS, METRICS, CHARTS, DATE_FILTER]
+
+
+def minify(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL)
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r"\s*([{};,>])\s*", r"\1", css).strip()
+
+
+@lru_cache(maxsize=None)
+def stylesheet():
+    """The whole app stylesheet, minified; compiled once per process."""
+    return "".join(minify(section) for section in [fonts.font_face_css()] + SECTIONS)
+
+
+@lru_cache(maxsize=None)
+def version():
+    return hashlib.sha1(stylesheet().encode("utf-8")).hexdigest()[:10]
+
+
+_SCRIPT = """<script>
+const doc = window.parent.document;
+let style = doc.getElementById("tvetmis-theme");
+if (!style) {
+    style = doc.createElement("style");
+    style.id = "tvetmis-theme";
+    doc.head.appendChild(style);
+}
+style.textContent = %s;
+</script>"""
+
+
+def inject():
+    """Apply the stylesheet; called once per rerun from main.py."""
+    if INLINE:
+        st.markdown(f"<style>{stylesheet()}</style>", unsafe_allow_html=True)
+        return
+    # A new version (code reload) replaces the stylesheet of open sessions
+    if st.session_state.get("theme_version") == version():
+        return
+    components.html(_SCRIPT % json.dumps(stylesheet()).replace("</", "<\\/"), height=0)
+    st.session_state.theme_version = version()
+
+
+if __name__ == "__main__":
+    print(f"theme {version()}: {len(stylesheet()):,} bytes")
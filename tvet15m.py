@@ -2,18 +2,18 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from matplotlib.colors import LinearSegmentedColormap
-from sqlalchemy import create_engine
+import derived
+import filters
+import datastore
+import perf
+import metrics
+from incremental import IncrementalTable
+import schemas
+import sql_aggregates
+from widgets import raw_data_table
 from wordcloud import WordCloud
 import matplotlib.pyplot as plt
 
-# ---- Database Connection ----
-DB_USER = "root"
-DB_PASSWORD = ""
-DB_HOST = "localhost"
-DB_NAME = "tvetm"
-
-engine = create_engine(f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}")
-
 #Khmer Ditionary custome
 province_coordinates = {
     "Phnom Penh": {"khmer": "ភ្នំពេញ"},
@@ -43,100 +43,100 @@ province_coordinates = {
     "Kep": {"khmer": "កែប"},
 }
 
+# ---- Column Manifest ----
+TABLE = "tvet15m"
+COLUMNS = [
+    "id", "gender", "apply_major_name", "school_name",
+    "rtimeline_created_at", "date_of_birth", "address_city_province_name", "has_job",
+    "scholarship_status", "average_attendance", "shift_name", "income",
+    "position",
+]
+
+# ---- Filter Index ----
+FILTER_COLUMNS = ["school_name", "apply_major_name", "gender", "address_city_province_name", "has_job"]
+FILTER_TEXT_COLUMNS = ["has_job"]  # the multiselect lists these as text
+
+def prepare(df):
+    """Schema and derived columns, for the first load and for each batch of new rows."""
+    df = df.fillna({"gender": "Unknown", "apply_major_name": "Unknown"})
+    return derived.apply_derived(schemas.apply_schema(df, TABLE), "tvet15m")
+
+@st.cache_resource
+def registration_table():
+    """Registrations are append-mostly, so reruns only fetch rows newer than rtimeline_created_at."""
+    # The datastore scheduler decides when to check for new rows
+    return IncrementalTable(TABLE, COLUMNS, key="id", watermark="rtimeline_created_at", min_interval=0, prepare=prepare)
+
+@perf.timed("tvet15m.fetch")
+def fetch_data():
+    # The table holds the prepared frame, so the dataset and the table share it
+    df = registration_table().load()
+    filters.index_for("tvet15m", df, FILTER_COLUMNS, FILTER_TEXT_COLUMNS)  # ready before the first rerun
+    return df
+
+# ---- Derived Columns ----
+derived.register("tvet15m", "date_of_birth", derived.parse_date("date_of_birth"))
+derived.register("tvet15m", "rtimeline_created_at", derived.parse_date("rtimeline_created_at"))
+derived.register("tvet15m", "age", derived.age_by_year())
+derived.register("tvet15m", "income", derived.numeric("income"))
+derived.register("tvet15m", "income_range", derived.band("income", derived.INCOME_BANDS, derived.INCOME_BAND_LABELS))
+
+def forget_data():
+    """Evicting the dataset also drops the table's frame (the same one) and its filter
+    index, and the next load is a full one."""
+    registration_table().reset()
+    filters.drop("tvet15m")
+
+datastore.register("tvet15m", fetch_data, ttl=300, max_bytes=1024 * 1024 ** 2,
+                   on_invalidate=forget_data, extra_bytes=lambda: filters.index_bytes("tvet15m"))
+
+# ---- Chart Aggregates ----
+# Same labels as fetch_data fills in, and has_job as text like the filter index
+FILL = {"gender": "Unknown", "apply_major_name": "Unknown", "has_job": "Unknown"}
+
+def chart_counts(filtered_df, columns):
+    """Counts for a chart, from filtered_df on every backend: the frame includes the rows
+    the IncrementalTable caught up since the last snapshot, so the charts match the KPIs."""
+    return sql_aggregates.frame_counts(TABLE, filtered_df, columns, FILL)
+
+def chart_counts_by_year(filtered_df, date_column, columns):
+    return sql_aggregates.frame_counts_by_year(TABLE, filtered_df, date_column, columns, FILL)
+
 def load_data():
     """Fetch data from MySQL and ensure all data is displayed correctly."""
-    query = "SELECT * FROM tvet15m"  # Replace with your actual table name
     try:
-        df = pd.read_sql(query, engine)
+        df = datastore.get("tvet15m")
     except Exception as e:
         st.error(f"Error loading data: {e}")
         return pd.DataFrame()  # Return empty DataFrame to avoid further errors
 
-    df.fillna({"gender": "Unknown", "apply_major_name": "Unknown"}, inplace=True)
     return df
     
-def set_css():
-    st.markdown("""
-        <style>
-            @font-face {
-                font-family: 'Khmer OS Battambang';
-                src: url('path/to/KhmerOSBattambang-Regular.ttf') format('truetype'); /* Replace with the actual path */
-                font-weight: normal;
-                font-style: normal;
-            }
-            * {
-                font-family: 'Khmer OS Battambang', sans-serif !important;
-            }
-            body {
-                background-color: #f7f9fc;
-            }
-            /* Sidebar */
-            .css-1d391kg {
-                background-color: #14213d !important;
-            }
-            .css-1aumxhk {
-                color: white !important;
-            }
-            /* KPI Cards */
-            .kpi-card {
-                padding: 20px;
-                border-radius: 10px;
-                background: #2872f0;
-                box-shadow: 0px 2px 5px rgba(0, 0, 0, 0.2);
-                text-align: center;
-                margin-bottom: 15px;
-                color: white;
-            }
-            .kpi-card h2, .kpi-card h4 {
-                color: white;
-                font-family: 'Khmer OS Battambang', sans-serif;
-            }
-            /* Graph Sections */
-            .graph-section {
-                background-color: #ffffff;
-                padding: 20px;
-                border-radius: 10px;
-                box-shadow: 0px 4px 10px rgba(0, 0, 0, 0.1);
-                margin-bottom: 25px;
-                overflow: hidden;
-            }
-            .plotly-container {
-                width: 100% !important;
-                height: auto !important;
-            }
-            h1, h2, h3, h4, h5, h6, p, span, label, button, input, select, textarea {
-                font-family: 'Khmer OS Battambang', sans-serif !important;
-            }
-        </style>
-    """, unsafe_allow_html=True)
-
+@metrics.timed_page("tvet15m")
 def main():
-    set_css()
 
     df = load_data()
+    perf.checkpoint("tvet15m.load", rows_out=len(df))
     if df.empty:
         return
 
-    if "date_of_birth" in df.columns:
-        df["age"] = pd.to_datetime("today").year - pd.to_datetime(df["date_of_birth"], errors="coerce").dt.year
-        df.fillna({"age": 0}, inplace=True)
-
     # Create columns for the filters to appear horizontally
     col1, col2, col3, col4, co5 = st.columns([1.4, 1, 0.5, 0.8, 0.5])
 
-    # Initialize filtered dataframe
-    filtered_df = df.copy()  # Start with the original data
+    # ---- Filters ----
+    # Every filter is answered from the filter index; the frame is sliced once at the end
+    index = filters.index_for("tvet15m", df, FILTER_COLUMNS, FILTER_TEXT_COLUMNS)
+    selections = {}
+    date_mask = None
 
     # ---- Date Range Filter with Validation ----
     with st.container(border=True):
         st.subheader("រយៈពេលនៃការចុះឈ្មោះរបស់សិក្ខាកាម")
 
-        # Ensure date column exists and convert to datetime
-        if "rtimeline_created_at" in filtered_df.columns:
-            filtered_df["rtimeline_created_at"] = pd.to_datetime(filtered_df["rtimeline_created_at"], errors="coerce")
-
-            min_date = filtered_df["rtimeline_created_at"].min().date()
-            max_date = filtered_df["rtimeline_created_at"].max().date()
+        # Ensure date column exists (parsed at load time)
+        if "rtimeline_created_at" in df.columns:
+            min_date = df["rtimeline_created_at"].min().date()
+            max_date = df["rtimeline_created_at"].max().date()
 
             # Date input for selecting date range
             date_range = st.date_input(
@@ -153,37 +153,37 @@ def main():
                 if start_date > end_date:
                     st.error("⚠️ កាលបរិច្ឆេទចាប់ផ្ដើមត្រូវតែតិចជាងកាលបរិច្ឆេទបញ្ចប់។ សូមជ្រើសរើសម្តងទៀត។")
                 else:
-                    filtered_df = filtered_df[
-                        (filtered_df["rtimeline_created_at"].dt.date >= start_date) &
-                        (filtered_df["rtimeline_created_at"].dt.date <= end_date)
-                    ]
-
-                    if filtered_df.empty:
+                    # Compare datetimes directly rather than building a date object per row
+                    created_at = df["rtimeline_created_at"]
+                    date_mask = (
+                        (created_at >= pd.Timestamp(start_date)) &
+                        (created_at < pd.Timestamp(end_date) + pd.Timedelta(days=1))
+                    ).to_numpy()
+
+                    if not date_mask.any():
                         st.warning("⚠️ គ្មានទិន្នន័យក្នុងចន្លោះកាលបរិច្ឆេទដែលបានជ្រើស។ សូមជ្រើសរើសកាលបរិច្ឆេទផ្សេងទៀត។")
 
     # ---- Filter by Sector ----
     with col1:
-        sector_options = sorted(df["school_name"].unique())  # Unique sector options
+        sector_options = index.options("school_name")  # Unique sector options
         selected_sectors = st.multiselect("គ្រឹះស្ថាន អ.ប.វ.", sector_options)
+        selections["school_name"] = selected_sectors
 
         if selected_sectors:
-            filtered_df = filtered_df[filtered_df["school_name"].isin(selected_sectors)]
-
             # Filter by Major based on selected sectors
-            major_options = sorted(filtered_df[filtered_df["school_name"].isin(selected_sectors)]["apply_major_name"].unique())
-        else: 
-            major_options = sorted(df["apply_major_name"].unique())  # Show all majors if no sector is selected
+            major_options = index.options("apply_major_name", index.select(selections, date_mask))
+        else:
+            major_options = index.options("apply_major_name")  # Show all majors if no sector is selected
 
     # ---- Filter by Major ----
     with col2:
         selected_majors = st.multiselect("ជំនាញ", major_options)
-        if selected_majors:
-            filtered_df = filtered_df[filtered_df["apply_major_name"].isin(selected_majors)]
+        selections["apply_major_name"] = selected_majors
 
     # ---- Gender Filter ----
     with col3:
         gender_mapping = {"female": "ស្រី", "male": "ប្រុស"}  # Mapping English to Khmer
-        gender_options = sorted(df["gender"].unique())
+        gender_options = index.options("gender")
 
         # Convert gender options to Khmer for display
         display_gender_options = [gender_mapping.get(g, g) for g in gender_options]
@@ -192,41 +192,28 @@ def main():
         selected_display_genders = st.multiselect("ភេទ", display_gender_options)
 
         # Convert selected Khmer options back to English for filtering
-        selected_genders = [key for key, value in gender_mapping.items() if value in selected_display_genders]
-
-        if selected_genders:
-            filtered_df = filtered_df[filtered_df["gender"].isin(selected_genders)]
+        selections["gender"] = [key for key, value in gender_mapping.items() if value in selected_display_genders]
 
     # ---- Filter by Province ----
     with col4:
-        # Get Khmer names for provinces
-        #khmer_provinces = [province_coordinates[province]["khmer"] for province in province_coordinates]
-        province_options = sorted(df["address_city_province_name"].unique())  # Unique sector options
-        selected_provinces = st.multiselect("ខេត្ត/ក្រុង", province_options)
-
-        if selected_provinces:
-            filtered_df = filtered_df[filtered_df["address_city_province_name"].isin(selected_provinces)]
-            major_options = sorted(filtered_df[filtered_df["address_city_province_name"].isin(selected_provinces)]["school_name"].unique())
-        else:
-            major_options = sorted(df["school_name"].unique())  # Show all majors if no sector is selected
+        province_options = index.options("address_city_province_name")
+        selections["address_city_province_name"] = st.multiselect("ខេត្ត/ក្រុង", province_options)
 
     # ---- Work Status Filter ----
     with co5:
-        # Get unique has_job options
-        has_job_options = sorted(df["has_job"].astype(str).unique())  # Ensure values are strings for UI
-        selected_job_statuses = st.multiselect("ស្ថានភាពការងារ", has_job_options)
+        has_job_options = index.options("has_job")  # Indexed as strings for the UI
+        selections["has_job"] = st.multiselect("ស្ថានភាពការងារ", has_job_options)
 
-        if selected_job_statuses:
-            filtered_df = filtered_df[filtered_df["has_job"].astype(str).isin(selected_job_statuses)]
-            major_options = sorted(filtered_df[filtered_df["has_job"].astype(str).isin(selected_job_statuses)]["school_name"].unique())
-        else:
-            major_options = sorted(df["school_name"].unique())  # Show all majors if no job status is selected
+    filtered_df = df[index.select(selections, date_mask)]
 
     # If no data matches the filters
     if filtered_df.empty:
         st.warning("No data matches your filter criteria.")
         return  # Stop further processing if no data is available after filtering.
 
+    filtered_df = schemas.drop_unused_categories(filtered_df)
+    perf.checkpoint("tvet15m.filter", rows_in=len(df), rows_out=len(filtered_df))
+
     # ---- KPI Metrics ----
     total_students = len(filtered_df)  # Use filtered_df for all calculations
     avg_age = int(filtered_df["age"].mean()) if "age" in filtered_df.columns and not filtered_df.empty else 0
@@ -265,7 +252,12 @@ def main():
             st.markdown(f'<h4 style="font-family: \'Khmer OS Battambang\', sans-serif;">ការបែងចែកសិស្សតាមភេទ</h4>', unsafe_allow_html=True) 
             
             if "gender" in filtered_df.columns:
-                gender_count = filtered_df["gender"].value_counts()
+                gender_count = (
+                    chart_counts(filtered_df, ["gender"])
+                    .dropna(subset=["gender"])
+                    .set_index("gender")["count"]
+                    .sort_values(ascending=False)
+                )
 
                 # Map gender labels using the dictionary
                 gender_labels = [gender_mapping.get(g, g) for g in gender_count.index]
@@ -287,7 +279,10 @@ def main():
             if "age" in filtered_df.columns and "gender" in filtered_df.columns:
                 gender_labels = {"male": "ប្រុស", "female": "ស្រី"}  # Gender dictionary
                 
-                age_distribution = filtered_df.groupby(["age", "gender"]).size().reset_index(name="count")
+                # Counted by birth year, then turned into ages like derived.age_by_year
+                age_distribution = chart_counts_by_year(filtered_df, "date_of_birth", ["gender"])
+                age_distribution["age"] = (pd.Timestamp.today().year - age_distribution["birth_year"]).fillna(0)
+                age_distribution = age_distribution.groupby(["age", "gender"], observed=True)["count"].sum().reset_index()
                 age_distribution["gender"] = age_distribution["gender"].map(gender_labels)  # Apply Khmer labels
                 
                 fig2 = px.line(
@@ -304,7 +299,11 @@ def main():
     if "address_city_province_name" in filtered_df.columns:
         with st.container(border=True):
             # Count students per province
-            province_counts = filtered_df["address_city_province_name"].value_counts().reset_index()
+            province_counts = (
+                chart_counts(filtered_df, ["address_city_province_name"])
+                .dropna(subset=["address_city_province_name"])
+                .sort_values(by="count", ascending=False)
+            )
             province_counts.columns = ["Province", "ចំនួនសិក្ខាកាម"]
 
             # Format numbers with commas for text labels
@@ -374,9 +373,9 @@ def main():
                 
                 # Group data by average_attendance only (without gender)
                 attendance_distribution = (
-                    filtered_df.groupby("average_attendance")
-                    .size()
-                    .reset_index(name="count")
+                    chart_counts(filtered_df, ["average_attendance"])
+                    .dropna(subset=["average_attendance"])
+                    .sort_values(by="average_attendance")
                 )
                 
                 if not attendance_distribution.empty:
@@ -419,7 +418,7 @@ def main():
                 filtered_df = filtered_df[filtered_df['shift_name'] == st.session_state.shift_filter]
 
             # Group by shift_name and gender
-            student_counts = filtered_df.groupby(["shift_name", "gender"]).size().reset_index(name="count")
+            student_counts = chart_counts(filtered_df, ["shift_name", "gender"]).dropna(subset=["shift_name", "gender"])
 
             # Create the bar chart
             fig = px.bar(
@@ -477,10 +476,10 @@ def main():
                 filtered_df = filtered_df[filtered_df['has_job'] == st.session_state.job_filter]
 
             # Ensure 'has_job' is categorical for correct visualization
-            filtered_df["has_job"] = filtered_df["has_job"].astype(str) 
+            filtered_df["has_job"] = schemas.as_text(filtered_df["has_job"])
 
-            # Group by has_job and gender
-            student_counts = filtered_df.groupby(["has_job", "gender"]).size().reset_index(name="count")
+            # Group by has_job and gender (has_job is in FILL, so text on every backend)
+            student_counts = chart_counts(filtered_df, ["has_job", "gender"]).dropna(subset=["gender"])
 
             # Create the bar chart
             fig = px.bar(
@@ -532,19 +531,15 @@ def main():
             if 'income_filter' in st.session_state:
                 filtered_df = filtered_df[filtered_df['income'] == st.session_state.income_filter]
 
-            # Ensure 'income' is numeric and clean
-            filtered_df["income"] = pd.to_numeric(filtered_df["income"], errors="coerce")
+            # income and income_range are derived at load (derived.INCOME_BANDS)
             filtered_df = filtered_df.dropna(subset=["income"])
 
-            # Define income bins
-            bins = list(range(50, 1551, 50))  # 50 to 1500, step 50
-            labels = [f"{i}-{i+49}" for i in bins[:-1]]
-
-            # Bin income data
-            filtered_df["income_range"] = pd.cut(filtered_df["income"], bins=bins, labels=labels, right=False)
-
-            # Count students in each income range
-            income_counts = filtered_df["income_range"].value_counts().sort_index().reset_index()
+            # Count students per income, then per income range (the same derived columns,
+            # applied to the counts), empty ranges included
+            income_counts = chart_counts(filtered_df, ["income"])
+            income_counts["income"] = derived.numeric("income")(income_counts)
+            income_counts["income_range"] = derived.band("income", derived.INCOME_BANDS, derived.INCOME_BAND_LABELS)(income_counts)
+            income_counts = income_counts.groupby("income_range", observed=False)["count"].sum().reindex(derived.INCOME_BAND_LABELS, fill_value=0).reset_index()
             income_counts.columns = ["Income Range", "Student Count"]
 
             # Plot line chart
@@ -608,13 +603,17 @@ def main():
                 6: "ចេញមុនពេលរៀនខ្វះឯកសារ"
             }
 
-            # Clean and map
-            cleaned_df = filtered_df[filtered_df["scholarship_status"].notna()]
-            cleaned_df = cleaned_df[cleaned_df["scholarship_status"].astype(str).isin([str(k) for k in status_dict])]
-            cleaned_df["scholarship_status_kh"] = cleaned_df["scholarship_status"].astype(int).map(status_dict)
+            # Count, then map the known codes (snapshot counts may hold them as floats)
+            schola_counts = chart_counts(filtered_df, ["scholarship_status"])
+            schola_counts["scholarship_status_kh"] = schola_counts["scholarship_status"].map(status_dict)
 
             # Count values
-            schola_counts = cleaned_df["scholarship_status_kh"].value_counts().reset_index()
+            schola_counts = (
+                schola_counts.dropna(subset=["scholarship_status_kh"])
+                .groupby("scholarship_status_kh")["count"].sum()
+                .sort_values(ascending=False)
+                .reset_index()
+            )
             schola_counts.columns = ["ស្ថានភាពរបស់សិក្ខាកាម", "ចំនួនសិក្ខាកាម"]
 
             if schola_counts.empty:
@@ -660,7 +659,12 @@ def main():
                 if "position" in filtered_df.columns:
                     with st.container(border=True):
                         # Count students per province
-                        position_counts = filtered_df["position"].value_counts().reset_index().head(15)
+                        position_counts = (
+                            chart_counts(filtered_df, ["position"])
+                            .dropna(subset=["position"])
+                            .sort_values(by="count", ascending=False)
+                            .head(15)
+                        )
                         position_counts.columns = ["position", "Student Count"]
 
                         # Format numbers with commas for text labels
@@ -698,15 +702,15 @@ def main():
                         )
 
                         # 🔹 Special Handling for a single bar
-                        if len(province_counts) == 1:
+                        if len(position_counts) == 1:
                             fig_bar.update_layout(
                                 xaxis=dict(
                                     range=[-1, 1],
                                     tickvals=[0],
-                                    ticktext=province_counts["position"].values
+                                    ticktext=position_counts["position"].values
                                 ),
                                 yaxis=dict(
-                                    range=[0, max(province_counts["Student Count"].values) * 1.2]
+                                    range=[0, max(position_counts["Student Count"].values) * 1.2]
                                 ),
                                 bargap=0.8,
                                 width=200,
@@ -721,12 +725,14 @@ def main():
 
     # ---- Raw Data Preview ----
     st.subheader("ទិន្នន័យជាទម្រង់តារាង")
-    st.dataframe(filtered_df, height=450, use_container_width=True)
+    perf.checkpoint("tvet15m.charts")
+    raw_data_table(filtered_df, TABLE, COLUMNS, height=450)
+    perf.checkpoint("tvet15m.raw_data")
 
     # ---- Refresh Data Button ----
     if st.button("🔄Refresh Data"):
-        st.cache_data.clear()  # Clear the data cache to force reload
-        st.rerun()  # Use st.rerun() to trigger rerun
+        datastore.request_refresh("tvet15m")  # Fetches new rows in the background; the current data stays on screen
+        st.toast("កំពុងធ្វើបច្ចុប្បន្នភាពទិន្នន័យ...")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,15 +2,14 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from sqlalchemy import create_engine
-
-# ---- Database Connection ----
-DB_USER = "root"
-DB_PASSWORD = ""
-DB_HOST = "localhost"
-DB_NAME = "tvetm"
-
-engine = create_engine(f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}")
+from db import table_columns
+import cube
+import datastore
+import perf
+import metrics
+from hierarchy import HierarchyIndex
+from sql_aggregates import count_by_year, select_rows
+from widgets import raw_data_table
 
 # Dictionary of marital statuses
 marital_statuses = {
@@ -48,89 +47,93 @@ province_coordinates = {
     "Tboung Khmum": {"khmer": "ត្បូងឃ្មុំ", "coordinates": (11.9000, 105.6667)},
 }
 
-def load_data():
-    """Fetch data from MySQL and ensure all data is displayed correctly."""
-    query = "SELECT * FROM tvetsms_data"  # Replace with your actual table name
-    try:
-        df = pd.read_sql(query, engine)
-    except Exception as e:
-        st.error(f"Error loading data: {e}")
-        return pd.DataFrame()  # Return empty DataFrame to avoid further errors
-
-    df.fillna({"gender": "Unknown", "apply_major_name": "Unknown", "sector_name": "Unknown", "status": "Unknown"}, inplace=True)
-    return df
+# ---- Column Manifest ----
+# The charts are computed in MySQL (GROUP BY); only the raw data preview fetches rows.
+TABLE = "tvetsms_data"
+COLUMNS = [
+    "id", "gender", "date_of_birth", "address_city_provinces",
+    "school_name", "sector_name", "apply_major_name", "status",
+    "marital_status",
+]
+
+# NULL values are shown (and filtered) as "Unknown"
+FILL = {"gender": "Unknown", "apply_major_name": "Unknown", "sector_name": "Unknown", "status": "Unknown"}
+RAW_DATA_LIMIT = 1000
+
+# ---- Count Cube ----
+# Every KPI, chart and cascading option list of the page is a roll-up over these columns
+DIMENSIONS = (
+    "address_city_provinces", "school_name", "sector_name", "apply_major_name",
+    "gender", "status", "marital_status",
+)
+
+# Province -> institution -> sector -> major, for the cascading multiselects
+HIERARCHY = ("address_city_provinces", "school_name", "sector_name", "apply_major_name")
+
+@perf.timed("tvetsms.cube")
+def build_model():
+    """Counts over every dimension the table has, from one GROUP BY, and the filter
+    hierarchy read from them; one dataset, so the option lists always match the counts."""
+    available = load_table_columns()
+    counts = cube.build(TABLE, [d for d in DIMENSIONS if d in available], FILL)
+    return counts, HierarchyIndex(counts.frame, HIERARCHY)
+
+# Rebuilt by the datastore scheduler every 5 minutes or on Refresh, in the background
+datastore.register("tvetsms_data", build_model, ttl=300, max_bytes=64 * 1024 ** 2)
+
+def load_model():
+    """((cube, hierarchy), version) of the same load."""
+    return datastore.get_versioned("tvetsms_data")
+
+# ---- Aggregate Queries ----
+# filters is the {column: [values]} state of the multiselects, compiled to a WHERE clause.
+# Every filter combination is its own entry, so each query keeps a bounded number of them.
+# Ages and the raw preview aren't in the cube: birth year would multiply its size.
+# version is the model's, so these entries go stale when the model is rebuilt.
+@metrics.cache_lookups("tvetsms.age_counts")
+@st.cache_data(max_entries=32)
+@perf.timed("tvetsms.age_counts")
+def load_age_counts(version, filters):
+    counts = count_by_year(TABLE, "date_of_birth", ["gender"], filters, FILL)
+    counts["age"] = pd.to_datetime("today").year - counts["birth_year"]
+    counts.fillna({"age": 0}, inplace=True)
+    return counts
+
+@metrics.cache_lookups("tvetsms.preview")
+@st.cache_data(max_entries=16)
+@perf.timed("tvetsms.preview")
+def load_preview(version, filters):
+    return select_rows(TABLE, COLUMNS, filters, FILL, RAW_DATA_LIMIT)
+
+@st.cache_data(ttl=3600)
+def load_table_columns():
+    return table_columns(TABLE)
+
+def load_overview():
+    """Run the unfiltered queries of the first page view so they are cached."""
+    load_table_columns()
+    _, version = load_model()
+    load_age_counts(version, {})
+    load_preview(version, {})
  
-def set_css():
-    st.markdown("""
-        <style>
-            @font-face {
-                font-family: 'Khmer OS Battambang';
-                src: url('path/to/KhmerOSBattambang-Regular.ttf') format('truetype'); /* Replace with the actual path */
-                font-weight: normal;
-                font-style: normal;
-            }
-            * {
-                font-family: 'Khmer OS Battambang', sans-serif !important;
-            }
-            body {
-                background-color: #f7f9fc;
-            }
-            /* Sidebar */
-            .css-1d391kg {
-                background-color: #14213d !important;
-            }
-            .css-1aumxhk {
-                color: white !important;
-            }
-            /* KPI Cards */
-            .kpi-card {
-                padding: 20px;
-                border-radius: 10px;
-                background: #2872f0;
-                box-shadow: 0px 2px 5px rgba(0, 0, 0, 0.2);
-                text-align: center;
-                margin-bottom: 15px;
-                color: white;
-            }
-            .kpi-card h2, .kpi-card h4 {
-                color: white;
-                font-family: 'Khmer OS Battambang', sans-serif;
-            }
-            /* Graph Sections */
-            .graph-section {
-                background-color: #ffffff;
-                padding: 20px;
-                border-radius: 10px;
-                box-shadow: 0px 4px 10px rgba(0, 0, 0, 0.1);
-                margin-bottom: 25px;
-                overflow: hidden;
-            }
-            .plotly-container {
-                width: 100% !important;
-                height: auto !important;
-            }
-            h1, h2, h3, h4, h5, h6, p, span, label, button, input, select, textarea {
-                font-family: 'Khmer OS Battambang', sans-serif !important;
-            }
-        </style>
-    """, unsafe_allow_html=True)
-
+@metrics.timed_page("tvetsms")
 def main():
-    set_css()
 
-    df = load_data()
-    if df.empty:
+    try:
+        available_columns = load_table_columns()
+        # Cube, hierarchy and version of one load, even if a rebuild lands mid-run
+        (counts_cube, hierarchy), version = load_model()
+        gender_options = sorted(counts_cube.count_by(("gender",), {})["gender"].dropna())
+    except Exception as e:
+        st.error(f"Error loading data: {e}")
         return
-
-    if "date_of_birth" in df.columns:
-        df["age"] = pd.to_datetime("today").year - pd.to_datetime(df["date_of_birth"], errors="coerce").dt.year
-        df.fillna({"age": 0}, inplace=True)
+    perf.checkpoint("tvetsms.load")
 
     # Create columns for the filters to appear horizontally
     col1, col2, col3, col4, col5 = st.columns([1,1,1,1,0.6])
 
-    # Create a copy of the dataframe to prevent modifications to the original data
-    filtered_df = df.copy()
+    # Selected values per column, pushed down to SQL
+    filters = {}
 
     # ---- 1️⃣ Filter by Province ----
     with col1:
@@ -144,13 +147,10 @@ def main():
                 province for province, data in province_coordinates.items() if data["khmer"] in selected_provinces
             ]
             # Filter data based on selected provinces (address_city_provinces column)
-            filtered_df = filtered_df[filtered_df["address_city_provinces"].isin(selected_english_provinces)]
+            filters["address_city_provinces"] = selected_english_provinces
 
         # Dynamically update institution options based on filtered province selection
-        if selected_provinces:
-            institution_options = sorted(filtered_df["school_name"].unique()) if not filtered_df.empty else []
-        else:
-            institution_options = sorted(df["school_name"].unique()) if not df.empty else [] # reset the institution list.
+        institution_options = hierarchy.options("school_name", filters)
 
     # ---- 2️⃣ Filter by Institution ----
     with col2:
@@ -158,31 +158,30 @@ def main():
 
         if selected_institutions:
             # Filter data based on selected institutions (school_name column)
-            filtered_df = filtered_df[filtered_df["school_name"].isin(selected_institutions)]
+            filters["school_name"] = selected_institutions
 
         # Update sector options based on selected institution
-        sector_options = sorted(filtered_df["sector_name"].unique()) if not filtered_df.empty else []
+        sector_options = hierarchy.options("sector_name", filters)
 
     # ---- 3️⃣ Filter by Sector ----
     with col3:
         selected_sectors = st.multiselect("វិស័យ", sector_options)
 
         if selected_sectors:
-            filtered_df = filtered_df[filtered_df["sector_name"].isin(selected_sectors)]
+            filters["sector_name"] = selected_sectors
 
         # Update major options based on selected sector
-        major_options = sorted(filtered_df["apply_major_name"].unique()) if not filtered_df.empty else []
+        major_options = hierarchy.options("apply_major_name", filters)
 
     # ---- 4️⃣ Filter by Major ----
     with col4:
         selected_majors = st.multiselect("ជំនាញ", major_options)
         if selected_majors:
-            filtered_df = filtered_df[filtered_df["apply_major_name"].isin(selected_majors)]
+            filters["apply_major_name"] = selected_majors
 
     # ---- 5️⃣ Gender Filter ----
     with col5:
         gender_mapping = {"female": "ស្រី", "male": "ប្រុស"}  # Mapping English to Khmer
-        gender_options = sorted(df["gender"].unique())
 
         # Convert gender options to Khmer for display
         display_gender_options = [gender_mapping.get(g, g) for g in gender_options]
@@ -194,18 +193,26 @@ def main():
         selected_genders = [key for key, value in gender_mapping.items() if value in selected_display_genders]
 
         if selected_genders:
-            filtered_df = filtered_df[filtered_df["gender"].isin(selected_genders)]
+            filters["gender"] = selected_genders
+
+    gender_counts = counts_cube.count_by(("gender",), filters)
+    age_counts = load_age_counts(version, filters) if "date_of_birth" in available_columns else None
+    perf.checkpoint("tvetsms.filter", rows_out=int(gender_counts["count"].sum()))
 
     # If no data matches the filters
-    if filtered_df.empty:
+    if gender_counts["count"].sum() == 0:
         st.warning("No data matches your filter criteria.")
         st.stop()  # Stop further processing if no data is available after filtering.
 
     # ---- KPI Metrics ----
-    total_students = len(filtered_df)  # Use filtered_df for all calculations
-    avg_age = int(filtered_df["age"].mean()) if "age" in filtered_df.columns and not filtered_df.empty else 0
-    total_female = filtered_df[filtered_df["gender"].str.lower() == "female"].shape[0] if "gender" in filtered_df.columns else 0
-    students_status_1 = filtered_df[filtered_df["status"] == 1].shape[0] if "status" in filtered_df.columns else 0
+    total_students = int(gender_counts["count"].sum())
+    avg_age = int((age_counts["age"] * age_counts["count"]).sum() / total_students) if age_counts is not None else 0
+    total_female = int(gender_counts.loc[gender_counts["gender"].str.lower() == "female", "count"].sum())
+    if "status" in available_columns:
+        status_counts = counts_cube.count_by(("status",), filters)
+        students_status_1 = int(status_counts.loc[status_counts["status"].astype(str) == "1", "count"].sum())
+    else:
+        students_status_1 = 0
 
     kpi1, kpi2, kpi3, kpi4 = st.columns(4)
 
@@ -228,11 +235,10 @@ def main():
         with st.container(border=True):  # Add border here
             st.markdown(f'<h4 style="font-family: \'Khmer OS Battambang\', sans-serif;">ការបែងចែកសិស្សតាមភេទ</h4>', unsafe_allow_html=True) 
             
-            if "gender" in filtered_df.columns:
+            if "gender" in available_columns:
                 gender_labels = {"male": "ប្រុស", "female": "ស្រី"}  # Gender dictionary
                 
-                gender_count = filtered_df["gender"].value_counts().reset_index()
-                gender_count.columns = ["gender", "count"]
+                gender_count = gender_counts.sort_values(by="count", ascending=False).reset_index(drop=True)
                 gender_count["gender"] = gender_count["gender"].map(gender_labels)  # Apply Khmer labels
                 
                 fig1 = px.pie(
@@ -247,10 +253,10 @@ def main():
         with st.container(border=True):  # Add border here
             st.markdown(f'<h4 style="font-family: \'Khmer OS Battambang\', sans-serif;">ស្ថិតិសិស្សតាមអាយុ</h4>', unsafe_allow_html=True) 
             
-            if "age" in filtered_df.columns and "gender" in filtered_df.columns:
+            if age_counts is not None:
                 gender_labels = {"male": "ប្រុស", "female": "ស្រី"}  # Gender dictionary
                 
-                age_distribution = filtered_df.groupby(["age", "gender"]).size().reset_index(name="count")
+                age_distribution = age_counts.groupby(["age", "gender"])["count"].sum().reset_index()
                 age_distribution["gender"] = age_distribution["gender"].map(gender_labels)  # Apply Khmer labels
                 
                 fig2 = px.line(
@@ -270,8 +276,9 @@ def main():
         with st.container(border=True):
             st.markdown(f'<h4 style="font-family: \'Khmer OS Battambang\', sans-serif;">ស្ថានភាពអាពាហ៍ពិពាហ៍របស់សិស្ស</h4>', unsafe_allow_html=True)
             
-            if "marital_status" in filtered_df.columns:
-                if filtered_df["marital_status"].isnull().all():
+            if "marital_status" in available_columns:
+                marital_df = counts_cube.count_by(("marital_status",), filters)
+                if marital_df["marital_status"].isnull().all():
                     st.warning("The 'marital_status' column exists, but all values are null. Please populate the column with marital status data.")
                     
                     # Create a placeholder bar chart if data is unavailable
@@ -284,8 +291,12 @@ def main():
                     st.plotly_chart(fig_placeholder, use_container_width=True)
                 else:
                     # Map the marital status to labels
-                    filtered_df["marital_status_label"] = filtered_df["marital_status"].map(marital_statuses)
-                    marital_counts = filtered_df["marital_status_label"].value_counts().reset_index()
+                    marital_df["marital_status_label"] = marital_df["marital_status"].map(marital_statuses)
+                    marital_counts = (
+                        marital_df.groupby("marital_status_label")["count"].sum()
+                        .sort_values(ascending=False)
+                        .reset_index()
+                    )
                     marital_counts.columns = ["Marital Status", "Count"]
 
                     # Create the pie chart
@@ -322,9 +333,9 @@ def main():
                 unsafe_allow_html=True
             )
 
-            if "sector_name" in filtered_df.columns:
+            if "sector_name" in available_columns:
                 # 🔹 Count students per sector
-                sector_count = filtered_df["sector_name"].value_counts().reset_index()
+                sector_count = counts_cube.count_by(("sector_name",), filters).sort_values(by="count", ascending=False)
                 sector_count.columns = ["Sector", "Count"]
 
                 # 🔹 Format Count for display (1,000 format)
@@ -377,12 +388,14 @@ def main():
     # Student by province graph
     with st.container(border=True):
         st.markdown(f'<h4 style="font-family: \'Khmer OS Battambang\', sans-serif;">ស្ថិតិសិស្សតាមខេត្ត/ក្រុង</h4>', unsafe_allow_html=True)
-        if "address_city_provinces" in filtered_df.columns:
+        if "address_city_provinces" in available_columns:
+            province_df = counts_cube.count_by(("address_city_provinces",), filters)
+
             # 🔹 Map the province names to Khmer names
-            filtered_df["province_khmer"] = filtered_df["address_city_provinces"].map(lambda x: province_coordinates.get(x, {}).get("khmer", x))
+            province_df["province_khmer"] = province_df["address_city_provinces"].map(lambda x: province_coordinates.get(x, {}).get("khmer", x))
 
             # 🔹 Count students per province
-            province_counts = filtered_df["province_khmer"].value_counts().reset_index()
+            province_counts = province_df.groupby("province_khmer")["count"].sum().sort_values(ascending=False).reset_index()
             province_counts.columns = ["Province", "Student Count"]
 
             # 🔹 Format numbers with commas
@@ -435,9 +448,9 @@ def main():
     with st.container(border=True):
         st.markdown(f'<h4 style="font-family: \'Khmer OS Battambang\', sans-serif;">ស្ថិតិសិស្សតាមគ្រឹះស្ថាន អ.ប.វ.</h4>', unsafe_allow_html=True)
 
-        if "school_name" in filtered_df.columns:
+        if "school_name" in available_columns:
             # 🔹 Count students per institution
-            inti_counts = filtered_df["school_name"].value_counts().reset_index()
+            inti_counts = counts_cube.count_by(("school_name",), filters).dropna().sort_values(by="count", ascending=False)
             inti_counts.columns = ["Institution", "Student Count"]
 
             # 🔹 Format the numbers with commas
@@ -486,12 +499,16 @@ def main():
     # ---- Raw Data Preview ----
     st.markdown(f'<h4 style="font-family: \'Khmer OS Battambang\', sans-serif;">ទិន្នន័យជាទម្រង់តារាង</h4>', unsafe_allow_html=True)
     #st.subheader("ទិន្នន័យជាទម្រង់តារាង")
-    st.dataframe(filtered_df, height=400, use_container_width=True)
+    if total_students > RAW_DATA_LIMIT:
+        st.caption(f"បង្ហាញ {RAW_DATA_LIMIT:,} ជួរដំបូង ក្នុងចំណោម {total_students:,}")
+    perf.checkpoint("tvetsms.charts")
+    raw_data_table(load_preview(version, filters), TABLE, COLUMNS, height=400)
+    perf.checkpoint("tvetsms.raw_data")
 
     # ---- Refresh Data Button ----
     if st.button("🔄 Refresh Data"):
-        st.cache_data.clear()  # Clear the data cache to force reload
-        st.rerun()  # Use st.rerun() to trigger rerun
+        datastore.request_refresh("tvetsms_data")  # Rebuilt in the background; the current data stays on screen
+        st.toast("កំពុងធ្វើបច្ចុប្បន្នភាពទិន្នន័យ...")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,79 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import datastore
+import page_registry
+
+logger = logging.getLogger(__name__)
+
+# ---- Warm-up Settings ----
+ENABLED = os.environ.get("TVETMIS_WARMUP", "1") not in ("0", "false", "False")
+MAX_WORKERS = int(os.environ.get("TVETMIS_WARMUP_WORKERS", 8))
+
+# (name, module, callable on that module) for every page dataset.
+# The loads are I/O bound (MySQL), so threads overlap them well.
+# These threads have no Streamlit script context, so the tasks call the raw loaders
+# that raise on failure, not the page-facing load_* functions that report errors with
+# st.error; a failed load is only logged here and isn't cached, the page retries it.
+TASKS = [
+    ("home", "home", lambda m: m.load_landing()),
+    ("tvet15m", "tvet15m", lambda m: datastore.get("tvet15m")),
+    ("graduated", "graduated", lambda m: datastore.get("graduated")),
+    ("tvetsms_data", "tvetsms", lambda m: m.load_overview()),
+    ("tvet_staff", "staff", lambda m: datastore.get("tvet_staff")),
+    ("school_staff", "teacher", lambda m: datastore.get("school_staff")),
+    ("development_partners", "partner", lambda m: datastore.get("development_partners")),
+    ("student_internships_15m", "internship15m", lambda m: datastore.get("student_internships_15m")),
+    ("erpl_candidate", "erpl_candidate", lambda m: datastore.get("erpl_candidate")),
+]
+
+last_report = []
+
+
+def _run(name, module_name, load):
+    start = time.perf_counter()
+    try:
+        result = load(page_registry.load(module_name))
+        if isinstance(result, dict):  # home: {query name: DataFrame}
+            rows = sum(len(frame) for frame in result.values())
+        else:
+            rows = len(result) if hasattr(result, "__len__") else None
+        error = None
+    except Exception as e:
+        rows = None
+        error = str(e)
+    return {"table": name, "seconds": time.perf_counter() - start, "rows": rows, "error": error}
+
+
+def warm_up(max_workers=MAX_WORKERS):
+    """Load every page dataset concurrently and return a timing report per table."""
+    global last_report
+    start = time.perf_counter()
+    report = []
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="warmup") as pool:
+        futures = [pool.submit(_run, *task) for task in TASKS]
+        for future in as_completed(futures):
+            report.append(future.result())
+
+    report.sort(key=lambda r: r["seconds"], reverse=True)
+    for r in report:
+        if r["error"]:
+            status = f"failed: {r['error']}"
+        else:
+            status = f"{r['rows']:,} rows" if r["rows"] is not None else "ok"
+        logger.info("%-25s %6.2fs  %s", r["table"], r["seconds"], status)
+    logger.info("all tables loaded in %.2fs", time.perf_counter() - start)
+    last_report = report
+    return report
+
+
+def start():
+    """Run the warm-up in a background thread so the first page renders immediately."""
+    if not ENABLED:
+        return None
+    thread = threading.Thread(target=warm_up, name="warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,23 @@
+import streamlit as st
+
+from db import load_remaining_columns
+
+
+@st.cache_data(ttl=600, max_entries=8)
+def _remaining_columns(table, columns, key, keys):
+    # keys is a Series: Streamlit hashes it by content, so each row set is its own entry
+    return load_remaining_columns(table, list(columns), keys, key)
+
+
+def raw_data_table(df, table, columns, key="id", height=400):
+    """Show the filtered rows; the columns the page does not chart are fetched only on request,
+    and only for these rows."""
+    show_all = st.toggle("បង្ហាញជួរឈរទាំងអស់", key=f"raw_data_all_{table}")
+    if show_all and key in df.columns:
+        try:
+            extra = _remaining_columns(table, tuple(columns), key, df[key].reset_index(drop=True))
+            extra = extra[[c for c in extra.columns if c == key or c not in df.columns]]
+            df = df.merge(extra, on=key, how="left")
+        except Exception as e:
+            st.error(f"Error loading remaining columns: {e}")
+    st.dataframe(df, height=height, use_container_width=True)